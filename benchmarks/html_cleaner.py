@@ -0,0 +1,137 @@
+"""
+Speed and equivalence of the HTML-to-markdown engines in logic/html_cleaner.py.
+
+    python -m benchmarks.html_cleaner [page.html ...] [--repeat 20] [--workers 4]
+
+Without files a synthetic listing page is used. For every page both engines
+run `--repeat` times; the report shows the median time per page and how
+closely the lxml output matches markdownify's word for word. With
+--workers, the pages are also converted `--repeat` times each from 8
+threads, in those threads and then through a ConvertPool of that many
+processes (logic/convert_pool.py), and both rates are shown in pages/sec.
+"""
+
+import argparse
+import difflib
+import os
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from logic.html_cleaner import SELECTORS_TO_REMOVE, html_to_markdown, lxml
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def synthetic_listing(features: int = 400) -> str:
+    """A listing page shaped like the real ones: chrome, a long body and tables."""
+    rows = "".join(
+        f"<tr><th>Feature {i}</th><td>Value <b>{i * 7}</b> m<sup>2</sup></td></tr>"
+        for i in range(features)
+    )
+    paragraphs = "".join(
+        f"<p>Spacious <em>flat</em> number {i} with balcony, "
+        f"<a href='/x/{i}'>see more</a> and a view.<br>Second line {i}.</p>"
+        for i in range(features)
+    )
+    return f"""<!DOCTYPE html><html><head><title>Listing</title>
+    <script>var tracking = {{"a": 1}};</script><style>body {{ color: red }}</style></head>
+    <body><header><nav><a href="/">Home</a></nav></header>
+    <div class="cookie-banner">We use cookies</div>
+    <main><h1>Two bedroom flat</h1><h2>Price: 250 000 EUR</h2>
+    <div class="description">{paragraphs}</div>
+    <ul>{''.join(f'<li>Item {i}</li>' for i in range(50))}</ul>
+    <table>{rows}</table>
+    <div id="comments">Nice place!</div><aside class="sidebar">Related</aside>
+    <img src="x.jpg"></main><footer>Footer text</footer></body></html>"""
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def similarity(a: str, b: str) -> float:
+    """Word-level similarity of two markdown texts, ignoring formatting."""
+    return difflib.SequenceMatcher(None, _words(a), _words(b), autojunk=False).ratio()
+
+
+def _time(engine: str, html: str, repeat: int) -> tuple[float, str]:
+    timings = []
+    output = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = html_to_markdown(html, SELECTORS_TO_REMOVE, engine=engine)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), output
+
+
+def _pages_per_sec(convert, pages: list, repeat: int, threads: int = 8) -> float:
+    jobs = [html for _, html in pages] * repeat
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(convert, jobs))
+    return len(jobs) / (time.perf_counter() - started)
+
+
+def compare_pool(pages: list, repeat: int, workers: int):
+    """Conversion rate in threads against a ConvertPool of `workers` processes."""
+    # config, which the pool reads its settings from, exits without a key.
+    os.environ.setdefault("JINA_API_KEY", "benchmark")
+    from logic.convert_pool import ConvertPool
+
+    threaded = _pages_per_sec(
+        lambda html: html_to_markdown(html, SELECTORS_TO_REMOVE), pages, repeat
+    )
+    pool = ConvertPool(workers)
+    try:
+        # Worker start-up is not part of the rate.
+        pool.html_to_markdown(pages[0][1], SELECTORS_TO_REMOVE)
+        pooled = _pages_per_sec(
+            lambda html: pool.html_to_markdown(html, SELECTORS_TO_REMOVE), pages, repeat
+        )
+    finally:
+        pool.close()
+    print(
+        f"threads {threaded:.1f} pages/s | {workers} processes {pooled:.1f} pages/s "
+        f"({pooled / threaded:.1f}x, {pool.jobs} jobs in {pool.chunks} chunks, "
+        f"{pool.shared_pages} through shared memory)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="*", help="HTML files to convert.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--workers", type=int, default=0, help="Also compare against a process pool."
+    )
+    args = parser.parse_args(argv)
+
+    if lxml is None:
+        print("lxml is not installed; only the markdownify engine is available.")
+        return 1
+
+    pages = [("synthetic", synthetic_listing())]
+    if args.files:
+        pages = []
+        for path in args.files:
+            with open(path, "rb") as f:
+                pages.append((path, f.read()))
+
+    for name, html in pages:
+        slow, reference = _time("markdownify", html, args.repeat)
+        fast, output = _time("lxml", html, args.repeat)
+        print(
+            f"{name}: {len(html) / 1024:.0f} KiB HTML | markdownify {slow * 1000:.1f} ms, "
+            f"lxml {fast * 1000:.1f} ms ({slow / fast:.1f}x) | "
+            f"{len(reference)} vs {len(output)} chars, "
+            f"word similarity {similarity(reference, output):.3f}"
+        )
+    if args.workers:
+        compare_pool(pages, args.repeat, args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
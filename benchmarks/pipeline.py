@@ -0,0 +1,277 @@
+"""
+Offline throughput benchmark for the processing paths.
+
+    python -m benchmarks.pipeline --sizes 10,100,1000 --save-baseline bench.json
+    python -m benchmarks.pipeline --sizes 10,100,1000 --baseline bench.json
+
+Every (path, size) case runs in a fresh process inside a temporary
+directory, against the stand-ins of benchmarks/stand_ins.py: a fake Jina
+Reader server, FakeProvider for the model and a SQLite copy of the SE
+tables. Paths:
+
+    batch     URL list through run_tasks, nothing saved
+    excel     the same, saving to xlsx
+    pipeline  SE numbers resolved lazily from SQLite, saving to jsonl
+    async     URL list through the asyncio engine, nothing saved
+
+The report shows items/sec, p50/p95 per-item latency (sum of the stage
+timings) and peak RSS. With --baseline, a case that is slower or bigger
+than the baseline by more than --tolerance fails the run (exit code 1).
+"""
+
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ("batch", "excel", "pipeline", "async")
+RESULT_PREFIX = "RESULT "
+
+
+def _peak_memory_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        try:
+            import psutil
+        except ImportError:
+            return 0.0
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _drain(ui_queue: queue.Queue, counters: dict):
+    """Consumes worker messages like the GUI would, counting errors."""
+    while True:
+        message = ui_queue.get()
+        if message is None:
+            return
+        if message[0] == "error":
+            counters["errors"] += 1
+
+
+def run_case(path: str, size: int, args) -> dict:
+    """Runs one case in this process. Expects a scratch working directory."""
+    from benchmarks.stand_ins import FakeJinaServer, use_fake_llm
+
+    server = FakeJinaServer(
+        latency=args.jina_latency,
+        error_rate=args.jina_error_rate,
+        error_status=args.jina_error_status,
+        capacity=args.jina_capacity,
+        recorded_dir=args.recorded,
+    ).start()
+    # config reads these on import, so they are set before any logic module loads.
+    os.environ["JINA_READER_URL"] = server.reader_url
+    os.environ.setdefault("JINA_API_KEY", "benchmark")
+    if path == "pipeline":
+        os.environ["SE_SQLITE_PATH"] = os.path.abspath("se_standin.sqlite3")
+
+    from logic.batch import run_tasks
+    from logic.metrics import RunMetrics
+    from logic.models import ProcessingContext, Task
+    from logic.se_helper import create_sqlite_standin, iter_tasks_from_se_numbers
+
+    use_fake_llm("bench", latency=args.llm_latency)
+    ui_queue = queue.Queue()
+    counters = {"errors": 0}
+    drain = threading.Thread(target=_drain, args=(ui_queue, counters), daemon=True)
+    drain.start()
+
+    run_id = f"bench_{path}_{size}"
+    context = ProcessingContext(
+        api_key="benchmark",
+        use_proxy=False,
+        proxy_url="",
+        ui_queue=ui_queue,
+        user_prompt_template="{content}",
+        system_prompt_text="Extract the listing details.",
+        save_excel=path in ("excel", "pipeline"),
+        model_name="bench-model",
+        run_id=run_id,
+        use_fetch_cache=False,
+        use_llm_cache=False,
+        # The stand-in serves the same few pages for every URL.
+        deduplicate=args.dedup,
+        convert_workers=args.convert_workers,
+        output_formats=("xlsx",) if path == "excel" else ("jsonl",),
+    )
+    # Owned here so the per-task rows survive the end of the run.
+    context.metrics = RunMetrics(run_id)
+
+    if path == "pipeline":
+        create_sqlite_standin(os.environ["SE_SQLITE_PATH"], count=size)
+        tasks = iter_tasks_from_se_numbers(str(i) for i in range(1, size + 1))
+    else:
+        tasks = [Task(url=f"https://site{i % 5}.example/listing/{i}") for i in range(size)]
+
+    if path == "async":
+        from logic.async_pipeline import run_async_pipeline
+
+        stats = run_async_pipeline(tasks, context)
+    else:
+        stats = run_tasks(tasks, context, max_workers=args.workers)
+
+    ui_queue.put(None)
+    drain.join()
+    server.stop()
+
+    latencies = sorted(
+        sum(value for key, value in row.items() if key.endswith("_s"))
+        for row in context.metrics.task_rows()
+    )
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+    return {
+        "path": path,
+        "size": size,
+        "items": stats.total,
+        "elapsed_s": round(stats.elapsed, 3),
+        "items_per_sec": round(stats.items_per_sec, 2),
+        "p50_s": round(percentile(0.5), 4),
+        "p95_s": round(percentile(0.95), 4),
+        "peak_mb": round(_peak_memory_mb(), 1),
+        "errors": counters["errors"],
+        "jina_requests": server.requests,
+        "jina_rejected": server.rejected,
+    }
+
+
+def _case_args(args) -> list[str]:
+    options = [
+        "--jina-latency", str(args.jina_latency),
+        "--jina-error-rate", str(args.jina_error_rate),
+        "--jina-error-status", str(args.jina_error_status),
+        "--jina-capacity", str(args.jina_capacity),
+        "--llm-latency", str(args.llm_latency),
+    ]
+    if args.workers:
+        options += ["--workers", str(args.workers)]
+    if args.recorded:
+        options += ["--recorded", os.path.abspath(args.recorded)]
+    if args.dedup:
+        options.append("--dedup")
+    if args.convert_workers:
+        options += ["--convert-workers", str(args.convert_workers)]
+    return options
+
+
+def spawn_case(path: str, size: int, args) -> dict:
+    """Runs one case in a child process and returns its result."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, env.get("PYTHONPATH")]))
+    with tempfile.TemporaryDirectory(prefix="jina_bench_") as scratch:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.pipeline", "--case", path, str(size)]
+            + _case_args(args),
+            cwd=scratch,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(
+        f"Case {path}/{size} failed (exit code {completed.returncode}):\n{completed.stderr[-2000:]}"
+    )
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Returns a message for every case that regressed against the baseline."""
+    regressions = []
+    for result in results:
+        key = f"{result['path']}/{result['size']}"
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["items_per_sec"] < base["items_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: {result['items_per_sec']} items/sec, baseline {base['items_per_sec']}"
+            )
+        # Small absolute slack, so millisecond jitter does not fail tiny cases.
+        if result["p95_s"] > base["p95_s"] * (1 + tolerance) + 0.005:
+            regressions.append(f"{key}: p95 {result['p95_s']}s, baseline {base['p95_s']}s")
+        if base["peak_mb"] and result["peak_mb"] > base["peak_mb"] * (1 + tolerance):
+            regressions.append(f"{key}: peak {result['peak_mb']} MB, baseline {base['peak_mb']} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark.")
+    parser.add_argument("--paths", default="batch,excel,pipeline", help=f"Any of {', '.join(PATHS)}.")
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--jina-latency", type=float, default=0.02, help="Seconds per page.")
+    parser.add_argument("--jina-error-rate", type=float, default=0.0)
+    parser.add_argument("--jina-error-status", type=int, default=500, help="e.g. 429 or 503.")
+    parser.add_argument(
+        "--jina-capacity", type=int, default=0, help="Concurrent requests served before 429s."
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per model call.")
+    parser.add_argument("--recorded", default=None, help="Directory of recorded *.md pages.")
+    parser.add_argument("--workers", type=int, default=None, help="Fetch workers.")
+    parser.add_argument(
+        "--dedup", action="store_true", help="Reuse answers for duplicate pages (off by default)."
+    )
+    parser.add_argument(
+        "--convert-workers", type=int, default=0, help="Compaction in a process pool."
+    )
+    parser.add_argument("--baseline", default=None, help="Results JSON to compare against.")
+    parser.add_argument("--save-baseline", default=None, help="Write the results JSON here.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--case", nargs=2, metavar=("PATH", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        path, size = args.case
+        print(RESULT_PREFIX + json.dumps(run_case(path, int(size), args)), flush=True)
+        return 0
+
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        parser.error(f"Unknown paths: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = []
+    print(f"{'case':<16}{'items/s':>10}{'p50 s':>9}{'p95 s':>9}{'peak MB':>9}{'errors':>8}")
+    for path in paths:
+        for size in sizes:
+            result = spawn_case(path, size, args)
+            results.append(result)
+            print(
+                f"{path + '/' + str(size):<16}{result['items_per_sec']:>10.1f}"
+                f"{result['p50_s']:>9.3f}{result['p95_s']:>9.3f}"
+                f"{result['peak_mb']:>9.1f}{result['errors']:>8}"
+            )
+
+    by_case = {f"{r['path']}/{r['size']}": r for r in results}
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(by_case, f, indent=2)
+        print(f"Saved {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+"""
+Local stand-ins for the external services, for offline benchmarks.
+
+FakeJinaServer answers Jina Reader requests with recorded markdown after a
+configurable latency and error rate; point JINA_READER_URL at its
+reader_url before importing config. use_fake_llm routes a model prefix to
+FakeProvider. SE number lookups go to a SQLite file built by
+logic.se_helper.create_sqlite_standin.
+"""
+
+import glob
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def synthetic_markdown() -> str:
+    """Markdown of the synthetic listing page used by the HTML cleaner benchmark."""
+    from benchmarks.html_cleaner import synthetic_listing
+    from logic.html_cleaner import html_to_markdown
+
+    return html_to_markdown(synthetic_listing(features=60))
+
+
+class FakeJinaServer:
+    """
+    A threaded HTTP server on 127.0.0.1 that answers GET /<page url> like
+    r.jina.ai. Pages come from the *.md files of `recorded_dir` (picked by
+    URL hash) or synthetic markdown; `error_rate` of the requests get an
+    `error_status` response (a 429 comes with Retry-After: 1). With a
+    `capacity`, requests beyond that many in flight get a 429 right away.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        error_rate: float = 0.0,
+        recorded_dir: Optional[str] = None,
+        port: int = 0,
+        error_status: int = 500,
+        capacity: int = 0,
+    ):
+        self.latency = latency
+        self.capacity = capacity
+        self.in_flight = 0
+        self.rejected = 0
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.pages = []
+        if recorded_dir:
+            for path in sorted(glob.glob(os.path.join(recorded_dir, "*.md"))):
+                with open(path, "r", encoding="utf-8") as f:
+                    self.pages.append(f.read().encode("utf-8"))
+        if not self.pages:
+            self.pages = [synthetic_markdown().encode("utf-8")]
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    overloaded = server.capacity and server.in_flight >= server.capacity
+                    if overloaded:
+                        server.rejected += 1
+                    else:
+                        server.in_flight += 1
+                if overloaded:
+                    self._send(429, b"Too many concurrent requests")
+                    return
+                try:
+                    self._serve()
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def _serve(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.error_rate and random.random() < server.error_rate:
+                    body, status = b"Simulated upstream error", server.error_status
+                else:
+                    digest = hashlib.sha256(self.path.encode("utf-8")).digest()
+                    body, status = server.pages[digest[0] % len(server.pages)], 200
+                self._send(status, body, retry_after="1" if status == 429 else None)
+
+            def _send(self, status, body, retry_after=None):
+                self.send_response(status)
+                if retry_after:
+                    self.send_header("Retry-After", retry_after)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def reader_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FakeJinaServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def use_fake_llm(prefix: str = "bench", latency: float = 0.0):
+    """Routes models named `prefix`* to a FakeProvider with the given latency."""
+    from logic.providers import FakeProvider, register_provider
+
+    provider = FakeProvider(latency=latency)
+    register_provider(prefix, provider)
+    return provider
@@ -0,0 +1,103 @@
+"""
+Import time of the application's entry points.
+
+    python -m benchmarks.startup [--repeat 5] [--budget 0.5]
+
+Every target is imported `--repeat` times, each in a fresh interpreter, and
+the report shows the median import time and which heavy dependencies of
+logic/registry.py were imported along the way (there should be none: they
+load on first use). Targets:
+
+    gui       ui.main_window, what main.py imports before showing the window
+    headless  logic.batch, the headless batch runner
+    async     logic.async_pipeline
+
+The gui target is skipped when customtkinter is not installed. With
+--budget, a target slower than that many seconds, or one that imports a
+heavy dependency, fails the run (exit code 1).
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = {
+    "gui": "ui.main_window",
+    "headless": "logic.batch",
+    "async": "logic.async_pipeline",
+}
+RESULT_PREFIX = "RESULT "
+
+_CHILD = """
+import json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+from logic.registry import imported
+print({prefix!r} + json.dumps({{"seconds": elapsed, "imported": imported()}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """Imports `module` in a fresh interpreter and returns its time and heavy imports."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, env.get("PYTHONPATH")]))
+    # config exits without a key.
+    env.setdefault("JINA_API_KEY", "benchmark")
+    completed = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(module=module, prefix=RESULT_PREFIX)],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import time of the entry points.")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Any of {', '.join(TARGETS)}.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None, help="Seconds allowed per target.")
+    args = parser.parse_args(argv)
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+    failures = []
+    print(f"{'target':<10}{'median s':>10}{'max s':>8}  heavy imports")
+    for target in targets:
+        if target == "gui" and importlib.util.find_spec("customtkinter") is None:
+            print(f"{target:<10}  skipped, customtkinter is not installed")
+            continue
+        runs = [measure(TARGETS[target]) for _ in range(args.repeat)]
+        seconds = [run["seconds"] for run in runs]
+        heavy = sorted({name for run in runs for name in run["imported"]})
+        median = statistics.median(seconds)
+        print(f"{target:<10}{median:>10.3f}{max(seconds):>8.3f}  {', '.join(heavy) or '-'}")
+        if args.budget is not None:
+            if median > args.budget:
+                failures.append(f"{target}: {median:.3f}s, budget {args.budget}s")
+            if heavy:
+                failures.append(f"{target}: imports {', '.join(heavy)} at startup")
+
+    if failures:
+        print("Failures:")
+        for message in failures:
+            print(f"  {message}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -14,6 +14,116 @@ DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
+# SQLite file with the same tables, used instead of MySQL when set (offline runs).
+SE_SQLITE_PATH = os.getenv("SE_SQLITE_PATH", "")
+
+# SE number resolution (logic/se_helper.py).
+SE_CHUNK_SIZE = int(os.getenv("SE_CHUNK_SIZE", "1000"))
+SE_DB_POOL_SIZE = int(os.getenv("SE_DB_POOL_SIZE", "4"))
+SE_CACHE_MAX_ENTRIES = int(os.getenv("SE_CACHE_MAX_ENTRIES", "50000"))
+
+# Concurrency limits for batch runs (GUI and headless).
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "8"))
+SELENIUM_WORKERS = int(os.getenv("SELENIUM_WORKERS", "1"))
+# Staged pipeline (logic/pipeline.py): workers for the clean and LLM stages and
+# the size of the queues between stages; fetch workers are MAX_WORKERS.
+PIPELINE_CLEAN_WORKERS = int(os.getenv("PIPELINE_CLEAN_WORKERS", "2"))
+PIPELINE_LLM_WORKERS = int(os.getenv("PIPELINE_LLM_WORKERS", "8"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+# Per-stage limits for the asyncio engine (logic/async_pipeline.py).
+ASYNC_FETCH_CONCURRENCY = int(os.getenv("ASYNC_FETCH_CONCURRENCY", "50"))
+ASYNC_LLM_CONCURRENCY = int(os.getenv("ASYNC_LLM_CONCURRENCY", "20"))
+
+# Adaptive per-provider limits (logic/rate_limit.py) for r.jina.ai, each target
+# domain and each LLM model: concurrency starts at RATE_LIMIT_INITIAL and
+# adapts between 1 and RATE_LIMIT_MAX; throttled calls are retried up to
+# RATE_LIMIT_MAX_RETRIES times and CIRCUIT_FAILURE_THRESHOLD failures in a row
+# pause the provider for CIRCUIT_COOLDOWN_SECONDS.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_INITIAL = int(os.getenv("RATE_LIMIT_INITIAL", "4"))
+RATE_LIMIT_MAX = int(os.getenv("RATE_LIMIT_MAX", "64"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_SECONDS", "1"))
+RATE_LIMIT_BACKOFF_MAX_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_MAX_SECONDS", "60"))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "300"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "30"))
+
+# Chrome driver pool used by the Selenium fetcher. SELENIUM_WORKERS is the pool size.
+SELENIUM_HEADLESS = os.getenv("SELENIUM_HEADLESS", "0") == "1"
+SELENIUM_MAX_PAGES = int(os.getenv("SELENIUM_MAX_PAGES", "50"))
+SELENIUM_MAX_MEMORY_MB = int(os.getenv("SELENIUM_MAX_MEMORY_MB", "1500"))
+
+# Jina Reader endpoint; the page URL is appended to it.
+JINA_READER_URL = os.getenv("JINA_READER_URL", "https://r.jina.ai/")
+# Tiered fetching (logic/fetch_strategy.py): shorter pages count as failed and
+# move on to the next tier.
+FETCH_MIN_CHARS = int(os.getenv("FETCH_MIN_CHARS", "400"))
+# Hours a domain's remembered tier is trusted before the cheaper tiers are
+# probed again; 0 keeps it for good.
+FETCH_STRATEGY_TTL_HOURS = float(os.getenv("FETCH_STRATEGY_TTL_HOURS", "24"))
+
+# Shared HTTP session used by the HTTP fetchers.
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "0") == "1"
+
+# On-disk cache of fetched page markdown (data/cache/pages).
+FETCH_CACHE_TTL_HOURS = float(os.getenv("FETCH_CACHE_TTL_HOURS", "72"))
+FETCH_CACHE_MAX_MB = int(os.getenv("FETCH_CACHE_MAX_MB", "500"))
+
+# Persistent LLM response cache (data/cache/llm_responses.sqlite3).
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+
+# How often the Excel results file is rewritten from the row spool during a run.
+EXCEL_CHECKPOINT_SECONDS = float(os.getenv("EXCEL_CHECKPOINT_SECONDS", "60"))
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "1000"))
+
+# Port of the Prometheus-style /metrics endpoint (logic/metrics.py); 0 disables it.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Token budget for page content sent to the LLM; 0 uses the per-model default.
+COMPACTION_TOKEN_BUDGET = int(os.getenv("COMPACTION_TOKEN_BUDGET", "0"))
+
+# Worker processes for HTML-to-markdown conversion and compaction
+# (logic/convert_pool.py); 0 runs them in the fetch and clean threads. Jobs
+# queued while every worker is busy are sent up to CONVERT_CHUNK_SIZE at a
+# time, and pages of at least CONVERT_SHM_MIN_KB go through shared memory.
+CONVERT_WORKERS = int(os.getenv("CONVERT_WORKERS", "0"))
+CONVERT_CHUNK_SIZE = int(os.getenv("CONVERT_CHUNK_SIZE", "8"))
+CONVERT_SHM_MIN_KB = int(os.getenv("CONVERT_SHM_MIN_KB", "256"))
+
+# Duplicate listings (logic/dedup.py) reuse the first copy's model answer. Near
+# duplicates differ in at most DEDUP_MAX_DISTANCE of 64 SimHash bits, and the
+# other copy has at least DEDUP_MIN_NUMBER_OVERLAP of the numbers (prices,
+# areas, ...) of the copy with fewer of them.
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))
+DEDUP_MIN_NUMBER_OVERLAP = float(os.getenv("DEDUP_MIN_NUMBER_OVERLAP", "0.8"))
+
+# Shared work queue for runs split across machines (logic/work_queue.py).
+# A worker holds at most WORK_QUEUE_IN_FLIGHT leased tasks; a lease that is not
+# renewed for WORK_QUEUE_VISIBILITY_SECONDS (the worker died) makes the task
+# available again, and a task fails for good after WORK_QUEUE_MAX_ATTEMPTS.
+# The default SQLite queue must be on a local disk and serves one machine.
+WORK_QUEUE_URL = os.getenv("WORK_QUEUE_URL", "sqlite:///data/work_queue.sqlite3")
+WORK_QUEUE_VISIBILITY_SECONDS = float(os.getenv("WORK_QUEUE_VISIBILITY_SECONDS", "300"))
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+WORK_QUEUE_IN_FLIGHT = int(os.getenv("WORK_QUEUE_IN_FLIGHT", "32"))
+WORK_QUEUE_POLL_SECONDS = float(os.getenv("WORK_QUEUE_POLL_SECONDS", "5"))
+
+# Multi-listing LLM requests (logic/llm_batch.py); LLM_BATCH_SIZE=1 disables them.
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "1"))
+LLM_BATCH_MAX_WAIT_SECONDS = float(os.getenv("LLM_BATCH_MAX_WAIT_SECONDS", "2"))
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "4"))
+
+# Stream model answers into the GUI's Processed Content tab as they are
+# generated, sending the new text at most every STREAM_UPDATE_SECONDS per task.
+LLM_STREAM_TO_UI = os.getenv("LLM_STREAM_TO_UI", "1") == "1"
+STREAM_UPDATE_SECONDS = float(os.getenv("STREAM_UPDATE_SECONDS", "0.1"))
+
+# Gemini context caching for long system prompts (the API rejects short ones).
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "32768"))
+GEMINI_CONTEXT_CACHE_TTL_MINUTES = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_MINUTES", "60"))
 
 if not JINA_API_KEY:
     print("Error: JINA_API_KEY not found in .env file")
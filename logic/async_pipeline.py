@@ -0,0 +1,238 @@
+"""
+asyncio engine for the fetch and LLM stages.
+
+One event loop keeps hundreds of listings in flight: the Jina Reader call
+goes through aiohttp (when installed) and process_md_async uses the async
+Gemini and g4f clients, each stage bounded by its own semaphore. Selenium,
+direct and tiered fetches, which have no async API here, run in worker
+threads under the fetch semaphore. The ProcessingContext and ui_queue contract is the same as for
+the thread-pool runner, so the GUI can drive either engine.
+"""
+
+import asyncio
+from typing import Callable, Optional
+
+from config import (
+    ASYNC_FETCH_CONCURRENCY,
+    ASYNC_LLM_CONCURRENCY,
+    JINA_READER_URL,
+    SELENIUM_WORKERS,
+)
+from logic.batch import BatchStats, batch_run
+from logic.fetch_cache import get_fetch_cache
+from logic.metrics import stage_timer
+from logic.models import PipelineItem, ProcessingContext, Task
+from logic.processing import (
+    EXCLUDE_SELECTOR,
+    FetchError,
+    _jina_headers,
+    clean_stage,
+    download_for_mode,
+    fetch_limit_keys,
+    http_fetch_error,
+    journal_stage,
+    load_resume_point,
+    post_task_update,
+    process_md_async,
+    publish_answer,
+    report_fetch_error,
+    select_fetcher,
+    sink_stage,
+    use_duplicate_answer,
+)
+from logic.rate_limit import RateLimitError, call_with_limits_async
+from logic.registry import load, load_optional
+
+
+async def _download_md_jina_async(session, task: Task, context: ProcessingContext) -> str:
+    proxy_url = context.proxy_url if context.use_proxy else None
+    aiohttp = load("aiohttp")
+    try:
+        async with session.get(
+            f"{JINA_READER_URL}{task.url}",
+            headers=_jina_headers(context.api_key, proxy_url),
+        ) as response:
+            text = await response.text()
+            if response.status != 200:
+                raise http_fetch_error("API Error", response.status, response.headers, text)
+            return text
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise FetchError(f"Request failed: {str(e)}") from e
+
+
+class _AsyncRun:
+    """State shared by all task coroutines of one run."""
+
+    def __init__(self, context, use_selenium, fetch_concurrency, llm_concurrency):
+        self.context = context
+        self.mode, self.downloader, self.status = select_fetcher(context, use_selenium)
+        self.fetch_sem = asyncio.Semaphore(
+            min(fetch_concurrency, SELENIUM_WORKERS)
+            if self.mode == "selenium"
+            else fetch_concurrency
+        )
+        self.llm_sem = asyncio.Semaphore(llm_concurrency)
+        self.session = None
+
+    async def fetch(self, task: Task) -> tuple[str, str]:
+        """Returns (markdown, tier) like download_for_mode."""
+        async with self.fetch_sem:
+            if self.mode == "jina" and self.session is not None:
+                with stage_timer(self.context, "fetch", "jina", task) as timing:
+                    try:
+                        md_content = await call_with_limits_async(
+                            fetch_limit_keys(task, "jina"),
+                            lambda: _download_md_jina_async(self.session, task, self.context),
+                        )
+                    except RateLimitError as e:
+                        raise FetchError(str(e)) from e
+                    timing["bytes"] = len(md_content)
+                return md_content, "jina"
+            # Selenium, direct and tiered fetches (and Jina without aiohttp,
+            # which is optional) use the sync downloaders in worker threads.
+            return await asyncio.to_thread(
+                download_for_mode, task, self.context, self.mode, self.downloader
+            )
+
+    async def run_task(self, task: Task):
+        context = self.context
+        if not task.url:
+            context.ui_queue.put(("error", "Encountered a task with no URL."))
+            return
+
+        item = PipelineItem(task, status=self.status)
+
+        item.md_content, item.processed_text, skip = await asyncio.to_thread(
+            load_resume_point, task, context
+        )
+        if skip:
+            return
+        if item.md_content is not None:
+            item.status += " (resumed)"
+        else:
+            dedup = context.dedup
+            same_page = dedup.claim_url(task) if dedup is not None else None
+            if same_page is not None:
+                first_key, page = same_page
+                with stage_timer(context, "dedup", "url", task):
+                    item.md_content = await asyncio.wrap_future(page)
+                if item.md_content is not None:
+                    item.status += f" (same page as {first_key})"
+            if item.md_content is None:
+                try:
+                    item.md_content = await self.fetch_page(item)
+                finally:
+                    if dedup is not None and same_page is None:
+                        dedup.finish_url(task, item.md_content)
+                if item.md_content is None:
+                    return
+            await asyncio.to_thread(journal_stage, context, task, "fetched", item.md_content)
+        post_task_update(context, task, "raw", item.md_content)
+        item.status += " [async]"
+
+        # Compaction is CPU work (or waits on the conversion pool).
+        await asyncio.to_thread(clean_stage, item, context)
+        if item.processed_text is None:
+            await self.process(item)
+        sink_stage(item, context)
+
+    async def fetch_page(self, item: PipelineItem) -> Optional[str]:
+        """The page from the fetch cache or the network; None when the fetch failed."""
+        context, task, mode = self.context, item.task, self.mode
+        cache = get_fetch_cache() if context.use_fetch_cache else None
+        if cache:
+            md_content = await asyncio.to_thread(cache.get, task.url, mode, EXCLUDE_SELECTOR)
+            if md_content is not None:
+                item.status += " (cached page)"
+                return md_content
+        try:
+            md_content, tier = await self.fetch(task)
+        except FetchError as e:
+            report_fetch_error(context, task, str(e))
+            return None
+        if mode == "auto":
+            item.status += f" via {tier}"
+        if cache:
+            await asyncio.to_thread(cache.put, task.url, mode, EXCLUDE_SELECTOR, md_content)
+        return md_content
+
+    async def process(self, item: PipelineItem):
+        """The LLM stage: reuses a duplicate's answer or asks the model."""
+        context, task = self.context, item.task
+        dedup = context.dedup
+        duplicate = None
+        if dedup is not None:
+            # Fingerprinting is CPU work, keep it off the event loop.
+            duplicate = await asyncio.to_thread(dedup.match, task, item.llm_input)
+        if duplicate is not None:
+            kind, first_key, answer = duplicate
+            with stage_timer(context, "dedup", kind, task):
+                reused = await asyncio.wrap_future(answer)
+            if reused is not None:
+                await asyncio.to_thread(
+                    use_duplicate_answer, item, context, kind, first_key, reused
+                )
+                return
+
+        try:
+            if context.llm_batcher is not None:
+                # Batches are bounded by the batcher's own concurrency.
+                with stage_timer(context, "llm", context.model_name, task):
+                    item.processed_text = await asyncio.wrap_future(
+                        context.llm_batcher.submit(item.llm_input)
+                    )
+            else:
+                async with self.llm_sem:
+                    with stage_timer(context, "llm", context.model_name, task):
+                        item.processed_text = await process_md_async(
+                            item.llm_input,
+                            context.user_prompt_template,
+                            context.system_prompt_text,
+                            context.model_name,
+                            use_cache=context.use_llm_cache,
+                        )
+        finally:
+            if dedup is not None and duplicate is None:
+                publish_answer(item, context)
+        await asyncio.to_thread(
+            journal_stage, context, task, "processed", item.processed_text
+        )
+
+
+async def run_tasks_async(
+    tasks: list[Task],
+    context: ProcessingContext,
+    use_selenium: bool = False,
+    fetch_concurrency: int = ASYNC_FETCH_CONCURRENCY,
+    llm_concurrency: int = ASYNC_LLM_CONCURRENCY,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> BatchStats:
+    """Runs every task on the current event loop and returns the run's stats."""
+    run = _AsyncRun(context, use_selenium, fetch_concurrency, llm_concurrency)
+
+    # aiohttp is only imported for runs that fetch through Jina.
+    aiohttp = load_optional("aiohttp") if run.mode == "jina" else None
+    with batch_run(context, tasks) as stats:
+        if aiohttp is not None:
+            run.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=fetch_concurrency),
+                timeout=aiohttp.ClientTimeout(total=30),
+            )
+        try:
+            pending = [asyncio.ensure_future(run.run_task(task)) for task in tasks]
+            for done, future in enumerate(asyncio.as_completed(pending), 1):
+                try:
+                    await future
+                except Exception as e:
+                    context.ui_queue.put(("error", f"Task crashed: {e}"))
+                if on_progress:
+                    on_progress(done, len(tasks))
+        finally:
+            if run.session is not None:
+                await run.session.close()
+    return stats
+
+
+def run_async_pipeline(tasks: list[Task], context: ProcessingContext, **kwargs) -> BatchStats:
+    """Blocking entry point: runs run_tasks_async on a fresh event loop."""
+    return asyncio.run(run_tasks_async(tasks, context, **kwargs))
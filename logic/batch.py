@@ -0,0 +1,436 @@
+"""
+Headless batch runner.
+
+Streams Tasks through the staged pipeline of logic/pipeline.py, so large
+batches do not spawn one thread per URL. Usable from the GUI and from the
+command line:
+
+    python -m logic.batch inputs.txt --se --workers 8
+"""
+
+import argparse
+import itertools
+import queue
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from config import (
+    CONVERT_WORKERS,
+    DEDUP_ENABLED,
+    JINA_API_KEY,
+    LLM_BATCH_SIZE,
+    METRICS_PORT,
+    PROXY_URL,
+    USER_PROMPT_TEMPLATE,
+)
+from logic.convert_pool import ConvertPool
+from logic.dedup import DedupIndex
+from logic.driver_pool import shutdown_driver_pools
+from logic.http_pool import close_session
+from logic.journal import RunJournal
+from logic.llm_cache import get_llm_cache
+from logic.llm_batch import LLMBatcher
+from logic.metrics import RunMetrics, register_run, start_metrics_server, unregister_run
+from logic.models import ProcessingContext, Task
+from logic.pipeline import Pipeline
+from logic.prompts import load_prompts
+from logic.sinks import SINK_TYPES, open_sink
+from logic.se_helper import iter_tasks_from_se_numbers
+
+
+@dataclass
+class BatchStats:
+    """Summary of a finished batch run."""
+
+    total: int
+    elapsed: float
+    llm_cache_hits: int = 0
+    llm_cache_misses: int = 0
+    # Path of the run's metrics_{run_id}.json, see logic/metrics.py.
+    metrics_report: Optional[str] = None
+    # Listings that reused the answer of an earlier copy, see logic/dedup.py.
+    duplicates: int = 0
+
+    @property
+    def items_per_sec(self) -> float:
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def run_tasks(
+    tasks: Iterable[Task],
+    context: ProcessingContext,
+    use_selenium: bool = False,
+    max_workers: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> BatchStats:
+    """
+    Streams every task through the pipeline stages, with at most
+    `max_workers` fetch threads, and blocks until all of them are done.
+    `tasks` may be a lazy iterator; fetching starts with its first item and
+    each task is journaled as the pipeline takes it. Lists are journaled up
+    front, so a resumed run knows the tasks the pipeline had not reached.
+    """
+    pipeline = Pipeline(
+        context,
+        use_selenium=use_selenium,
+        fetch_workers=max_workers,
+        on_progress=on_progress,
+    )
+    with batch_run(context, tasks if isinstance(tasks, list) else None) as stats:
+        stats.total = pipeline.run(tasks)
+    return stats
+
+
+def tasks_for_inputs(inputs: list[str], se: bool, run_id: str) -> Iterable[Task]:
+    """
+    Tasks for a new run. SE numbers are resolved chunk by chunk while the
+    pipeline runs; the raw numbers are journaled first, so a resume can
+    resolve those the run never reached.
+    """
+    if not se:
+        return [Task(url=url) for url in inputs]
+    journal = RunJournal(run_id)
+    journal.add_se_numbers(inputs)
+    journal.close()
+    return iter_tasks_from_se_numbers(inputs)
+
+
+def resume_tasks(journal: RunJournal) -> Iterable[Task]:
+    """The journaled tasks of a run, then its SE numbers that were never resolved."""
+    tasks = journal.tasks()
+    unresolved = journal.unresolved_se_numbers()
+    if unresolved:
+        return itertools.chain(tasks, iter_tasks_from_se_numbers(unresolved))
+    return tasks
+
+
+def _own(cleanup: ExitStack, context: ProcessingContext, field: str, value, close: Callable):
+    """Sets context.<field> for the run; `close(value)` and a reset run on cleanup."""
+    setattr(context, field, value)
+
+    def release():
+        try:
+            close(value)
+        finally:
+            setattr(context, field, None)
+
+    cleanup.callback(release)
+
+
+@contextmanager
+def batch_run(context: ProcessingContext, tasks: Optional[list[Task]] = None):
+    """
+    Wraps one run of any engine: opens the run's journal, metrics, result
+    sink (workers only queue rows to it), LLM batcher and conversion pool,
+    and fills in the yielded BatchStats when the run ends. `tasks` are
+    journaled up front; engines that stream theirs journal them and set
+    stats.total themselves. What was opened is closed again, in reverse
+    order, even when opening a later part fails.
+    """
+    stats = BatchStats(total=len(tasks or ()), elapsed=0.0)
+    started = None
+    try:
+        with ExitStack() as cleanup:
+            if context.journal is None:
+                _own(cleanup, context, "journal", RunJournal(context.run_id), RunJournal.close)
+            if tasks:
+                context.journal.add_tasks(tasks)
+
+            if context.metrics is None:
+                metrics = RunMetrics(context.run_id)
+                register_run(metrics)
+                _own(
+                    cleanup, context, "metrics", metrics, lambda m: _finish_metrics(m, stats, context)
+                )
+                start_metrics_server(METRICS_PORT)
+
+            if DEDUP_ENABLED and context.deduplicate and context.dedup is None:
+                _own(cleanup, context, "dedup", DedupIndex(), lambda d: _count_duplicates(d, stats))
+
+            if context.save_excel and context.results_sink is None:
+                sink = open_sink(
+                    context.output_formats,
+                    context.run_id,
+                    on_error=lambda message: context.ui_queue.put(("error", message)),
+                )
+                # Closing flushes the sink, which journals the last saved tasks.
+                _own(cleanup, context, "results_sink", sink, lambda s: s.close())
+
+            if context.llm_batch_size > 1 and context.llm_batcher is None:
+                batcher = LLMBatcher(
+                    context.user_prompt_template,
+                    context.system_prompt_text,
+                    context.model_name,
+                    batch_size=context.llm_batch_size,
+                    use_cache=context.use_llm_cache,
+                )
+                _own(cleanup, context, "llm_batcher", batcher, LLMBatcher.close)
+
+            if context.convert_workers > 0 and context.convert_pool is None:
+                pool = ConvertPool(context.convert_workers)
+                _own(cleanup, context, "convert_pool", pool, ConvertPool.close)
+
+            hits_before, misses_before = get_llm_cache().stats()
+            started = time.perf_counter()
+            yield stats
+    finally:
+        if started is not None:
+            stats.elapsed = time.perf_counter() - started
+            hits, misses = get_llm_cache().stats()
+            stats.llm_cache_hits = hits - hits_before
+            stats.llm_cache_misses = misses - misses_before
+
+
+def _count_duplicates(dedup: DedupIndex, stats: BatchStats):
+    stats.duplicates = dedup.hits["exact"] + dedup.hits["near"]
+
+
+def _finish_metrics(metrics: RunMetrics, stats: BatchStats, context: ProcessingContext):
+    # Runs after the sink is closed, so the last flushes are included.
+    unregister_run(metrics)
+    try:
+        stats.metrics_report = metrics.write_report()
+    except OSError as e:
+        context.ui_queue.put(("error", f"Failed to write the metrics report: {e}"))
+
+
+def _print_messages(ui_queue: queue.Queue, counters: dict, verbose: bool):
+    """Console stand-in for the GUI's check_queue loop."""
+    while True:
+        message = ui_queue.get()
+        if message is None:
+            return
+        msg_type, data = message
+        if msg_type == "error":
+            counters["errors"] += 1
+            print(f"ERROR: {data}")
+        elif msg_type == "update_status":
+            print(data)
+        elif msg_type == "task_update":
+            _, url, field, value = data
+            if field == "status":
+                print(f"{url}: {value}")
+            elif verbose:
+                print(f"--- {field}: {url} ---\n{value}")
+
+
+def start_console(verbose: bool = False) -> tuple[queue.Queue, dict, threading.Thread]:
+    """
+    Returns (ui_queue, counters, printer thread) for a headless run; put None
+    on the queue and join the thread once the run is done.
+    """
+    ui_queue = queue.Queue()
+    counters = {"errors": 0}
+    printer = threading.Thread(
+        target=_print_messages, args=(ui_queue, counters, verbose), daemon=True
+    )
+    printer.start()
+    return ui_queue, counters, printer
+
+
+def _read_inputs(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def add_processing_arguments(parser: argparse.ArgumentParser):
+    """The options that control how each task is fetched and processed."""
+    parser.add_argument(
+        "--selenium", action="store_true", help="Fetch pages with Selenium."
+    )
+    parser.add_argument(
+        "--fetch",
+        choices=("jina", "direct", "selenium", "auto"),
+        default="jina",
+        help="Fetch mode; auto tries direct HTTP, Jina, then Selenium and "
+        "remembers what worked per domain.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker pool size."
+    )
+    parser.add_argument(
+        "--prompt", default=None, help="Prompt name from prompts.yaml."
+    )
+    parser.add_argument("--model", default="gemini-1.5-flash-latest")
+    parser.add_argument(
+        "--no-page-cache",
+        action="store_true",
+        help="Always fetch pages from the network.",
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Always call the model, ignoring cached responses.",
+    )
+    parser.add_argument(
+        "--llm-batch",
+        type=int,
+        default=LLM_BATCH_SIZE,
+        help="Listings per LLM request (1 disables batching). "
+        "Use at least as many workers for full batches.",
+    )
+    parser.add_argument(
+        "--convert-workers",
+        type=int,
+        default=CONVERT_WORKERS,
+        help="Processes converting HTML and compacting markdown (0: in the worker threads).",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Send every copy of a duplicated listing to the model.",
+    )
+    parser.add_argument(
+        "--no-compact",
+        action="store_true",
+        help="Send the full page markdown to the model.",
+    )
+    parser.add_argument(
+        "--proxy", default=PROXY_URL, help="Proxy URL (defaults to PROXY_URL)."
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print fetched and processed text."
+    )
+
+
+def context_from_args(
+    parser: argparse.ArgumentParser, args, ui_queue: queue.Queue, run_id: str, **fields
+) -> ProcessingContext:
+    """
+    Builds the ProcessingContext for the add_processing_arguments() options;
+    `fields` sets the remaining ProcessingContext fields.
+    """
+    prompts = load_prompts()
+    prompt_name = args.prompt or next(iter(prompts))
+    if prompt_name not in prompts:
+        parser.error(f"Unknown prompt {prompt_name!r}. Choose from: {', '.join(prompts)}")
+
+    return ProcessingContext(
+        api_key=JINA_API_KEY,
+        use_proxy=bool(args.proxy),
+        proxy_url=args.proxy or "",
+        ui_queue=ui_queue,
+        user_prompt_template=USER_PROMPT_TEMPLATE,
+        system_prompt_text=prompts[prompt_name],
+        model_name=args.model,
+        run_id=run_id,
+        use_fetch_cache=not args.no_page_cache,
+        fetch_mode="selenium" if args.selenium else args.fetch,
+        use_llm_cache=not args.no_llm_cache,
+        compact_markdown=not args.no_compact,
+        llm_batch_size=max(1, args.llm_batch),
+        convert_workers=max(0, args.convert_workers),
+        deduplicate=not args.no_dedup,
+        **fields,
+    )
+
+
+def print_summary(stats: BatchStats, counters: dict):
+    print(
+        f"Done: {stats.total} items in {stats.elapsed:.1f}s "
+        f"({stats.items_per_sec:.2f} items/sec), {counters['errors']} errors, "
+        f"LLM cache {stats.llm_cache_hits} hits / {stats.llm_cache_misses} misses, "
+        f"{stats.duplicates} duplicates reused."
+    )
+    if stats.metrics_report:
+        print(f"Stage timings: {stats.metrics_report}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Process a file of URLs or SE numbers without the GUI."
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        help="Text file with one URL or SE number per line (not needed with --resume).",
+    )
+    parser.add_argument(
+        "--se", action="store_true", help="Treat the inputs as SE numbers."
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("pool", "async"),
+        default="pool",
+        help="Thread pool or asyncio engine (see logic/async_pipeline.py).",
+    )
+    parser.add_argument(
+        "--format",
+        default="xlsx",
+        help=f"Comma-separated result formats: {', '.join(SINK_TYPES)}.",
+    )
+    parser.add_argument(
+        "--no-save", action="store_true", help="Do not save results to a file."
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        default=None,
+        help="Continue an interrupted run, skipping the items it already saved.",
+    )
+    add_processing_arguments(parser)
+    args = parser.parse_args(argv)
+
+    run_id = args.resume or datetime.now().strftime("%Y%m%d_%H%M%S")
+    if args.resume:
+        if not RunJournal.exists(args.resume):
+            parser.error(f"No journal found for run {args.resume!r}.")
+        journal = RunJournal(args.resume)
+        tasks = resume_tasks(journal)
+        inputs = journal.tasks() + journal.unresolved_se_numbers()
+        print(f"Resuming run {args.resume}: {journal.summary()}")
+        journal.close()
+    elif args.input:
+        inputs = _read_inputs(args.input)
+        tasks = tasks_for_inputs(inputs, args.se, run_id) if inputs else []
+    else:
+        parser.error("An input file is required unless --resume is given.")
+    if not inputs:
+        print("Nothing to process.")
+        return 1
+
+    ui_queue, counters, printer = start_console(args.verbose)
+    context = context_from_args(
+        parser,
+        args,
+        ui_queue,
+        run_id=run_id,
+        save_excel=not args.no_save,
+        output_formats=tuple(f.strip() for f in args.format.split(",") if f.strip()),
+        resume=bool(args.resume),
+    )
+
+    print(f"Run {context.run_id}: processing...")
+    def on_progress(done, total):
+        print(f"[{done}/{total}]")
+
+    if args.engine == "async":
+        # Imported here to avoid a circular import, async_pipeline builds on this module.
+        from logic.async_pipeline import run_async_pipeline
+
+        stats = run_async_pipeline(
+            list(tasks), context, use_selenium=args.selenium, on_progress=on_progress
+        )
+    else:
+        stats = run_tasks(
+            tasks,
+            context,
+            use_selenium=args.selenium,
+            max_workers=args.workers,
+            on_progress=on_progress,
+        )
+    ui_queue.put(None)
+    printer.join()
+    close_session()
+    shutdown_driver_pools()
+
+    print_summary(stats, counters)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
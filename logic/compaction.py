@@ -0,0 +1,142 @@
+"""
+Markdown compaction before the LLM call.
+
+Page markdown from Jina or Selenium often carries repeated boilerplate, link
+lists and agent footers. compact_markdown strips that, then enforces a
+per-model token budget so prompts stay small and within context limits.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+
+from config import COMPACTION_TOKEN_BUDGET
+
+# Rough budgets for the page content only, leaving room for the system prompt
+# and the answer. Matched by model name prefix, longest prefix wins.
+MODEL_TOKEN_BUDGETS = {
+    "gemini": 30000,
+    "gpt-4o": 16000,
+    "gpt-4": 8000,
+    "claude": 16000,
+}
+DEFAULT_TOKEN_BUDGET = 8000
+
+# A cheap, dependency-free estimate that is close enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+# Shorter lines (field values like "3" or "Yes") legitimately repeat.
+MIN_DEDUP_LINE_CHARS = 30
+
+# Share of the budget kept from the end of the page when truncating; the
+# tail often holds price, contact and reference details.
+TAIL_SHARE = 0.2
+
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_BARE_URL_RE = re.compile(r"^<?https?://\S+>?$")
+_SPACES_RE = re.compile(r"[ \t ]+")
+# Bullets, separators and table pipes left over once the links are gone. Digits
+# only as an ordered list marker: "3 | [Agent](...)" is a table row with data.
+_LINK_LIST_LEFTOVER_RE = re.compile(r"^\s*(?:\d+[.)]\s)?[\s\-*+•·|/>]*$")
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+    truncated: bool = False
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def token_budget(model_name: str) -> int:
+    """Returns the content token budget for a model."""
+    if COMPACTION_TOKEN_BUDGET > 0:
+        return COMPACTION_TOKEN_BUDGET
+    matches = [p for p in MODEL_TOKEN_BUDGETS if model_name.startswith(p)]
+    if not matches:
+        return DEFAULT_TOKEN_BUDGET
+    return MODEL_TOKEN_BUDGETS[max(matches, key=len)]
+
+
+def _is_link_list_line(line: str) -> bool:
+    """True for lines made of links only, such as navigation or 'similar listings'."""
+    if "](" not in line:
+        return bool(_BARE_URL_RE.match(line))
+    without_links = _LINK_RE.sub("", line)
+    return bool(_LINK_LIST_LEFTOVER_RE.match(without_links))
+
+
+def _clean_lines(md: str) -> list[str]:
+    seen = set()
+    lines = []
+    for line in md.splitlines():
+        line = _IMAGE_RE.sub("", line)
+        line = _SPACES_RE.sub(" ", line).strip()
+        if not line or _is_link_list_line(line):
+            continue
+        # Keep the text of inline links, the URLs are noise for extraction.
+        line = _LINK_RE.sub(r"\1", line).strip()
+        if not line:
+            continue
+        if len(line) >= MIN_DEDUP_LINE_CHARS:
+            key = line.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+    return lines
+
+
+def _truncate(lines: list[str], budget: int) -> list[str]:
+    """Keeps whole lines from the head and the tail so the total fits the budget."""
+    max_chars = budget * CHARS_PER_TOKEN
+    tail_chars = int(max_chars * TAIL_SHARE)
+    head_chars = max_chars - tail_chars
+
+    head, used = [], 0
+    for line in lines:
+        if used + len(line) + 1 > head_chars:
+            break
+        head.append(line)
+        used += len(line) + 1
+    consumed = len(head)
+    if not head and lines:
+        # A single huge first line, cut it rather than dropping it entirely.
+        head = [lines[0][:head_chars]]
+        consumed = 1
+
+    tail, used = [], 0
+    for line in reversed(lines[consumed:]):
+        if used + len(line) + 1 > tail_chars:
+            break
+        tail.append(line)
+        used += len(line) + 1
+    tail.reverse()
+
+    omitted = len(lines) - consumed - len(tail)
+    marker = f"[... {omitted} lines omitted ...]" if omitted else "[... truncated ...]"
+    return head + [marker] + tail
+
+
+def compact_markdown(md: str, model_name: str) -> CompactionResult:
+    """Collapses whitespace, drops repeated lines and link lists, and fits the model budget."""
+    original_tokens = estimate_tokens(md)
+    lines = _clean_lines(md)
+
+    budget = token_budget(model_name)
+    truncated = estimate_tokens("\n".join(lines)) > budget
+    if truncated:
+        lines = _truncate(lines, budget)
+
+    text = "\n".join(lines)
+    return CompactionResult(
+        text=text,
+        original_tokens=original_tokens,
+        compacted_tokens=estimate_tokens(text),
+        truncated=truncated,
+    )
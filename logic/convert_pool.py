@@ -0,0 +1,198 @@
+"""
+Worker processes for the CPU-heavy text work of a run.
+
+Converting fetched HTML to markdown (Selenium and direct fetches) and
+compacting markdown for the model (the clean stage) are pure Python CPU
+work. In the fetch and clean threads they hold the GIL against the HTTP, LLM
+and UI threads, so a run converts one page at a time however many cores the
+machine has. A ConvertPool runs them in CONVERT_WORKERS processes instead.
+
+Jobs that arrive while every worker is busy are sent together, up to
+CONVERT_CHUNK_SIZE per round trip, so small pages do not pay one pipe
+round trip each. Pages of at least CONVERT_SHM_MIN_KB are put in a shared
+memory block and only its name goes through the pool's pipe.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Iterable
+
+from config import CONVERT_CHUNK_SIZE, CONVERT_SHM_MIN_KB, CONVERT_WORKERS
+from logic.compaction import CompactionResult, compact_markdown
+from logic.html_cleaner import html_to_markdown
+
+# kind -> function(payload, argument), run in the worker processes.
+JOBS = {
+    "html": html_to_markdown,
+    "compact": compact_markdown,
+}
+
+
+class ConvertError(Exception):
+    """A conversion failed in a worker process."""
+
+
+class _SharedPage:
+    """Reference to a page placed in shared memory; `text` pages are decoded back to str."""
+
+    __slots__ = ("name", "size", "text")
+
+    def __init__(self, name: str, size: int, text: bool):
+        self.name = name
+        self.size = size
+        self.text = text
+
+
+def _share(payload) -> tuple[shared_memory.SharedMemory, _SharedPage]:
+    text = isinstance(payload, str)
+    data = payload.encode("utf-8") if text else payload
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    block.buf[: len(data)] = data
+    return block, _SharedPage(block.name, len(data), text)
+
+
+def _read_shared(page: _SharedPage):
+    block = shared_memory.SharedMemory(name=page.name)
+    try:
+        data = bytes(block.buf[: page.size])
+    finally:
+        block.close()
+    # Pages from Selenium arrive as str; decoding restores them exactly, while
+    # bytes would let lxml guess the charset from the page's meta tag.
+    return data.decode("utf-8") if page.text else data
+
+
+def _run_chunk(jobs: list[tuple]) -> list[tuple[bool, object]]:
+    """Runs in a worker: (ok, result or error message) for every (kind, payload, arg)."""
+    results = []
+    for kind, payload, arg in jobs:
+        try:
+            if isinstance(payload, _SharedPage):
+                payload = _read_shared(payload)
+            results.append((True, JOBS[kind](payload, arg)))
+        except Exception as e:
+            # Messages rather than exceptions, which are not always picklable.
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class ConvertPool:
+    """
+    Sends conversion jobs from any thread to worker processes.
+
+    run() blocks the calling thread until its job is done. A job is sent as
+    soon as a worker is free; jobs that queue up meanwhile are sent together
+    when the next one is. If the pool breaks (a worker was killed), the jobs
+    are converted in the calling thread from then on.
+    """
+
+    def __init__(
+        self,
+        workers: int = CONVERT_WORKERS,
+        chunk_size: int = CONVERT_CHUNK_SIZE,
+        shm_min_bytes: int = CONVERT_SHM_MIN_KB * 1024,
+    ):
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.shm_min_bytes = shm_min_bytes
+        # spawn, not fork: the parent runs threads (and Tk in the GUI), which
+        # a forked child would inherit in an undefined state.
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._pending: list[tuple[str, object, object, Future]] = []
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._broken = False
+        self.chunks = 0
+        self.jobs = 0
+        self.shared_pages = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, payload, arg) -> Future:
+        """Queues JOBS[kind](payload, arg); the Future resolves to its result."""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The conversion pool is closed.")
+            self._pending.append((kind, payload, arg, future))
+            self._cond.notify()
+        return future
+
+    def run(self, kind: str, payload, arg):
+        """Runs one job in a worker and returns its result; raises ConvertError if it failed."""
+        if not self._broken:
+            try:
+                return self.submit(kind, payload, arg).result()
+            except BrokenProcessPool:
+                if not self._broken:
+                    print("Warning: the conversion pool broke, converting in-process.")
+                self._broken = True
+        return JOBS[kind](payload, arg)
+
+    def html_to_markdown(self, html, selectors: Iterable[str]) -> str:
+        return self.run("html", html, tuple(selectors))
+
+    def compact_markdown(self, md: str, model_name: str) -> CompactionResult:
+        return self.run("compact", md, model_name)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending or self._in_flight >= self.workers:
+                    if self._closed and not self._pending:
+                        return
+                    self._cond.wait()
+                chunk = self._pending[: self.chunk_size]
+                self._pending = self._pending[self.chunk_size :]
+                self._in_flight += 1
+            self._send(chunk)
+
+    def _send(self, chunk: list[tuple[str, object, object, Future]]):
+        blocks, jobs = [], []
+        try:
+            for kind, payload, arg, _ in chunk:
+                if isinstance(payload, (str, bytes)) and len(payload) >= self.shm_min_bytes:
+                    block, payload = _share(payload)
+                    blocks.append(block)
+                jobs.append((kind, payload, arg))
+            self.chunks += 1
+            self.jobs += len(jobs)
+            self.shared_pages += len(blocks)
+            sent = self._executor.submit(_run_chunk, jobs)
+        except Exception as e:
+            self._chunk_done(chunk, blocks, error=e)
+            return
+        sent.add_done_callback(lambda done: self._chunk_done(chunk, blocks, done=done))
+
+    def _chunk_done(self, chunk, blocks, done: Future = None, error: Exception = None):
+        for block in blocks:
+            block.close()
+            block.unlink()
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+        if error is None:
+            error = done.exception()
+        if error is not None:
+            for *_, future in chunk:
+                future.set_exception(error)
+            return
+        for (*_, future), (ok, result) in zip(chunk, done.result()):
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(ConvertError(result))
+
+    def close(self):
+        """Converts whatever is still queued and stops the worker processes."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,231 @@
+"""
+Per-run detection of listings that were already sent to the model.
+
+Agencies post the same property under several SE ids and URLs. Two checks
+catch the copies:
+
+- URLs are normalized (scheme, host, tracking parameters, fragments, ...)
+  and a page whose normalized URL is already being fetched waits for that
+  fetch instead of downloading it again.
+- The cleaned markdown is fingerprinted with an exact hash and a 64-bit
+  SimHash of word shingles. A listing whose SimHash is within
+  DEDUP_MAX_DISTANCE bits of an earlier one, and whose numbers (price, area,
+  rooms, ...) largely agree with it, is a near duplicate.
+
+A duplicate reuses the processed result of the first copy and records that
+copy's key in Task.duplicate_of. A listing only becomes a first copy when a
+worker starts processing it, so waiting on it can never deadlock the stages.
+"""
+
+import hashlib
+import re
+import threading
+from concurrent.futures import Future
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import DEDUP_MAX_DISTANCE, DEDUP_MIN_NUMBER_OVERLAP
+
+# Query parameters that never change the page content: prefixes and exact names.
+TRACKING_PREFIXES = ("utm_", "mc_")
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "yclid", "_ga", "ref"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_NUMBER_RE = re.compile(r"\d[\d.,\s]*\d|\d")
+# Markdown link and image targets differ between copies (CDN urls, tracking).
+_LINK_TARGET_RE = re.compile(r"\]\([^)]*\)")
+SHINGLE_SIZE = 3
+# Shorter texts have too few shingles for a meaningful SimHash; only exact matches count.
+MIN_SHINGLES = 20
+
+
+def normalize_url(url: str) -> str:
+    """A canonical form of `url` for duplicate checks (not for fetching)."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or "/"
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not (key.lower().startswith(TRACKING_PREFIXES) or key.lower() in TRACKING_PARAMS)
+    )
+    # http and https serve the same listing.
+    scheme = "https" if scheme == "http" else scheme
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(_LINK_TARGET_RE.sub("]", text).lower().split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(_normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of the word shingles of `text`, or None for very short texts."""
+    words = _WORD_RE.findall(_normalize_text(text))
+    shingles = {
+        " ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    digests = (
+        hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles
+    )
+    bits = [format(int.from_bytes(digest, "big"), "064b") for digest in digests]
+    # Column-wise vote: bit i is set when most shingle hashes have it set.
+    half = len(bits) / 2
+    value = 0
+    for column in zip(*bits):
+        value = (value << 1) | (column.count("1") > half)
+    return value
+
+
+def numbers_of(text: str) -> frozenset:
+    """
+    The numbers in `text` that describe a listing (prices, areas, years),
+    separators removed so "1.250.000" matches "1,250,000". Single digits are
+    too common to tell listings apart, and 9+ digits are phone numbers or ids
+    that differ between agencies.
+    """
+    found = _NUMBER_RE.findall(_LINK_TARGET_RE.sub("]", text))
+    numbers = (re.sub(r"[.,\s]", "", number) for number in found)
+    return frozenset(n for n in numbers if 2 <= len(n) <= 8)
+
+
+def _overlap(a: frozenset, b: frozenset) -> float:
+    """Share of the numbers of the listing with fewer numbers that the other one has too."""
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+class _Original:
+    """The first copy of a listing; `result` resolves to its processed text (None on failure)."""
+
+    __slots__ = ("key", "digest", "simhash", "numbers", "result")
+
+    def __init__(self, key: str, digest: str, fingerprint: Optional[int], numbers: frozenset):
+        self.key = key
+        self.digest = digest
+        self.simhash = fingerprint
+        self.numbers = numbers
+        self.result = Future()
+
+
+class DedupIndex:
+    def __init__(
+        self,
+        max_distance: int = DEDUP_MAX_DISTANCE,
+        min_number_overlap: float = DEDUP_MIN_NUMBER_OVERLAP,
+    ):
+        self.max_distance = max_distance
+        self.min_number_overlap = min_number_overlap
+        # Any two SimHashes within max_distance bits agree on at least one of
+        # max_distance + 1 bands, so only listings sharing a band are compared.
+        self._bands = max(1, max_distance + 1)
+        self._band_bits = 64 // self._bands
+        self._lock = threading.Lock()
+        # normalized URL -> (first task key, Future of its markdown, first Task)
+        self._urls: dict[str, tuple[str, Future, object]] = {}
+        self._exact: dict[str, _Original] = {}
+        self._by_band: dict[tuple[int, int], list[_Original]] = {}
+        # id() of the Task -> the _Original it registered, until resolve().
+        # Not the key, which copies of one input line share.
+        self._open: dict[int, _Original] = {}
+        self.hits = {"url": 0, "exact": 0, "near": 0}
+
+    def claim_url(self, task) -> Optional[tuple[str, Future]]:
+        """
+        Returns (first task key, Future of its markdown) when the task's
+        normalized URL is already being fetched. Otherwise the caller fetches
+        it and must call finish_url().
+        """
+        url = normalize_url(task.url)
+        with self._lock:
+            claimed = self._urls.get(url)
+            # Claims belong to Task objects, not keys: the same input line
+            # twice gives two tasks with one key, and the second must wait.
+            if claimed is not None and claimed[2] is not task:
+                self.hits["url"] += 1
+                return claimed[0], claimed[1]
+            self._urls[url] = (task.key(), Future(), task)
+        return None
+
+    def finish_url(self, task, md_content: Optional[str]):
+        """Hands the fetched markdown (None when the fetch failed) to the waiting copies."""
+        url = normalize_url(task.url)
+        with self._lock:
+            claimed = self._urls.get(url)
+            if claimed is None or claimed[2] is not task or claimed[1].done():
+                return
+            if md_content is None:
+                # Let the next copy try the fetch itself.
+                del self._urls[url]
+            claimed[1].set_result(md_content)
+
+    def _bands_of(self, fingerprint: int):
+        mask = (1 << self._band_bits) - 1
+        for band in range(self._bands):
+            yield band, (fingerprint >> (band * self._band_bits)) & mask
+
+    def match(self, task, text: str) -> Optional[tuple[str, str, Future]]:
+        """
+        Returns (kind, first copy's key, Future of its processed text) when
+        `text` duplicates a listing that is or was being processed, kind being
+        "exact" or "near". Otherwise registers the task as a first copy, and
+        the caller must call resolve() once it has the processed text.
+        """
+        digest = content_hash(text)
+        fingerprint = simhash(text)
+        numbers = numbers_of(text)
+        with self._lock:
+            original = self._exact.get(digest)
+            if original is not None:
+                self.hits["exact"] += 1
+                return "exact", original.key, original.result
+            if fingerprint is not None:
+                seen = set()
+                for band in self._bands_of(fingerprint):
+                    for candidate in self._by_band.get(band, ()):
+                        if id(candidate) in seen:
+                            continue
+                        seen.add(id(candidate))
+                        if (
+                            bin(candidate.simhash ^ fingerprint).count("1") <= self.max_distance
+                            and _overlap(candidate.numbers, numbers) >= self.min_number_overlap
+                        ):
+                            self.hits["near"] += 1
+                            return "near", candidate.key, candidate.result
+
+            original = _Original(task.key(), digest, fingerprint, numbers)
+            self._exact[digest] = original
+            if fingerprint is not None:
+                for band in self._bands_of(fingerprint):
+                    self._by_band.setdefault(band, []).append(original)
+            self._open[id(task)] = original
+        return None
+
+    def resolve(self, task, processed_text: Optional[str]):
+        """
+        Publishes the first copy's processed text to its duplicates. A failed
+        answer (None) is withdrawn, so later copies are processed themselves.
+        """
+        with self._lock:
+            original = self._open.pop(id(task), None)
+            if original is None:
+                return
+            if processed_text is None:
+                del self._exact[original.digest]
+                if original.simhash is not None:
+                    for band in self._bands_of(original.simhash):
+                        self._by_band[band].remove(original)
+        original.result.set_result(processed_text)
@@ -0,0 +1,203 @@
+"""
+Pool of warm Chrome drivers for the Selenium fetcher.
+
+Starting uc.Chrome costs several seconds and hundreds of MB, so drivers are
+created lazily up to the pool size, leased per task, reset between pages and
+only recycled after SELENIUM_MAX_PAGES pages or when the browser grows past
+SELENIUM_MAX_MEMORY_MB.
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from config import (
+    SELENIUM_HEADLESS,
+    SELENIUM_MAX_MEMORY_MB,
+    SELENIUM_MAX_PAGES,
+    SELENIUM_WORKERS,
+)
+from logic.registry import load, load_optional
+
+# uc.Chrome patches the chromedriver binary on start, which is not safe to do
+# from several threads at once.
+_create_lock = threading.Lock()
+
+_CLEAR_STORAGE_SCRIPT = """
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+"""
+
+_JS_HEAP_SCRIPT = (
+    "return window.performance && performance.memory "
+    "? performance.memory.usedJSHeapSize : 0;"
+)
+
+
+class DriverPool:
+    """A bounded pool of reusable Chrome drivers sharing one set of options."""
+
+    def __init__(
+        self,
+        size: int = SELENIUM_WORKERS,
+        proxy_url: Optional[str] = None,
+        headless: bool = SELENIUM_HEADLESS,
+        max_pages: int = SELENIUM_MAX_PAGES,
+        max_memory_mb: int = SELENIUM_MAX_MEMORY_MB,
+    ):
+        self.size = max(1, size)
+        self.proxy_url = proxy_url
+        self.headless = headless
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+
+        self._idle = queue.LifoQueue()
+        self._pages = {}
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create_driver(self):
+        # undetected_chromedriver and Selenium are imported with the first driver.
+        uc = load("uc")
+        chrome_options = uc.ChromeOptions()
+        chrome_options.add_argument("--disable-gpu")
+        if self.headless:
+            chrome_options.add_argument("--headless=new")
+        if self.proxy_url:
+            chrome_options.add_argument(f"--proxy-server={self.proxy_url}")
+
+        with _create_lock:
+            driver = uc.Chrome(options=chrome_options, use_subprocess=True)
+        # A simple wait for elements to appear.
+        # For more complex pages, explicit waits (WebDriverWait) are more robust.
+        driver.implicitly_wait(5)
+        return driver
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                break
+            # Poll instead of blocking forever: a recycled driver frees a
+            # slot without ever coming back to the idle queue.
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+        try:
+            driver = self._create_driver()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        self._pages[id(driver)] = 0
+        return driver
+
+    def _memory_mb(self, driver) -> float:
+        """Resident memory of the browser process tree, or the JS heap as a fallback."""
+        pid = getattr(driver, "browser_pid", None)
+        psutil = load_optional("psutil") if pid else None
+        if psutil is not None:
+            try:
+                proc = psutil.Process(pid)
+                procs = [proc] + proc.children(recursive=True)
+                return sum(p.memory_info().rss for p in procs) / (1024 * 1024)
+            except psutil.Error:
+                pass
+        return (driver.execute_script(_JS_HEAP_SCRIPT) or 0) / (1024 * 1024)
+
+    def _reset(self, driver):
+        """Brings a driver back to a clean single blank tab."""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        # Storage is per origin, so clear it before leaving the page.
+        driver.execute_script(_CLEAR_STORAGE_SCRIPT)
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def _discard(self, driver):
+        self._pages.pop(id(driver), None)
+        with self._lock:
+            self._created -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _release(self, driver, broken: bool):
+        self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+        recycle = broken or self._closed or self._pages[id(driver)] >= self.max_pages
+        if not recycle:
+            web_driver_error = load("WebDriverException")
+            try:
+                recycle = self._memory_mb(driver) > self.max_memory_mb
+                if not recycle:
+                    self._reset(driver)
+            except web_driver_error:
+                recycle = True
+
+        if recycle:
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+
+    @contextmanager
+    def lease(self):
+        """Leases a driver for one page; it is reset or recycled on return."""
+        driver = self._acquire()
+        web_driver_error = load("WebDriverException")
+        broken = False
+        try:
+            yield driver
+        except web_driver_error:
+            broken = True
+            raise
+        finally:
+            self._release(driver, broken)
+
+    def close(self):
+        """Quits all idle drivers; leased ones are quit when returned."""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_driver_pool(proxy_url: Optional[str] = None) -> DriverPool:
+    """Returns the shared pool for the given proxy, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(proxy_url)
+        if pool is None:
+            pool = DriverPool(proxy_url=proxy_url)
+            _pools[proxy_url] = pool
+        return pool
+
+
+def shutdown_driver_pools():
+    """Closes every shared driver pool."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
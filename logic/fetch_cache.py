@@ -0,0 +1,167 @@
+"""
+On-disk cache for fetched page markdown.
+
+Entries are keyed by URL, fetch mode and the exclusion selectors, stored
+gzip-compressed under data/cache/pages, expire after a per-entry TTL and are
+evicted least-recently-used first once the directory exceeds its size cap.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from config import FETCH_CACHE_MAX_MB, FETCH_CACHE_TTL_HOURS
+
+CACHE_DIR = "data/cache/pages"
+_SUFFIX = ".json.gz"
+
+
+class FetchCache:
+    """A size-bounded, TTL-aware markdown cache backed by one file per entry."""
+
+    def __init__(
+        self,
+        directory: str = CACHE_DIR,
+        ttl_seconds: float = FETCH_CACHE_TTL_HOURS * 3600,
+        max_bytes: int = FETCH_CACHE_MAX_MB * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @staticmethod
+    def make_key(url: str, mode: str, selectors: str) -> str:
+        return hashlib.sha256(f"{mode}\n{url}\n{selectors}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + _SUFFIX)
+
+    def get(self, url: str, mode: str, selectors: str) -> Optional[str]:
+        """Returns the cached markdown, or None if missing or expired."""
+        path = self._path(self.make_key(url, mode, selectors))
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Truncated or corrupt entry, treat as a miss.
+            self._remove(path)
+            return None
+
+        if entry["expires_at"] < time.time():
+            self._remove(path)
+            return None
+
+        # The file mtime doubles as the LRU timestamp.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["content"]
+
+    def put(
+        self,
+        url: str,
+        mode: str,
+        selectors: str,
+        content: str,
+        ttl_seconds: Optional[float] = None,
+    ):
+        """Stores markdown for the key, evicting old entries if the cap is exceeded."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        path = self._path(self.make_key(url, mode, selectors))
+        entry = {
+            "url": url,
+            "mode": mode,
+            "stored_at": time.time(),
+            "expires_at": time.time() + ttl,
+            "content": content,
+        }
+        # Runs in other processes write to the same cache; thread ids alone can repeat.
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(entry, f)
+            size = os.path.getsize(tmp_path)
+        except OSError as e:
+            self._write_failed(tmp_path, e)
+            return
+
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            try:
+                os.replace(tmp_path, path)
+            except OSError as e:
+                self._write_failed(tmp_path, e)
+                return
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += size - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(_SUFFIX):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Removes least recently used entries until 90% of the cap is free."""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+        self._total_bytes = total
+
+    def _write_failed(self, tmp_path: str, error: OSError):
+        """The cache is best-effort: a full or read-only disk must not fail the task."""
+        print(f"Warning: could not write to the fetch cache: {error}")
+        self._remove(tmp_path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                self._remove(path)
+            self._total_bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_fetch_cache() -> FetchCache:
+    """Returns the shared page cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FetchCache()
+        return _cache
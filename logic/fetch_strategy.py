@@ -0,0 +1,135 @@
+"""
+Per-domain memory of the cheapest fetch strategy that works.
+
+The tiered fetcher tries direct HTTP, then Jina Reader, then Selenium, and
+escalates when a tier fails or returns something that does not look like a
+listing (see looks_complete). The tier that finally worked is remembered per
+domain in data/cache/fetch_strategies.json, so later tasks and later runs
+start there instead of probing the cheaper tiers again. Once a remembered
+tier is older than FETCH_STRATEGY_TTL_HOURS, one task probes the domain from
+the cheapest tier again, so domains that stopped blocking de-escalate.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+from config import FETCH_MIN_CHARS, FETCH_STRATEGY_TTL_HOURS
+
+STRATEGY_FILE = "data/cache/fetch_strategies.json"
+
+# Cheapest first.
+TIERS = ("direct", "jina", "selenium")
+
+# Phrases of bot walls, consent gates and JavaScript-only shells.
+BLOCK_MARKERS = (
+    "enable javascript",
+    "javascript is disabled",
+    "javascript is required",
+    "checking your browser",
+    "just a moment...",
+    "access denied",
+    "captcha",
+    "are you a robot",
+    "request unsuccessful",
+)
+
+
+def looks_complete(md_content: str, min_chars: int = FETCH_MIN_CHARS) -> bool:
+    """
+    Heuristic quality check for fetched markdown: long enough and not a bot
+    wall. Block markers only count on short pages, where they are the content.
+    """
+    text = md_content.strip()
+    if len(text) < min_chars:
+        return False
+    if len(text) < min_chars * 10:
+        lowered = text.lower()
+        return not any(marker in lowered for marker in BLOCK_MARKERS)
+    return True
+
+
+def task_domain(task) -> str:
+    return (task.domain or urlparse(task.url).hostname or "").lower()
+
+
+class StrategyMemory:
+    def __init__(self, path: str = STRATEGY_FILE, ttl_hours: float = FETCH_STRATEGY_TTL_HOURS):
+        self.path = path
+        # 0 keeps every remembered tier for good.
+        self.ttl = ttl_hours * 3600
+        self._lock = threading.Lock()
+        # domain -> {"tier": ..., "updated_at": ...}
+        self._domains: dict[str, dict] = {}
+        # domain -> when a task last re-probed its expired tier (not saved)
+        self._probes: dict[str, float] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._domains = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable fetch strategy file {path}: {e}")
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return bool(self.ttl) and now - entry.get("updated_at", 0) > self.ttl
+
+    def get(self, domain: str) -> Optional[str]:
+        """
+        The tier to start `domain` at, or None to start at the cheapest. When
+        the remembered tier has expired, one caller gets None and re-probes,
+        while the others keep the remembered tier until it records a result.
+        """
+        with self._lock:
+            entry = self._domains.get(domain)
+            if not entry or entry.get("tier") not in TIERS:
+                return None
+            now = time.time()
+            if (
+                entry["tier"] != TIERS[0]
+                and self._expired(entry, now)
+                and now - self._probes.get(domain, 0) > self.ttl
+            ):
+                self._probes[domain] = now
+                return None
+            return entry["tier"]
+
+    def record(self, domain: str, tier: str):
+        """Remembers `tier` as the starting tier for `domain` and saves the file."""
+        if not domain:
+            return
+        with self._lock:
+            entry = self._domains.get(domain, {})
+            now = time.time()
+            # A re-probe that lands on the same tier still renews it.
+            if entry.get("tier") == tier and not self._expired(entry, now):
+                return
+            self._domains[domain] = {"tier": tier, "updated_at": now}
+            snapshot = json.dumps(self._domains, indent=2, sort_keys=True)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            self._domains = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+_memory: Optional[StrategyMemory] = None
+_memory_lock = threading.Lock()
+
+
+def get_strategy_memory() -> StrategyMemory:
+    global _memory
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                _memory = StrategyMemory()
+    return _memory
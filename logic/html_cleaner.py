@@ -0,0 +1,230 @@
+"""
+Local HTML cleaning and HTML-to-markdown conversion.
+
+html_to_markdown() removes SELECTORS_TO_REMOVE and renders the remaining
+document as compact markdown (no blank lines, no links or images) in one
+pass over an lxml tree, several times faster than markdownify on large
+listing pages. Without lxml it falls back to BeautifulSoup and markdownify
+with the same selector handling. Works on HTML from any source: the
+Selenium page source, a plain HTTP download or a saved file.
+
+    python -m benchmarks.html_cleaner page.html
+compares both engines for speed and output equivalence.
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable
+
+from logic.registry import load
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+SELECTORS_TO_REMOVE = (
+    "script", "style", "noscript", "iframe", "header", "footer", "nav", "aside",
+    ".header", ".footer", ".nav", ".menu", ".sidebar", ".ads", ".advertisement",
+    ".social", ".breadcrumbs", ".comments", ".related", ".popup", ".subscribe",
+    ".newsletter", ".cookie", ".cookie-banner", ".modal", "#comments", "#footer",
+    "#header", "img", "picture",
+)
+EXCLUDE_SELECTOR = ",".join(SELECTORS_TO_REMOVE)
+
+# Tags markdownify is told to unwrap, as the Selenium fetcher always did. Links
+# keep their text this way; the lxml engine renders them as plain text.
+MARKDOWNIFY_STRIP = ["a", "img", "script", "style", "svg", "button"]
+
+# Tags whose content never reaches the markdown.
+_DROP = {"script", "style", "noscript", "template", "head", "img", "picture", "svg", "iframe"}
+_BLOCKS = {
+    "address", "article", "aside", "dd", "details", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "header", "main", "nav", "ol", "p",
+    "section", "summary", "table", "ul", "body", "html", "caption",
+}
+_HEADINGS = {f"h{n}": "#" * n for n in range(1, 7)}
+_INLINE_MARKS = {"strong": "**", "b": "**", "em": "*", "i": "*"}
+
+_SIMPLE_SELECTOR_RE = re.compile(r"^([a-zA-Z][\w-]*)?(?:([.#])([\w-]+))?$")
+_WS_RE = re.compile(r"\s+")
+_SPACES_RE = re.compile(r" {2,}")
+
+
+@lru_cache(maxsize=16)
+def _parse_selectors(selectors: tuple) -> tuple[frozenset, frozenset, frozenset]:
+    """
+    Splits tag, .class, #id, tag.class and tag#id selectors into (tags,
+    (tag, class) pairs, (tag, id) pairs); a tag of None matches any tag.
+    """
+    tags, classes, ids = set(), set(), set()
+    for selector in selectors:
+        match = _SIMPLE_SELECTOR_RE.match(selector.strip())
+        if not match or not any(match.groups()):
+            raise ValueError(f"Unsupported selector {selector!r}: use tag, .class or #id.")
+        tag, kind, name = match.groups()
+        tag = tag.lower() if tag else None
+        if kind == ".":
+            classes.add((tag, name))
+        elif kind == "#":
+            ids.add((tag, name))
+        else:
+            tags.add(tag)
+    return frozenset(tags), frozenset(classes), frozenset(ids)
+
+
+def _matches(root, selectors: tuple) -> list:
+    """Elements matching any of `selectors`, found in a single pass over the tree."""
+    tags, classes, ids = _parse_selectors(selectors)
+    matched = []
+    for el in root.iter(etree.Element):
+        tag = el.tag.lower() if isinstance(el.tag, str) else el.tag
+        if tag in tags:
+            matched.append(el)
+            continue
+        if ids:
+            el_id = el.get("id")
+            if el_id and ((None, el_id) in ids or (tag, el_id) in ids):
+                matched.append(el)
+                continue
+        if classes:
+            el_classes = el.get("class")
+            if el_classes and any(
+                (None, c) in classes or (tag, c) in classes for c in el_classes.split()
+            ):
+                matched.append(el)
+    return matched
+
+
+def _tidy(text: str) -> str:
+    """Strips every line and drops the blank ones."""
+    lines = (_SPACES_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _inline(el) -> str:
+    out = []
+    _render_children(el, out)
+    return _WS_RE.sub(" ", "".join(out)).strip()
+
+
+def _render_children(el, out: list):
+    if el.text:
+        out.append(_WS_RE.sub(" ", el.text))
+    for child in el:
+        _render(child, out)
+        # The tail belongs to the parent, even when the child is dropped.
+        if child.tail:
+            out.append(_WS_RE.sub(" ", child.tail))
+
+
+def _render(el, out: list):
+    tag = el.tag
+    if not isinstance(tag, str):
+        # Comments and processing instructions.
+        return
+    tag = tag.lower()
+
+    if tag in _DROP:
+        return
+    if tag == "br":
+        out.append("\n")
+    elif tag == "hr":
+        out.append("\n---\n")
+    elif tag in _HEADINGS:
+        text = _inline(el)
+        if text:
+            out.append(f"\n{_HEADINGS[tag]} {text}\n")
+    elif tag in _INLINE_MARKS:
+        text = _inline(el)
+        if text:
+            mark = _INLINE_MARKS[tag]
+            out.append(f"{mark}{text}{mark}")
+    elif tag == "code":
+        text = _inline(el)
+        if text:
+            out.append(f"`{text}`")
+    elif tag == "pre":
+        out.append(f"\n```\n{el.text_content()}\n```\n")
+    elif tag == "li":
+        parent = el.getparent()
+        if parent is not None and parent.tag == "ol":
+            prefix = f"{parent.index(el) + 1}. "
+        else:
+            prefix = "- "
+        out.append("\n" + prefix)
+        _render_children(el, out)
+        out.append("\n")
+    elif tag == "tr":
+        cells = [_inline(cell) for cell in el if cell.tag in ("td", "th")]
+        if any(cells):
+            out.append("\n| " + " | ".join(cells) + " |\n")
+            table = next(el.iterancestors("table"), None)
+            if table is not None and next(table.iter("tr"), None) is el:
+                out.append("| " + " | ".join("---" for _ in cells) + " |\n")
+    elif tag == "blockquote":
+        inner = []
+        _render_children(el, inner)
+        quoted = "\n".join(f"> {line}" for line in _tidy("".join(inner)).splitlines())
+        out.append(f"\n{quoted}\n")
+    else:
+        block = tag in _BLOCKS
+        if block:
+            out.append("\n")
+        _render_children(el, out)
+        if block:
+            out.append("\n")
+
+
+def _parse(html):
+    if isinstance(html, str) and html.lstrip().startswith("<?xml"):
+        # lxml refuses str input that carries its own encoding declaration.
+        html = html.encode("utf-8")
+    return lxml.html.document_fromstring(html)
+
+
+def _html_to_markdown_lxml(html, selectors: tuple) -> str:
+    try:
+        root = _parse(html)
+    except etree.ParserError:
+        # "Document is empty"
+        return ""
+    if selectors:
+        for el in _matches(root, selectors):
+            el.drop_tree()
+    out = []
+    body = root.find("body")
+    _render(body if body is not None else root, out)
+    return _tidy("".join(out))
+
+
+def _html_to_markdown_markdownify(html, selectors: tuple) -> str:
+    from bs4 import BeautifulSoup
+
+    MarkdownConverter = load("MarkdownConverter")
+
+    soup = BeautifulSoup(html, "html.parser")
+    if selectors:
+        for el in soup.select(",".join(selectors)):
+            el.decompose()
+    converter = MarkdownConverter(strip=MARKDOWNIFY_STRIP)
+    return _tidy(converter.convert_soup(soup))
+
+
+def html_to_markdown(
+    html,
+    selectors: Iterable[str] = SELECTORS_TO_REMOVE,
+    engine: str = "auto",
+) -> str:
+    """
+    Removes the elements matching `selectors` from `html` (str or bytes) and
+    returns the rest as markdown without blank lines. `engine` is "lxml",
+    "markdownify" or "auto" (lxml when installed).
+    """
+    selectors = tuple(selectors)
+    if engine == "auto":
+        engine = "lxml" if lxml is not None else "markdownify"
+    if engine == "lxml":
+        return _html_to_markdown_lxml(html, selectors)
+    return _html_to_markdown_markdownify(html, selectors)
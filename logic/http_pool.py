@@ -0,0 +1,77 @@
+"""
+Shared, pooled HTTP session for all HTTP fetchers.
+
+A single session keeps connections to r.jina.ai (and any other host) alive
+between tasks, so each listing does not pay a fresh TCP and TLS handshake.
+With HTTP2_ENABLED=1 and httpx[http2] installed an httpx client is used
+instead of requests.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP2_ENABLED, HTTP_POOL_SIZE
+from logic.registry import load_optional
+
+# Exceptions that callers should treat as a failed request; httpx's are added
+# when the session is an httpx client.
+_errors = (requests.exceptions.RequestException,)
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    global _errors
+    if HTTP2_ENABLED:
+        httpx = load_optional("httpx")
+        if httpx is not None:
+            try:
+                client = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=HTTP_POOL_SIZE,
+                        max_keepalive_connections=HTTP_POOL_SIZE,
+                    ),
+                    follow_redirects=True,
+                )
+            except ImportError:
+                # httpx is installed without the h2 extra.
+                pass
+            else:
+                _errors = (requests.exceptions.RequestException, httpx.HTTPError)
+                return client
+        print("Warning: HTTP/2 requested but httpx[http2] is not installed. Using HTTP/1.1.")
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, pool_block=True
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def http_errors() -> tuple:
+    """Exceptions a request through get_session() raises on failure."""
+    return _errors
+
+
+def get_session():
+    """Returns the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def close_session():
+    """Closes the shared session and its pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
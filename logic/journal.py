@@ -0,0 +1,161 @@
+"""
+Append-only checkpoint journal per run.
+
+data/results/journal_{run_id}.jsonl records every task of the run and each
+stage it reaches (fetched, processed, saved). The fetched markdown and the
+processed text are stored gzip-compressed under data/results/.artifacts_{run_id},
+named by their SHA-256, and the journal keeps those hashes. A resumed run
+replays the journal, skips saved tasks and restarts the others from their
+last stage.
+"""
+
+import dataclasses
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from logic.models import Task
+
+DATA_DIR = "data/results"
+
+STAGES = ("fetched", "processed", "saved")
+
+
+class RunJournal:
+    def __init__(self, run_id: str, directory: str = DATA_DIR):
+        self.run_id = run_id
+        self.path = os.path.join(directory, f"journal_{run_id}.jsonl")
+        self.artifact_dir = os.path.join(directory, f".artifacts_{run_id}")
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._tasks: dict[str, Task] = {}
+        # task key -> {stage: artifact sha256 or None}
+        self._stages: dict[str, dict[str, Optional[str]]] = {}
+        # Raw SE number inputs, resolved lazily while the run goes.
+        self._se_numbers: list[str] = []
+        self._replay()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    @staticmethod
+    def exists(run_id: str, directory: str = DATA_DIR) -> bool:
+        return os.path.exists(os.path.join(directory, f"journal_{run_id}.jsonl"))
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash, everything before it is valid.
+                    continue
+                key = entry.get("key")
+                if entry.get("event") == "task":
+                    self._tasks.setdefault(key, Task(**entry["task"]))
+                elif entry.get("event") == "se_numbers":
+                    self._se_numbers.extend(entry["numbers"])
+                elif entry.get("event") == "stage":
+                    self._stages.setdefault(key, {})[entry["stage"]] = entry.get("sha256")
+
+    def _append(self, entry: dict):
+        entry["ts"] = time.time()
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def add_tasks(self, tasks: list[Task]):
+        """Records tasks so a resumed run can rebuild its task list."""
+        for task in tasks:
+            key = task.key()
+            with self._lock:
+                if key in self._tasks:
+                    continue
+                self._tasks[key] = task
+            self._append({"event": "task", "key": key, "task": dataclasses.asdict(task)})
+
+    def add_se_numbers(self, se_numbers: list[str]):
+        """
+        Records a run's SE number inputs before they are resolved, so a
+        resumed run can resolve the ones that never became tasks.
+        """
+        with self._lock:
+            self._se_numbers.extend(se_numbers)
+        self._append({"event": "se_numbers", "numbers": list(se_numbers)})
+
+    def unresolved_se_numbers(self) -> list[str]:
+        """SE number inputs without a journaled task (not reached, or not found)."""
+        with self._lock:
+            return [se for se in dict.fromkeys(self._se_numbers) if f"se:{se}" not in self._tasks]
+
+    def tasks(self) -> list[Task]:
+        with self._lock:
+            return list(self._tasks.values())
+
+    def _store_artifact(self, content: str) -> str:
+        data = content.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.artifact_dir, sha + ".gz")
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return sha
+
+    def artifact(self, sha: str) -> Optional[str]:
+        """Returns a stored artifact, or None if it is missing or does not match its hash."""
+        try:
+            with gzip.open(os.path.join(self.artifact_dir, sha + ".gz"), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != sha:
+            return None
+        return data.decode("utf-8")
+
+    def record(self, task: Task, stage: str, content: Optional[str] = None):
+        """Records that a task reached `stage`, storing `content` as its artifact."""
+        sha = self._store_artifact(content) if content is not None else None
+        key = task.key()
+        with self._lock:
+            self._stages.setdefault(key, {})[stage] = sha
+        self._append({"event": "stage", "key": key, "stage": stage, "sha256": sha})
+
+    def state(self, task: Task) -> dict[str, Optional[str]]:
+        """Returns {stage: sha256} for the stages the task has reached."""
+        with self._lock:
+            return dict(self._stages.get(task.key(), {}))
+
+    def resume_point(self, task: Task) -> tuple[Optional[str], Optional[str], bool]:
+        """
+        Returns (markdown, processed text, saved) recovered from the journal.
+        Stages whose artifacts are missing or corrupt are redone.
+        """
+        state = self.state(task)
+        if "saved" in state:
+            return None, None, True
+        md_content = self.artifact(state["fetched"]) if state.get("fetched") else None
+        processed = None
+        if md_content is not None and state.get("processed"):
+            processed = self.artifact(state["processed"])
+        return md_content, processed, False
+
+    def summary(self) -> dict[str, int]:
+        """Counts tasks by the furthest stage they reached."""
+        counts = {stage: 0 for stage in ("pending",) + STAGES}
+        with self._lock:
+            for key in self._tasks:
+                reached = [s for s in STAGES if s in self._stages.get(key, {})]
+                counts[reached[-1] if reached else "pending"] += 1
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._file.close()
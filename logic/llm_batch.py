@@ -0,0 +1,209 @@
+"""
+Multi-listing batched LLM requests.
+
+Packs several compacted listings into one process_md call with per-item
+delimiters and a JSON response format, so the long shared system prompt is
+sent once per batch instead of once per listing. Items whose answer cannot
+be parsed out of the batch response are retried on their own.
+"""
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from config import LLM_BATCH_CONCURRENCY, LLM_BATCH_MAX_WAIT_SECONDS
+from logic.llm_cache import get_llm_cache
+from logic.processing import _build_prompts, process_md
+
+BATCH_INSTRUCTIONS = """
+
+You will receive several independent items, each wrapped in <item id="N"> ... </item>.
+Apply the instructions above to every item separately.
+Respond with a single JSON object and nothing else, in this exact format:
+{"results": [{"id": N, "output": "<your complete answer for item N>"}]}
+Include one entry for every item id.
+"""
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def _pack(user_prompts: list[str]) -> str:
+    return "\n\n".join(
+        f'<item id="{i}">\n{prompt}\n</item>' for i, prompt in enumerate(user_prompts)
+    )
+
+
+def _parse_batch_response(response: str, count: int) -> dict[int, str]:
+    """Extracts {item id: output} from a batch answer, skipping anything malformed."""
+    text = _FENCE_RE.sub("", response.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start : end + 1])
+    except ValueError:
+        return {}
+
+    outputs = {}
+    results = data.get("results") if isinstance(data, dict) else None
+    for entry in results if isinstance(results, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            item_id = int(entry.get("id"))
+        except (TypeError, ValueError):
+            continue
+        output = entry.get("output")
+        if output is None or not 0 <= item_id < count:
+            continue
+        # Prompts that ask for JSON may get an object back instead of a string.
+        if not isinstance(output, str):
+            output = json.dumps(output, ensure_ascii=False, indent=2)
+        outputs[item_id] = output
+    return outputs
+
+
+def process_md_batch(
+    items: list[str],
+    user_prompt_template,
+    system_prompt_text,
+    model_name: str,
+    use_cache: bool = True,
+) -> list[str]:
+    """
+    Processes several markdown documents with one model call and returns the
+    outputs in input order. Cached items are not sent; unparsable ones are
+    retried individually through process_md.
+    """
+    cache = get_llm_cache() if use_cache else None
+    prompts = [
+        _build_prompts(md, user_prompt_template, system_prompt_text) for md in items
+    ]
+    results: list[Optional[str]] = [None] * len(items)
+
+    pending = []
+    for i, (system_prompt, user_prompt) in enumerate(prompts):
+        cached = cache.get(model_name, system_prompt, user_prompt) if cache else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    if len(pending) > 1:
+        response = process_md(
+            _pack([prompts[i][1] for i in pending]),
+            "{content}",
+            system_prompt_text.strip() + BATCH_INSTRUCTIONS,
+            model_name,
+            use_cache=False,
+        )
+        outputs = _parse_batch_response(response, len(pending))
+        for batch_id, i in enumerate(pending):
+            if batch_id in outputs:
+                results[i] = outputs[batch_id]
+                if cache:
+                    # Stored under the single-item key, so later runs hit it
+                    # whether or not they batch, and with any grouping.
+                    cache.put(model_name, *prompts[i], outputs[batch_id])
+
+    for i, md in enumerate(items):
+        if results[i] is None:
+            results[i] = process_md(
+                md, user_prompt_template, system_prompt_text, model_name, use_cache
+            )
+    return results
+
+
+class LLMBatcher:
+    """
+    Collects markdown from many workers into batches of up to `batch_size`.
+
+    submit() returns a Future for the item's processed text. A batch is sent
+    when it is full or LLM_BATCH_MAX_WAIT_SECONDS after its first item
+    arrived, so a batch never waits on workers that will not come.
+    """
+
+    def __init__(
+        self,
+        user_prompt_template,
+        system_prompt_text,
+        model_name: str,
+        batch_size: int,
+        use_cache: bool = True,
+        max_wait: float = LLM_BATCH_MAX_WAIT_SECONDS,
+        concurrency: int = LLM_BATCH_CONCURRENCY,
+    ):
+        self.user_prompt_template = user_prompt_template
+        self.system_prompt_text = system_prompt_text
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.use_cache = use_cache
+        self.max_wait = max_wait
+
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._pending: list[tuple[str, Future]] = []
+        self._first_at = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, md: str) -> Future:
+        future = Future()
+        with self._cond:
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append((md, future))
+            self._cond.notify()
+        return future
+
+    def _take_batch(self) -> list[tuple[str, Future]]:
+        batch = self._pending[: self.batch_size]
+        self._pending = self._pending[self.batch_size :]
+        self._first_at = time.monotonic()
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending:
+                        waited = time.monotonic() - self._first_at
+                        if (
+                            len(self._pending) >= self.batch_size
+                            or waited >= self.max_wait
+                            or self._closed
+                        ):
+                            batch = self._take_batch()
+                            break
+                        self._cond.wait(self.max_wait - waited)
+                    elif self._closed:
+                        return
+                    else:
+                        self._cond.wait()
+            self._executor.submit(self._process, batch)
+
+    def _process(self, batch: list[tuple[str, Future]]):
+        try:
+            outputs = process_md_batch(
+                [md for md, _ in batch],
+                self.user_prompt_template,
+                self.system_prompt_text,
+                self.model_name,
+                self.use_cache,
+            )
+        except Exception as e:
+            outputs = [f"An error occurred while batching LLM requests: {e}"] * len(batch)
+        for (_, future), output in zip(batch, outputs):
+            future.set_result(output)
+
+    def close(self):
+        """Sends whatever is still pending and waits for all batches to finish."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
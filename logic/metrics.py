@@ -0,0 +1,269 @@
+"""
+Per-stage timing metrics for a run.
+
+The stages report latency, bytes and token counts through stage_timer() or
+RunMetrics.observe(), labelled by fetch mode, model or sink. Each (stage,
+label) pair keeps a latency histogram; each Task keeps its own row. When the
+run ends, batch_run writes data/results/metrics_{run_id}.json (the summary)
+and metrics_{run_id}.csv (one row per task). With METRICS_PORT set, the live
+histograms of every running run are also served in the Prometheus text format
+at http://localhost:{METRICS_PORT}/metrics.
+"""
+
+import csv
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from logic.fetch_strategy import task_domain
+from logic.rate_limit import limiter_states
+
+DATA_DIR = "data/results"
+
+# Histogram bucket upper bounds in seconds, Prometheus style.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Latencies kept per series for the percentiles; a uniform sample beyond that.
+SAMPLE_LIMIT = 10000
+
+SIZE_FIELDS = ("bytes", "tokens", "output_tokens")
+
+
+class _Series:
+    """Latency histogram plus size counters for one (stage, label) pair."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.samples: list[float] = []
+        self.sizes = dict.fromkeys(SIZE_FIELDS, 0)
+
+    def add(self, seconds: float, sizes: dict):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        if len(self.samples) < SAMPLE_LIMIT:
+            self.samples.append(seconds)
+        else:
+            # Reservoir sampling keeps the sample uniform over the whole run.
+            slot = random.randrange(self.count)
+            if slot < SAMPLE_LIMIT:
+                self.samples[slot] = seconds
+        for field in SIZE_FIELDS:
+            self.sizes[field] += sizes.get(field) or 0
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 4),
+            "mean_s": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50_s": round(self.percentile(0.5), 4),
+            "p95_s": round(self.percentile(0.95), 4),
+            "max_s": round(self.max, 4),
+            **self.sizes,
+        }
+
+
+class RunMetrics:
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str], _Series] = {}
+        # task key -> flat row for the CSV report
+        self._tasks: dict[str, dict] = {}
+
+    def observe(self, stage: str, seconds: float, label: str = "", task=None, **sizes):
+        """Records one stage latency; `sizes` may hold bytes, tokens and output_tokens."""
+        with self._lock:
+            series = self._series.get((stage, label))
+            if series is None:
+                series = self._series[(stage, label)] = _Series()
+            series.add(seconds, sizes)
+            if task is not None:
+                row = self._tasks.get(task.key())
+                if row is None:
+                    row = self._tasks[task.key()] = {
+                        "task": task.key(),
+                        "url": task.url,
+                        "domain": task_domain(task),
+                    }
+                row[f"{stage}_s"] = round(row.get(f"{stage}_s", 0.0) + seconds, 4)
+                if label:
+                    row[f"{stage}_label"] = label
+                for field, value in sizes.items():
+                    if value:
+                        row[f"{stage}_{field}"] = row.get(f"{stage}_{field}", 0) + value
+
+    @contextmanager
+    def timer(self, stage: str, label: str = "", task=None):
+        """
+        Times the block. It receives a dict in which it may set bytes,
+        tokens, output_tokens or a more specific label.
+        """
+        extra = {}
+        started = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            label = extra.pop("label", label)
+            self.observe(stage, time.perf_counter() - started, label, task, **extra)
+
+    def task_rows(self) -> list[dict]:
+        """Copies of the per-task rows, as written to the CSV report."""
+        with self._lock:
+            return [dict(row) for row in self._tasks.values()]
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = [
+                {"stage": stage, "label": label, **series.summary()}
+                for (stage, label), series in sorted(self._series.items())
+            ]
+            rows = list(self._tasks.values())
+
+        per_domain: dict[str, list[float]] = {}
+        for row in rows:
+            if "fetch_s" in row:
+                per_domain.setdefault(row["domain"], []).append(row["fetch_s"])
+        slowest = sorted(
+            (
+                {
+                    "domain": domain,
+                    "tasks": len(times),
+                    "mean_fetch_s": round(sum(times) / len(times), 4),
+                }
+                for domain, times in per_domain.items()
+            ),
+            key=lambda entry: entry["mean_fetch_s"],
+            reverse=True,
+        )
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "elapsed_s": round(time.time() - self.started_at, 3),
+            "tasks": len(rows),
+            "stages": stages,
+            "slowest_domains": slowest[:20],
+            # Process-wide, so they also count earlier runs of the same session.
+            "rate_limits": limiter_states(),
+        }
+
+    def write_report(self, directory: str = DATA_DIR) -> str:
+        """Writes the JSON summary and the per-task CSV; returns the JSON path."""
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, f"metrics_{self.run_id}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+        with self._lock:
+            rows = list(self._tasks.values())
+        columns = ["task", "url", "domain"]
+        columns += sorted({key for row in rows for key in row} - set(columns))
+        csv_path = os.path.join(directory, f"metrics_{self.run_id}.csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        return json_path
+
+    def render_prometheus(self) -> str:
+        """The histograms in the Prometheus text exposition format (without headers)."""
+        lines = []
+        with self._lock:
+            for (stage, label), series in sorted(self._series.items()):
+                labels = f'run_id="{self.run_id}",stage="{stage}",label="{label}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, series.buckets):
+                    cumulative += count
+                    lines.append(
+                        f'jina_helper_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(
+                    f'jina_helper_stage_seconds_bucket{{{labels},le="+Inf"}} {series.count}'
+                )
+                lines.append(f"jina_helper_stage_seconds_sum{{{labels}}} {series.total}")
+                lines.append(f"jina_helper_stage_seconds_count{{{labels}}} {series.count}")
+                for field in SIZE_FIELDS:
+                    if series.sizes[field]:
+                        lines.append(
+                            f"jina_helper_stage_{field}_total{{{labels}}} {series.sizes[field]}"
+                        )
+        return "\n".join(lines)
+
+
+def stage_timer(context, stage: str, label: str = "", task=None):
+    """metrics.timer for the run's RunMetrics, or a no-op when the run has none."""
+    metrics = getattr(context, "metrics", None)
+    if metrics is None:
+        return nullcontext({})
+    return metrics.timer(stage, label, task)
+
+
+# Runs in progress, rendered by the Prometheus endpoint.
+_active: dict[str, RunMetrics] = {}
+_active_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def register_run(metrics: RunMetrics):
+    with _active_lock:
+        _active[metrics.run_id] = metrics
+
+
+def unregister_run(metrics: RunMetrics):
+    with _active_lock:
+        _active.pop(metrics.run_id, None)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        with _active_lock:
+            runs = list(_active.values())
+        header = [
+            "# HELP jina_helper_stage_seconds Latency of a pipeline stage per task.",
+            "# TYPE jina_helper_stage_seconds histogram",
+        ]
+        body = "\n".join(header + [m.render_prometheus() for m in runs]) + "\n"
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int):
+    """Serves /metrics on `port` from a daemon thread; later calls are no-ops."""
+    global _server
+    with _active_lock:
+        if _server is not None or not port:
+            return
+        try:
+            _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        except OSError as e:
+            print(f"Warning: could not start the metrics endpoint on port {port}: {e}")
+            return
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
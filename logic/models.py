@@ -1,6 +1,6 @@
 import queue
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Optional
 
 
 @dataclass
@@ -15,6 +15,26 @@ class Task:
     rent_status: str = None
     subtype: str = None
     type: str = None
+    # Key of the task whose processed result this one reused, see logic/dedup.py.
+    duplicate_of: Optional[str] = None
+
+    def key(self) -> str:
+        """A stable identifier for the task within and across runs."""
+        if self.source_estate_id is not None:
+            return f"se:{self.source_estate_id}"
+        return self.url
+
+
+@dataclass
+class PipelineItem:
+    """A task on its way through the pipeline stages, with each stage's output."""
+
+    task: Task
+    # Status message shown when the task finishes, extended by each stage.
+    status: str = ""
+    md_content: Optional[str] = None
+    llm_input: Optional[str] = None
+    processed_text: Optional[str] = None
 
 
 @dataclass
@@ -30,3 +50,36 @@ class ProcessingContext:
     save_excel: bool
     model_name: str
     run_id: str
+    use_fetch_cache: bool = True
+    # "jina", "direct", "selenium" or "auto" (cheapest that works, per domain),
+    # see logic/fetch_strategy.py.
+    fetch_mode: str = "jina"
+    use_llm_cache: bool = True
+    # Strip boilerplate and fit the model's token budget before process_md.
+    compact_markdown: bool = True
+    # Result file formats written when save_excel is on, see logic/sinks.py.
+    output_formats: tuple = ("xlsx",)
+    # Listings packed into one LLM request; 1 disables batching.
+    llm_batch_size: int = 1
+    # Worker processes for HTML conversion and compaction; 0 keeps them in
+    # the fetch and clean threads, see logic/convert_pool.py.
+    convert_workers: int = 0
+    # Send unbatched model answers to the UI while they are generated.
+    stream_llm: bool = False
+    # Reuse the model answer of earlier copies of a listing (DEDUP_ENABLED).
+    deduplicate: bool = True
+    # Set by the runner for the duration of a run when save_excel is on.
+    results_sink: Optional[Any] = None
+    # Set by the runner for the duration of a run when llm_batch_size > 1.
+    llm_batcher: Optional[Any] = None
+    # Set by the runner for the duration of a run when convert_workers > 0.
+    convert_pool: Optional[Any] = None
+    # Set by the runner for the duration of a run, see logic/journal.py.
+    journal: Optional[Any] = None
+    # Set by the runner for the duration of a run, see logic/metrics.py.
+    metrics: Optional[Any] = None
+    # Set by the runner for the duration of a run, see logic/dedup.py.
+    dedup: Optional[Any] = None
+    # Skip tasks the journal marks as saved and restart the others from their
+    # last finished stage.
+    resume: bool = False
@@ -0,0 +1,211 @@
+"""
+Staged streaming pipeline: resolve -> fetch -> clean -> LLM -> sink.
+
+Each stage is a small pool of worker threads reading from a bounded queue
+and writing to the next one, so a slow stage blocks its producers instead
+of letting work pile up in memory, and the first listing reaches the sink
+while the rest of the batch is still being resolved. The stage functions
+live in logic/processing.py; this module only wires them together.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from config import (
+    MAX_WORKERS,
+    PIPELINE_CLEAN_WORKERS,
+    PIPELINE_LLM_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    SELENIUM_WORKERS,
+)
+from logic.models import ProcessingContext, Task
+from logic.processing import clean_stage, fetch_stage, llm_stage, sink_stage
+
+# Passed down the queues once the upstream stage has finished.
+_DONE = object()
+
+
+class Stage:
+    """
+    `workers` threads applying `func` to the items of `inbox`. A result other
+    than None goes to `outbox`; None (or any result of the last stage) means
+    the item is finished and is passed to `on_finished`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        workers: int,
+        inbox: queue.Queue,
+        outbox: Optional[queue.Queue],
+        context: ProcessingContext,
+        on_finished: Callable[[object], None],
+    ):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.context = context
+        self.on_finished = on_finished
+        self._running = max(1, workers)
+        self._lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            for i in range(self._running)
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def _work(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                # Leave the marker for the sibling workers; the last one out
+                # tells the next stage.
+                self.inbox.put(_DONE)
+                with self._lock:
+                    self._running -= 1
+                    last = self._running == 0
+                if last and self.outbox is not None:
+                    self.outbox.put(_DONE)
+                return
+
+            try:
+                result = self.func(item)
+            except Exception as e:
+                # Stage functions report their own errors, anything escaping
+                # them is a bug and should still not stop the run.
+                self.context.ui_queue.put(("error", f"Task crashed in {self.name}: {e}"))
+                result = None
+            if result is None or self.outbox is None:
+                self.on_finished(item)
+            else:
+                self.outbox.put(result)
+
+
+class Pipeline:
+    def __init__(
+        self,
+        context: ProcessingContext,
+        use_selenium: bool = False,
+        fetch_workers: Optional[int] = None,
+        clean_workers: int = PIPELINE_CLEAN_WORKERS,
+        llm_workers: int = PIPELINE_LLM_WORKERS,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        on_task_done: Optional[Callable[[Task], None]] = None,
+    ):
+        """
+        `on_task_done(task)` is called from the stage threads for every task
+        that left the pipeline, whether it reached the sink stage or not.
+        """
+        if fetch_workers is None:
+            selenium = use_selenium or context.fetch_mode == "selenium"
+            fetch_workers = SELENIUM_WORKERS if selenium else MAX_WORKERS
+        # LLM workers block on the batcher's futures, fewer than a batch would
+        # keep every batch waiting for its timeout.
+        llm_workers = max(llm_workers, context.llm_batch_size)
+
+        self.context = context
+        self.on_progress = on_progress
+        self.on_task_done = on_task_done
+        self.resolved = 0
+        self.finished = 0
+        self._lock = threading.Lock()
+
+        to_fetch, to_clean, to_llm, to_sink = (
+            queue.Queue(maxsize=max(1, queue_size)) for _ in range(4)
+        )
+        self.to_fetch = to_fetch
+        self.stages = [
+            Stage(
+                "fetch",
+                lambda task: fetch_stage(task, context, use_selenium),
+                fetch_workers,
+                to_fetch,
+                to_clean,
+                context,
+                self._finished,
+            ),
+            Stage(
+                "clean",
+                lambda item: clean_stage(item, context),
+                clean_workers,
+                to_clean,
+                to_llm,
+                context,
+                self._finished,
+            ),
+            Stage(
+                "llm",
+                lambda item: llm_stage(item, context),
+                llm_workers,
+                to_llm,
+                to_sink,
+                context,
+                self._finished,
+            ),
+            # The result sinks have their own writer thread, one worker only
+            # hands rows over.
+            Stage(
+                "sink",
+                lambda item: sink_stage(item, context),
+                1,
+                to_sink,
+                None,
+                context,
+                self._finished,
+            ),
+        ]
+
+    def _finished(self, item):
+        if self.on_task_done:
+            # The fetch stage takes Tasks, the later ones PipelineItems.
+            self.on_task_done(item if isinstance(item, Task) else item.task)
+        with self._lock:
+            self.finished += 1
+            done, total = self.finished, self.resolved
+        if self.on_progress:
+            self.on_progress(done, total)
+
+    def _resolve(self, tasks: Iterable[Task]):
+        """Feeds tasks to the fetch stage as the input iterator yields them."""
+        metrics = self.context.metrics
+        try:
+            iterator = iter(tasks)
+            while True:
+                started = time.perf_counter()
+                task = next(iterator, None)
+                if task is None:
+                    break
+                if metrics is not None:
+                    # Mostly instant; the wait for each SE lookup chunk shows up here.
+                    metrics.observe("resolve", time.perf_counter() - started, "", task)
+                if self.context.journal is not None:
+                    self.context.journal.add_tasks([task])
+                with self._lock:
+                    self.resolved += 1
+                self.to_fetch.put(task)
+        except Exception as e:
+            self.context.ui_queue.put(("error", f"Failed to resolve inputs: {e}"))
+        finally:
+            self.to_fetch.put(_DONE)
+
+    def run(self, tasks: Iterable[Task]) -> int:
+        """
+        Streams `tasks` (any iterable, e.g. a lazy SE number lookup) through
+        the stages, blocks until the last one is done and returns the number
+        of tasks resolved.
+        """
+        for stage in self.stages:
+            stage.start()
+        self._resolve(tasks)
+        for stage in self.stages:
+            for thread in stage.threads:
+                thread.join()
+        return self.resolved
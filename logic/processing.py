@@ -1,258 +1,611 @@
-import os
+import asyncio
+import time
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional
 
-import openpyxl
-from openpyxl.styles import Alignment
-from openpyxl.utils import get_column_letter
-import google.generativeai as genai
 import requests
-import undetected_chromedriver as uc
-from g4f.client import Client
-from markdownify import markdownify as md
-from selenium.common.exceptions import WebDriverException
 
-from logic.models import ProcessingContext, Task
-
-DATA_DIR = "data/results"
-
-SELECTORS_TO_REMOVE = (
-    "script, style, noscript, iframe, header, footer, nav, aside,"
-    ".header, .footer, .nav, .menu, .sidebar, .ads, .advertisement,"
-    ".social, .breadcrumbs, .comments, .related, .popup, .subscribe,"
-    ".newsletter, .cookie, .cookie-banner, .modal, #comments, #footer, #header"
-    "img, picture, a"
+from config import JINA_READER_URL, STREAM_UPDATE_SECONDS
+
+from logic.compaction import compact_markdown, estimate_tokens
+from logic.driver_pool import get_driver_pool
+from logic.fetch_cache import get_fetch_cache
+from logic.fetch_strategy import TIERS, get_strategy_memory, looks_complete, task_domain
+from logic.html_cleaner import EXCLUDE_SELECTOR, SELECTORS_TO_REMOVE, html_to_markdown
+from logic.http_pool import get_session, http_errors
+from logic.llm_cache import get_llm_cache
+from logic.metrics import stage_timer
+from logic.models import PipelineItem, ProcessingContext, Task
+from logic.providers import ProviderError, get_provider
+from logic.rate_limit import (
+    RateLimitError,
+    call_with_limits,
+    call_with_limits_async,
+    parse_retry_after,
 )
 
-# Instantiate the client once at the module level for reuse and performance.
-g4f_client = Client()
 
-# Configure the Gemini client.
-# It's good practice to configure the API key once at the module level.
-# The user should set the GOOGLE_API_KEY environment variable.
-if "GOOGLE_API_KEY" in os.environ:
-    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-else:
-    print("Warning: GOOGLE_API_KEY environment variable not set. Gemini models will not work.")
+def load_resume_point(task: Task, context: ProcessingContext):
+    """
+    For resumed runs, returns (markdown, processed text, skip) recovered from
+    the run journal; skip is True for tasks that were already saved.
+    """
+    if context.journal is None or not context.resume:
+        return None, None, False
+    md_content, processed_text, saved = context.journal.resume_point(task)
+    if saved:
+        post_task_update(context, task, "status", "Already saved, skipped (resume)")
+    return md_content, processed_text, saved
 
 
-def save_to_excel(
-    task: Task,
-    md_content,
-    processed_content,
-    run_id: str,
+def journal_stage(
+    context: ProcessingContext, task: Task, stage: str, content: Optional[str] = None
 ):
-    """Saves the provided data to a daily Excel file in the data/results directory."""
-    try:
-        os.makedirs(DATA_DIR, exist_ok=True)
-        excel_file = os.path.join(DATA_DIR, f"results_{run_id}.xlsx")
-
-        write_header = not os.path.exists(excel_file)
-
-        if write_header:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            sheet.title = "Processed Data"
-            header = [
-                "Domain", "Source Estate ID", "Source ID", "URL",
-                "Status", "Rent Status", "Subtype", "Type", "Processed Content",
-            ]
-            sheet.append(header)
-        else:
-            workbook = openpyxl.load_workbook(excel_file)
-            sheet = workbook.active
-
-        # Append the new row of data
-        sheet.append([
-            task.domain, task.source_estate_id, task.source_id, task.url,
-            task.status, task.rent_status, task.subtype, task.type,
-            processed_content,
-        ])
-
-        # Set text wrapping for the "Processed Content" cell in the newly added row
-        last_row_num = sheet.max_row
-        processed_content_cell = sheet.cell(row=last_row_num, column=9)  # Column 'I'
-        processed_content_cell.alignment = Alignment(wrap_text=True, vertical='top')
-
-        # Adjust column widths for readability
-        for i, column_cells in enumerate(sheet.columns, 1):
-            column_letter = get_column_letter(i)
-
-            if column_letter == 'I':  # Processed Content
-                sheet.column_dimensions[column_letter].width = 80
-            elif column_letter == 'D':  # URL
-                sheet.column_dimensions[column_letter].width = 60
-            else:
-                # Calculate max length for other columns
-                max_length = max(
-                    (len(str(cell.value)) for cell in column_cells if cell.value),
-                    default=0
-                )
-                # Set a slightly larger width, with a reasonable minimum for headers
-                adjusted_width = max(max_length + 2, 15)
-                sheet.column_dimensions[column_letter].width = adjusted_width
-
-        workbook.save(excel_file)
-        return True, f"Saved to {os.path.basename(excel_file)}"
-    except (IOError, openpyxl.utils.exceptions.InvalidFileException) as e:
-        return False, f"Failed to save to Excel: {e}"
-    except Exception as e:
-        return False, f"An unexpected error occurred while saving to Excel: {e}"
+    """Records a finished stage in the run journal; failed LLM answers are not recorded."""
+    if context.journal is None:
+        return
+    if stage == "processed" and is_error_result(content):
+        return
+    context.journal.record(task, stage, content)
+
 
+def compact_for_llm(md_content: str, context: ProcessingContext) -> tuple[str, str]:
+    """Returns the markdown to send to the model and a status note with token counts."""
+    if not context.compact_markdown:
+        return md_content, ""
+    if context.convert_pool is not None:
+        result = context.convert_pool.compact_markdown(md_content, context.model_name)
+    else:
+        result = compact_markdown(md_content, context.model_name)
+    note = f" | ~{result.original_tokens} -> {result.compacted_tokens} tokens"
+    if result.truncated:
+        note += " (truncated)"
+    return result.text, note
 
-def _process_and_save_markdown(
+
+def report_result(
     md_content: str,
+    processed_text: str,
     task: Task,
     context: ProcessingContext,
     success_message_prefix: str,
 ):
-    """Helper to process MD, update UI, and save results."""
-    context.ui_queue.put(("update_text", ("raw", md_content)))
-
-    processed_text = process_md(
-        md_content,
-        context.user_prompt_template,
-        context.system_prompt_text,
-        context.model_name,
-    )
-    context.ui_queue.put(("update_text", ("processed", processed_text)))
+    """Shows the processed text, hands the result to the run's sink and updates the status."""
+    post_task_update(context, task, "processed", processed_text)
 
+    # Failed answers are written but not journaled, so a resume retries them.
+    failed = is_error_result(processed_text)
     status_message = success_message_prefix
-    if context.save_excel:
-        success, message = save_to_excel(
-            task, md_content, processed_text, context.run_id
-        )
-        status_message += f" | {message}"
-        if not success:
-            context.ui_queue.put(("error", message))
+    if context.results_sink is not None:
+        sink = context.results_sink
+        queued_at = time.perf_counter()
+
+        def on_saved():
+            # Time from handing the row over until it is flushed to disk.
+            if context.metrics is not None:
+                context.metrics.observe(
+                    "sink", time.perf_counter() - queued_at, sink.name, task
+                )
+            if not failed:
+                journal_stage(context, task, "saved")
+
+        sink.write(task, md_content, processed_text, on_saved=on_saved)
+        status_message += f" | Queued for {sink.name}"
+    elif not failed:
+        journal_stage(context, task, "saved")
+
+    post_task_update(context, task, "status", status_message)
+
+
+def report_fetch_error(context: ProcessingContext, task: Task, error_msg: str):
+    context.ui_queue.put(("error", f"{task.url}: {error_msg}"))
+    post_task_update(context, task, "raw", error_msg)
+    post_task_update(context, task, "status", "Fetch failed")
+
+
+def post_task_update(context: ProcessingContext, task: Task, field: str, value: str):
+    """
+    Sends a per-task update ("raw", "processed" or "status") to the UI.
+    The GUI keeps these per task and coalesces them per frame.
+    """
+    context.ui_queue.put(("task_update", (task.key(), task.url, field, value)))
+
+
+class StreamUpdates:
+    """
+    Sends a model answer to the UI's "processed" field while it streams in:
+    new text is buffered and posted as a "task_append" at most every
+    `interval` seconds. The final answer still goes out through report_result.
+    """
+
+    def __init__(self, context: ProcessingContext, task: Task, interval: float = STREAM_UPDATE_SECONDS):
+        self.context = context
+        self.task = task
+        self.interval = interval
+        self._pending = []
+        self._started = time.perf_counter()
+        self._last_post = 0.0
+        self._first = True
+        self._started_attempt = False
+
+    def begin(self):
+        """Starts an attempt; a retried answer first clears the text of the failed one."""
+        if self._started_attempt:
+            self._pending = []
+            post_task_update(self.context, self.task, "processed", "")
+        self._started_attempt = True
+
+    def append(self, chunk: str):
+        now = time.perf_counter()
+        if self._first:
+            self._first = False
+            if self.context.metrics is not None:
+                self.context.metrics.observe(
+                    "llm_first_output", now - self._started, self.context.model_name, self.task
+                )
+        self._pending.append(chunk)
+        if now - self._last_post >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            text, self._pending = "".join(self._pending), []
+            self._last_post = time.perf_counter()
+            self.context.ui_queue.put(
+                ("task_append", (self.task.key(), self.task.url, "processed", text))
+            )
 
-    context.ui_queue.put(("update_status", status_message))
 
+@lru_cache(maxsize=8)
+def _jina_headers(api_key: str, proxy_url: Optional[str]) -> dict:
+    """Builds the Jina Reader headers once per (api_key, proxy) pair."""
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "X-Exclude-Selector": EXCLUDE_SELECTOR,
+    }
+    if proxy_url:
+        headers["X-Proxy-Url"] = proxy_url
+    return headers
 
-def fetch_md(task: Task, context: ProcessingContext):
-    """Fetches markdown content using the Jina Reader API."""
-    if not task.url:
-        context.ui_queue.put(("error", "Encountered a task with no URL."))
-        return
 
-    try:
-        headers = {
-            "Authorization": f"Bearer {context.api_key}",
-            "Content-Type": "application/json",
-            "X-Exclude-Selector": ",".join(SELECTORS_TO_REMOVE),
-        }
+class FetchError(Exception):
+    """Raised by the download functions when a page could not be fetched."""
+
+    def __init__(
+        self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None
+    ):
+        super().__init__(message)
+        # Used by logic/rate_limit.py to tell throttling from other failures.
+        self.status_code = status_code
+        self.retry_after = retry_after
+
 
-        if context.use_proxy and context.proxy_url:
-            headers["X-Proxy-Url"] = context.proxy_url
+def http_fetch_error(label: str, status_code: int, headers, text: str = "") -> FetchError:
+    """FetchError for a non-200 response, keeping its status and Retry-After."""
+    message = f"{label} {status_code}: {text}" if text else f"{label} {status_code}"
+    return FetchError(message, status_code, parse_retry_after(headers.get("Retry-After")))
 
-        response = requests.get(
-            f"https://r.jina.ai/{task.url}", headers=headers, timeout=30
+
+def download_md_jina(task: Task, context: ProcessingContext) -> str:
+    """Downloads markdown for the task through the Jina Reader API."""
+    try:
+        proxy_url = context.proxy_url if context.use_proxy else None
+        response = get_session().get(
+            f"{JINA_READER_URL}{task.url}",
+            headers=_jina_headers(context.api_key, proxy_url),
+            timeout=30,
         )
+    except http_errors() as e:
+        raise FetchError(f"Request failed: {str(e)}") from e
+
+    if response.status_code != 200:
+        raise http_fetch_error("API Error", response.status_code, response.headers, response.text)
+    return response.text
 
-        if response.status_code == 200:
-            md_content = response.text
-            _process_and_save_markdown(
-                md_content, task, context, "Completed successfully"
-            )
-        else:
-            error_msg = f"API Error {response.status_code}: {response.text}"
-            context.ui_queue.put(("error", error_msg))
-            context.ui_queue.put(("update_text", ("raw", error_msg)))
 
-    except requests.exceptions.RequestException as e:
-        error_msg = f"Request failed: {str(e)}"
-        context.ui_queue.put(("error", error_msg))
-        context.ui_queue.put(("update_text", ("raw", error_msg)))
+def download_md_selenium(task: Task, context: ProcessingContext) -> str:
+    """Loads the task URL in a pooled Chrome and converts the page to markdown."""
+    proxy_url = context.proxy_url if context.use_proxy else None
+    try:
+        with get_driver_pool(proxy_url).lease() as driver:
+            driver.get(task.url)
+            html_content = driver.page_source
+    except Exception as e:
+        raise FetchError(f"Selenium failed: {str(e)}") from e
 
+    # SELECTORS_TO_REMOVE are applied locally, which frees the browser sooner
+    # than removing them with injected JavaScript.
+    return convert_html(html_content, task, context, "selenium")
 
-def fetch_md_selenium(task: Task, context: ProcessingContext):
-    """Fetches HTML content using Selenium and converts it to markdown."""
+
+def convert_html(html_content, task: Task, context: ProcessingContext, mode: str) -> str:
+    """
+    html_to_markdown with SELECTORS_TO_REMOVE, timed as the run's convert
+    stage; in the run's conversion pool when it has one. A page that cannot
+    be converted raises FetchError, so tiered fetches move on to the next tier.
+    """
+    with stage_timer(context, "convert", mode, task) as timing:
+        timing["bytes"] = len(html_content)
+        try:
+            if context.convert_pool is not None:
+                return context.convert_pool.html_to_markdown(html_content, SELECTORS_TO_REMOVE)
+            return html_to_markdown(html_content, SELECTORS_TO_REMOVE)
+        except Exception as e:
+            raise FetchError(f"Converting the page failed: {e}") from e
+
+
+# A desktop browser User-Agent; some portals refuse the default python one.
+DIRECT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+}
+
+
+def download_md_direct(task: Task, context: ProcessingContext) -> str:
+    """Downloads the page with a plain GET and converts it to markdown locally."""
+    session = get_session()
+    kwargs = {}
+    if context.use_proxy and context.proxy_url:
+        if not isinstance(session, requests.Session):
+            raise FetchError("Direct HTTP through a proxy needs HTTP2_ENABLED=0.")
+        kwargs["proxies"] = {"http": context.proxy_url, "https": context.proxy_url}
+    try:
+        response = session.get(task.url, headers=DIRECT_HEADERS, timeout=30, **kwargs)
+    except http_errors() as e:
+        raise FetchError(f"Request failed: {str(e)}") from e
+
+    if response.status_code != 200:
+        raise http_fetch_error("HTTP Error", response.status_code, response.headers)
+    content_type = response.headers.get("Content-Type", "")
+    if "html" not in content_type:
+        raise FetchError(f"Not an HTML page: {content_type or 'no content type'}")
+    return convert_html(response.content, task, context, "direct")
+
+
+DOWNLOADERS = {
+    "direct": download_md_direct,
+    "jina": download_md_jina,
+    "selenium": download_md_selenium,
+}
+
+
+def fetch_limit_keys(task: Task, tier: str) -> list[str]:
+    """
+    Rate limiters a fetch goes through (logic/rate_limit.py). Jina Reader
+    fetches count against r.jina.ai, whose 429s are about our Jina quota;
+    direct and Selenium fetches against the target domain.
+    """
+    if tier == "jina":
+        return ["jina"]
+    return [f"domain:{task_domain(task)}"]
+
+
+def limited_download(downloader, tier: str, task: Task, context: ProcessingContext) -> str:
+    """Runs a downloader under the tier's rate limits, retrying throttled fetches."""
+    try:
+        return call_with_limits(fetch_limit_keys(task, tier), lambda: downloader(task, context))
+    except RateLimitError as e:
+        raise FetchError(str(e)) from e
+
+
+def download_md_tiered(task: Task, context: ProcessingContext) -> tuple[str, str]:
+    """
+    Tries the fetch tiers from the one remembered for the task's domain up,
+    until one returns complete-looking markdown. Returns (markdown, tier).
+    """
+    memory = get_strategy_memory()
+    domain = task_domain(task)
+    remembered = memory.get(domain)
+    tiers = TIERS[TIERS.index(remembered):] if remembered else TIERS
+
+    fallback, errors = None, []
+    for tier in tiers:
+        try:
+            md_content = limited_download(DOWNLOADERS[tier], tier, task, context)
+        except FetchError as e:
+            errors.append(f"{tier}: {e}")
+            continue
+        if looks_complete(md_content):
+            memory.record(domain, tier)
+            return md_content, tier
+        errors.append(f"{tier}: incomplete page ({len(md_content)} chars)")
+        if fallback is None or len(md_content) > len(fallback[0]):
+            fallback = (md_content, tier)
+
+    # Some pages are short; keep the best attempt rather than failing,
+    # without remembering it for the domain.
+    if fallback is not None:
+        return fallback
+    raise FetchError("All fetch tiers failed. " + "; ".join(errors))
+
+
+def select_fetcher(context: ProcessingContext, use_selenium: bool = False):
+    """Returns (cache mode, downloader, status message) for the run's fetch mode."""
+    mode = "selenium" if use_selenium else context.fetch_mode
+    if mode == "selenium":
+        return mode, download_md_selenium, "Completed successfully via Selenium"
+    if mode == "direct":
+        return mode, download_md_direct, "Completed successfully via direct HTTP"
+    if mode == "auto":
+        return mode, download_md_tiered, "Completed successfully"
+    return "jina", download_md_jina, "Completed successfully"
+
+
+def download_for_mode(
+    task: Task, context: ProcessingContext, mode: str, downloader
+) -> tuple[str, str]:
+    """Runs the downloader and returns (markdown, the tier that fetched it)."""
+    with stage_timer(context, "fetch", mode, task) as timing:
+        if mode == "auto":
+            md_content, tier = downloader(task, context)
+            timing["label"] = f"auto/{tier}"
+        else:
+            md_content, tier = limited_download(downloader, mode, task, context), mode
+        timing["bytes"] = len(md_content)
+    return md_content, tier
+
+
+def _fetch_page(item: PipelineItem, context: ProcessingContext, mode: str, downloader):
+    """The page from the fetch cache or the downloader; None when the fetch failed."""
+    task = item.task
+    cache = get_fetch_cache() if context.use_fetch_cache else None
+    if cache:
+        with stage_timer(context, "fetch", "cache", task) as timing:
+            md_content = cache.get(task.url, mode, EXCLUDE_SELECTOR)
+            if md_content is None:
+                # Misses are timed as part of the download.
+                timing["label"] = "cache_miss"
+        if md_content is not None:
+            item.status += " (cached page)"
+            return md_content
+
+    try:
+        md_content, tier = download_for_mode(task, context, mode, downloader)
+    except FetchError as e:
+        report_fetch_error(context, task, str(e))
+        return None
+    if mode == "auto":
+        item.status += f" via {tier}"
+    if cache:
+        cache.put(task.url, mode, EXCLUDE_SELECTOR, md_content)
+    return md_content
+
+
+def fetch_stage(
+    task: Task, context: ProcessingContext, use_selenium: bool = False
+) -> Optional[PipelineItem]:
+    """
+    Gets the page markdown from the run journal (when resuming), a copy of
+    the same page fetched by another task, the page cache or the downloader.
+    Returns None when the task is done or failed.
+    """
     if not task.url:
         context.ui_queue.put(("error", "Encountered a task with no URL."))
-        return
+        return None
+
+    mode, downloader, status = select_fetcher(context, use_selenium)
+    item = PipelineItem(task, status=status)
+
+    item.md_content, item.processed_text, skip = load_resume_point(task, context)
+    if skip:
+        return None
+    if item.md_content is not None:
+        item.status += " (resumed)"
+    else:
+        dedup = context.dedup
+        same_page = dedup.claim_url(task) if dedup is not None else None
+        if same_page is not None:
+            first_key, page = same_page
+            with stage_timer(context, "dedup", "url", task):
+                item.md_content = page.result()
+            if item.md_content is not None:
+                item.status += f" (same page as {first_key})"
+        if item.md_content is None:
+            try:
+                item.md_content = _fetch_page(item, context, mode, downloader)
+            finally:
+                if dedup is not None and same_page is None:
+                    dedup.finish_url(task, item.md_content)
+            if item.md_content is None:
+                return None
+        journal_stage(context, task, "fetched", item.md_content)
+
+    post_task_update(context, task, "raw", item.md_content)
+    return item
+
+
+def clean_stage(item: PipelineItem, context: ProcessingContext) -> PipelineItem:
+    """Compacts the markdown for the model, unless a resumed item already has its answer."""
+    if item.processed_text is None:
+        with stage_timer(context, "clean", "", item.task) as timing:
+            item.llm_input, note = compact_for_llm(item.md_content, context)
+            timing["tokens"] = estimate_tokens(item.llm_input)
+        item.status += note
+    return item
+
+
+def use_duplicate_answer(
+    item: PipelineItem, context: ProcessingContext, kind: str, first_key: str, answer: str
+):
+    """Gives the item the processed text of the first copy of its listing."""
+    item.processed_text = answer
+    item.task.duplicate_of = first_key
+    item.status += f" | {kind} duplicate of {first_key}"
+    journal_stage(context, item.task, "processed", answer)
+
+
+def publish_answer(item: PipelineItem, context: ProcessingContext):
+    """Hands a first copy's processed text to its duplicates (failed answers are withdrawn)."""
+    answer = None if is_error_result(item.processed_text) else item.processed_text
+    context.dedup.resolve(item.task, answer)
+
+
+def llm_stage(item: PipelineItem, context: ProcessingContext) -> PipelineItem:
+    """
+    Runs the item through the run's LLM batcher or process_md, or reuses the
+    answer for an earlier copy of the same listing.
+    """
+    if item.processed_text is not None:
+        return item
+
+    dedup = context.dedup
+    duplicate = dedup.match(item.task, item.llm_input) if dedup is not None else None
+    if duplicate is not None:
+        kind, first_key, answer = duplicate
+        with stage_timer(context, "dedup", kind, item.task):
+            reused = answer.result()
+        if reused is not None:
+            use_duplicate_answer(item, context, kind, first_key, reused)
+            return item
 
-    driver = None
     try:
-        chrome_options = uc.ChromeOptions()
-        # chrome_options.add_argument('''--headless''')
-        chrome_options.add_argument("--disable-gpu")
-
-        if context.use_proxy and context.proxy_url:
-            chrome_options.add_argument(f"--proxy-server={context.proxy_url}")
-
-        driver = uc.Chrome(options=chrome_options, use_subprocess=True)
-        driver.get(task.url)
-        # A simple wait for elements to appear.
-        # For more complex pages, explicit waits (WebDriverWait) are more robust.
-        driver.implicitly_wait(5)
-
-        # JavaScript to remove elements matching the selectors.
-        # This helps in cleaning the HTML before converting to Markdown.
-        js_remover_script = """
-        const selectors = arguments[0].split(',');
-        for (const selector of selectors) {
-            try {
-                document.querySelectorAll(selector.trim()).forEach(el => el.remove());
-            } catch (e) {
-                // Silently ignore errors for invalid selectors
-            }
-        }
-        """
-        driver.execute_script(js_remover_script, ",".join(SELECTORS_TO_REMOVE))
-
-        html_content = driver.page_source
-
-        md_content = md(
-            html_content, strip=["a", "img", "script", "style", "svg", "button"]
-        )
+        with stage_timer(context, "llm", context.model_name, item.task) as timing:
+            if context.llm_batcher is not None:
+                item.processed_text = context.llm_batcher.submit(item.llm_input).result()
+            else:
+                item.processed_text = process_md(
+                    item.llm_input,
+                    context.user_prompt_template,
+                    context.system_prompt_text,
+                    context.model_name,
+                    use_cache=context.use_llm_cache,
+                    stream=StreamUpdates(context, item.task) if context.stream_llm else None,
+                )
+            timing["tokens"] = estimate_tokens(item.llm_input)
+            timing["output_tokens"] = estimate_tokens(item.processed_text)
+    finally:
+        if dedup is not None and duplicate is None:
+            publish_answer(item, context)
+    journal_stage(context, item.task, "processed", item.processed_text)
+    return item
 
-        # Clean up excessive whitespace and blank lines from the markdown content.
-        lines = [line.strip() for line in md_content.splitlines()]
-        cleaned_md_content = "\n".join(line for line in lines if line)
 
-        _process_and_save_markdown(
-            cleaned_md_content,
-            task,
-            context,
-            "Completed successfully via Selenium",
-        )
+def sink_stage(item: PipelineItem, context: ProcessingContext):
+    report_result(item.md_content, item.processed_text, item.task, context, item.status)
 
-    except (WebDriverException, Exception) as e:
-        error_msg = f"Selenium failed: {str(e)}"
-        context.ui_queue.put(("error", error_msg))
-        context.ui_queue.put(("update_text", ("raw", error_msg)))
-    finally:
-        if driver:
-            driver.quit()
+
+def _fetch_and_process(task: Task, context: ProcessingContext, use_selenium: bool):
+    """Runs one task through every stage on the calling thread."""
+    item = fetch_stage(task, context, use_selenium)
+    if item is None:
+        return
+    item = llm_stage(clean_stage(item, context), context)
+    sink_stage(item, context)
 
 
-def process_md(raw_md, user_prompt_template, system_prompt_text, model_name: str):
+def fetch_md(task: Task, context: ProcessingContext):
+    """Fetches markdown content using the Jina Reader API."""
+    _fetch_and_process(task, context, use_selenium=False)
+
+
+def fetch_md_selenium(task: Task, context: ProcessingContext):
+    """Fetches HTML content using Selenium and converts it to markdown."""
+    _fetch_and_process(task, context, use_selenium=True)
+
+
+def _build_prompts(raw_md, user_prompt_template, system_prompt_text):
     user_prompt = user_prompt_template.format(content=raw_md)
     system_prompt = system_prompt_text.strip()
+    return system_prompt, user_prompt
 
-    # Logic for Gemini models using the official Google library
-    if model_name.startswith("gemini"):
-        try:
-            if not os.environ.get("GOOGLE_API_KEY"):
-                return "Error: GOOGLE_API_KEY environment variable not set. Please configure it to use Gemini."
 
-            model = genai.GenerativeModel(
-                model_name=model_name, system_instruction=system_prompt
-            )
-            response = model.generate_content(user_prompt)
-            return response.text
-        except Exception as e:
-            return f"An error occurred with the Gemini API: {e}"
+# process_md reports failures as text; these prefixes tell them apart.
+ERROR_RESULT_PREFIXES = ("An error occurred", "Error: ")
 
-    # Existing logic for g4f models (GPT, Claude, etc.)
-    else:
-        try:
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
-            response = g4f_client.chat.completions.create(
-                model=model_name, messages=messages, web_search=False
+
+def is_error_result(text: Optional[str]) -> bool:
+    return text is None or text.startswith(ERROR_RESULT_PREFIXES)
+
+
+def process_md(
+    raw_md,
+    user_prompt_template,
+    system_prompt_text,
+    model_name: str,
+    use_cache: bool = True,
+    stream: Optional[StreamUpdates] = None,
+):
+    """
+    Runs the prompt through the model's provider. With a `stream`, the
+    answer is requested in chunks and each one is passed on as it arrives.
+    """
+    system_prompt, user_prompt = _build_prompts(
+        raw_md, user_prompt_template, system_prompt_text
+    )
+
+    cache = get_llm_cache() if use_cache else None
+    if cache:
+        cached = cache.get(model_name, system_prompt, user_prompt)
+        if cached is not None:
+            return cached
+
+    def generate_streaming():
+        stream.begin()
+        chunks = []
+        for chunk in provider.stream(model_name, system_prompt, user_prompt):
+            chunks.append(chunk)
+            stream.append(chunk)
+        stream.flush()
+        return "".join(chunks)
+
+    provider = None
+    try:
+        provider = get_provider(model_name)
+        if stream is not None:
+            text = call_with_limits([f"llm:{model_name}"], generate_streaming)
+        else:
+            text = call_with_limits(
+                [f"llm:{model_name}"],
+                lambda: provider.generate(model_name, system_prompt, user_prompt),
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"An error occurred with the g4f client: {e}"
+    except ProviderError as e:
+        return str(e)
+    except Exception as e:
+        label = provider.label if provider else "the LLM provider"
+        return f"An error occurred with {label}: {e}"
+
+    # Only successful responses are cached; errors are retried next time.
+    if cache:
+        cache.put(model_name, system_prompt, user_prompt, text)
+    return text
+
+
+async def process_md_async(
+    raw_md,
+    user_prompt_template,
+    system_prompt_text,
+    model_name: str,
+    use_cache: bool = True,
+):
+    """Async variant of process_md using the providers' async clients."""
+    system_prompt, user_prompt = _build_prompts(
+        raw_md, user_prompt_template, system_prompt_text
+    )
+
+    cache = get_llm_cache() if use_cache else None
+    if cache:
+        cached = await asyncio.to_thread(cache.get, model_name, system_prompt, user_prompt)
+        if cached is not None:
+            return cached
+
+    provider = None
+    try:
+        provider = get_provider(model_name)
+        text = await call_with_limits_async(
+            [f"llm:{model_name}"],
+            lambda: provider.generate_async(model_name, system_prompt, user_prompt),
+        )
+    except ProviderError as e:
+        return str(e)
+    except Exception as e:
+        label = provider.label if provider else "the LLM provider"
+        return f"An error occurred with {label}: {e}"
+
+    if cache:
+        await asyncio.to_thread(cache.put, model_name, system_prompt, user_prompt, text)
+    return text
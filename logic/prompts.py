@@ -0,0 +1,19 @@
+"""
+Loading of the named system prompts from prompts.yaml.
+"""
+
+import yaml
+
+PROMPTS_FILE = "prompts.yaml"
+
+
+def load_prompts(path: str = PROMPTS_FILE) -> dict[str, str]:
+    """
+    Reads prompts.yaml and returns a {name: text} mapping.
+    Raises FileNotFoundError, yaml.YAMLError, TypeError or KeyError on bad input.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        prompts_list = yaml.safe_load(f)
+    if not isinstance(prompts_list, list):
+        raise yaml.YAMLError("The root of prompts.yaml should be a list of objects.")
+    return {p["name"]: p["text"] for p in prompts_list}
@@ -0,0 +1,333 @@
+"""
+LLM provider layer used by process_md.
+
+Providers are picked by model name prefix and keep their client objects for
+reuse: Gemini models are built once per (model, system prompt), and long
+system prompts are uploaded once as cached context where the API allows it.
+A local FakeProvider answers without network access, for tests and
+benchmarks.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import itertools
+import json
+import math
+import os
+import re
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from config import GEMINI_CONTEXT_CACHE_MIN_TOKENS, GEMINI_CONTEXT_CACHE_TTL_MINUTES
+from logic.compaction import estimate_tokens
+from logic.registry import load, load_optional
+
+# A Gemini context cache is extended when it has less than this left.
+CONTEXT_CACHE_RENEW_SECONDS = 300
+
+GEMINI_KEY_MISSING = (
+    "Error: GOOGLE_API_KEY environment variable not set. Please configure it to use Gemini."
+)
+
+
+class ProviderError(Exception):
+    """A provider problem whose message should be shown to the user as is."""
+
+
+class LLMProvider:
+    """Base class: generate text for one (system prompt, user prompt) pair."""
+
+    # Used in error messages: "An error occurred with {label}: ..."
+    label = "the LLM provider"
+
+    def generate(self, model_name: str, system_prompt: str, user_prompt: str) -> str:
+        raise NotImplementedError
+
+    async def generate_async(self, model_name: str, system_prompt: str, user_prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, model_name: str, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """Yields the answer in chunks as the model produces it; one chunk by default."""
+        yield self.generate(model_name, system_prompt, user_prompt)
+
+
+class GeminiProvider(LLMProvider):
+    label = "the Gemini API"
+
+    def __init__(self):
+        # The SDK is only imported once a Gemini model is first used.
+        self.genai = load("genai")
+        # Configure the API key once. The user should set GOOGLE_API_KEY.
+        self.api_key = os.environ.get("GOOGLE_API_KEY")
+        if self.api_key:
+            self.genai.configure(api_key=self.api_key)
+        else:
+            print("Warning: GOOGLE_API_KEY environment variable not set. Gemini models will not work.")
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _build_model(self, model_name: str, system_prompt: str) -> tuple[object, object]:
+        """Returns (model, its CachedContent or None when the prompt is sent inline)."""
+        genai = self.genai
+        # Context caching only pays off (and is only accepted) for long prefixes.
+        if estimate_tokens(system_prompt) >= GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+            try:
+                cached = genai.caching.CachedContent.create(
+                    model=f"models/{model_name}",
+                    system_instruction=system_prompt,
+                    ttl=datetime.timedelta(minutes=GEMINI_CONTEXT_CACHE_TTL_MINUTES),
+                )
+                return genai.GenerativeModel.from_cached_content(cached_content=cached), cached
+            except Exception as e:
+                print(f"Warning: Gemini context caching unavailable for {model_name}, "
+                      f"sending the system prompt inline: {e}")
+        return self._inline_model(model_name, system_prompt), None
+
+    def _inline_model(self, model_name: str, system_prompt: str):
+        return self.genai.GenerativeModel(model_name=model_name, system_instruction=system_prompt)
+
+    @staticmethod
+    def _key(model_name: str, system_prompt: str) -> tuple[str, str]:
+        return model_name, hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+    def _entry(self, model_name: str, system_prompt: str) -> tuple[object, object]:
+        """
+        (model, CachedContent or None) for (model, system prompt). The cached
+        context is extended before its TTL runs out, or rebuilt when that fails.
+        """
+        if not self.api_key:
+            raise ProviderError(GEMINI_KEY_MISSING)
+        key = self._key(model_name, system_prompt)
+        ttl = GEMINI_CONTEXT_CACHE_TTL_MINUTES * 60
+        with self._lock:
+            now = time.monotonic()
+            entry = self._models.get(key)
+            if entry is not None:
+                model, cached, expires_at = entry
+                if expires_at - now > min(CONTEXT_CACHE_RENEW_SECONDS, ttl / 4):
+                    return model, cached
+                if cached is not None:
+                    try:
+                        cached.update(ttl=datetime.timedelta(seconds=ttl))
+                        self._models[key] = (model, cached, now + ttl)
+                        return model, cached
+                    except Exception as e:
+                        print(f"Warning: could not extend the Gemini context cache "
+                              f"for {model_name}, creating a new one: {e}")
+            model, cached = self._build_model(model_name, system_prompt)
+            # Inline models only expire when caching was tried, to try it again.
+            tried_cache = estimate_tokens(system_prompt) >= GEMINI_CONTEXT_CACHE_MIN_TOKENS
+            self._models[key] = (model, cached, now + ttl if tried_cache else math.inf)
+            return model, cached
+
+    def get_model(self, model_name: str, system_prompt: str):
+        """Returns the model object for (model, system prompt), built once and kept valid."""
+        return self._entry(model_name, system_prompt)[0]
+
+    def _cache_lost(self, error: Exception, cached, model_name: str, system_prompt: str):
+        """
+        An inline model when `error` says the cached context is gone (deleted,
+        or expired early); None for any other error. The inline model is used
+        for one TTL, then caching is tried again.
+        """
+        not_found = load_optional("gemini.NotFound")
+        if cached is None or not_found is None or not isinstance(error, not_found):
+            return None
+        print(f"Warning: the Gemini context cache for {model_name} is gone, "
+              f"sending the system prompt inline: {error}")
+        model = self._inline_model(model_name, system_prompt)
+        with self._lock:
+            self._models[self._key(model_name, system_prompt)] = (
+                model, None, time.monotonic() + GEMINI_CONTEXT_CACHE_TTL_MINUTES * 60
+            )
+        return model
+
+    def generate(self, model_name, system_prompt, user_prompt):
+        model, cached = self._entry(model_name, system_prompt)
+        try:
+            return model.generate_content(user_prompt).text
+        except Exception as e:
+            inline = self._cache_lost(e, cached, model_name, system_prompt)
+            if inline is None:
+                raise
+            return inline.generate_content(user_prompt).text
+
+    async def generate_async(self, model_name, system_prompt, user_prompt):
+        model, cached = self._entry(model_name, system_prompt)
+        try:
+            response = await model.generate_content_async(user_prompt)
+        except Exception as e:
+            inline = self._cache_lost(e, cached, model_name, system_prompt)
+            if inline is None:
+                raise
+            response = await inline.generate_content_async(user_prompt)
+        return response.text
+
+    def stream(self, model_name, system_prompt, user_prompt):
+        model, cached = self._entry(model_name, system_prompt)
+        try:
+            chunks = iter(model.generate_content(user_prompt, stream=True))
+            first = next(chunks, None)
+        except Exception as e:
+            inline = self._cache_lost(e, cached, model_name, system_prompt)
+            if inline is None:
+                raise
+            chunks = iter(inline.generate_content(user_prompt, stream=True))
+            first = next(chunks, None)
+        if first is None:
+            return
+        for chunk in itertools.chain([first], chunks):
+            # Chunks without parts (e.g. only safety ratings) have no text.
+            if chunk.parts:
+                yield chunk.text
+
+
+class G4FProvider(LLMProvider):
+    """g4f models (GPT, Claude, etc.). g4f has no context caching, only client reuse."""
+
+    label = "the g4f client"
+
+    def __init__(self):
+        self.client = load("g4f.Client")()
+        self.async_client = load("g4f.AsyncClient")()
+
+    @staticmethod
+    def _messages(system_prompt: str, user_prompt: str) -> list[dict]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def generate(self, model_name, system_prompt, user_prompt):
+        response = self.client.chat.completions.create(
+            model=model_name,
+            messages=self._messages(system_prompt, user_prompt),
+            web_search=False,
+        )
+        return response.choices[0].message.content
+
+    async def generate_async(self, model_name, system_prompt, user_prompt):
+        response = await self.async_client.chat.completions.create(
+            model=model_name,
+            messages=self._messages(system_prompt, user_prompt),
+            web_search=False,
+        )
+        return response.choices[0].message.content
+
+    def stream(self, model_name, system_prompt, user_prompt):
+        chunks = self.client.chat.completions.create(
+            model=model_name,
+            messages=self._messages(system_prompt, user_prompt),
+            web_search=False,
+            stream=True,
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+_ITEM_RE = re.compile(r'<item id="(\d+)">')
+
+
+class FakeProvider(LLMProvider):
+    """
+    Offline stand-in that answers deterministically after `latency` seconds.
+
+    Pass a `responder(model_name, system_prompt, user_prompt)` to script the
+    answers; by default it echoes a digest of the prompt and understands the
+    multi-item format of logic/llm_batch.py.
+    """
+
+    label = "the fake provider"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        responder: Optional[Callable[[str, str, str], str]] = None,
+    ):
+        self.latency = latency
+        self.responder = responder or self._default_responder
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _default_responder(model_name, system_prompt, user_prompt):
+        def answer(text):
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+            return f"[{model_name}] {len(text)} chars, digest {digest}"
+
+        items = _ITEM_RE.split(user_prompt)
+        if len(items) > 1:
+            # items = [prefix, id0, body0, id1, body1, ...]
+            results = [
+                {"id": int(items[i]), "output": answer(items[i + 1].replace("</item>", "").strip())}
+                for i in range(1, len(items), 2)
+            ]
+            return json.dumps({"results": results})
+        return answer(user_prompt)
+
+    def generate(self, model_name, system_prompt, user_prompt):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.responder(model_name, system_prompt, user_prompt)
+
+    async def generate_async(self, model_name, system_prompt, user_prompt):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.responder(model_name, system_prompt, user_prompt)
+
+    def stream(self, model_name, system_prompt, user_prompt, chunks: int = 20):
+        """The answer in `chunks` pieces, spread over `latency`."""
+        with self._lock:
+            self.calls += 1
+        text = self.responder(model_name, system_prompt, user_prompt)
+        size = max(1, -(-len(text) // chunks))
+        for start in range(0, len(text), size):
+            if self.latency:
+                time.sleep(self.latency / chunks)
+            yield text[start:start + size]
+
+
+# (model name prefix, factory) pairs; the first matching prefix wins and an
+# empty prefix is the fallback. Factories run on the first task for their
+# prefix, so a provider's SDK is only imported when it is used.
+_factories: list[tuple[str, Callable[[], LLMProvider]]] = [
+    ("gemini", GeminiProvider),
+    ("fake", FakeProvider),
+    ("", G4FProvider),
+]
+_instances: dict[str, LLMProvider] = {}
+_lock = threading.Lock()
+
+
+def register_provider(prefix: str, provider):
+    """
+    Routes model names starting with `prefix` to `provider`, which may be an
+    LLMProvider instance or a factory returning one.
+    """
+    factory = (lambda: provider) if isinstance(provider, LLMProvider) else provider
+    with _lock:
+        _factories[:] = [(p, f) for p, f in _factories if p != prefix]
+        # Longer prefixes first so they win over shorter ones.
+        _factories.append((prefix, factory))
+        _factories.sort(key=lambda item: len(item[0]), reverse=True)
+        _instances.pop(prefix, None)
+
+
+def get_provider(model_name: str) -> LLMProvider:
+    """Returns the shared provider instance for a model name."""
+    with _lock:
+        for prefix, factory in _factories:
+            if model_name.startswith(prefix):
+                provider = _instances.get(prefix)
+                if provider is None:
+                    provider = factory()
+                    _instances[prefix] = provider
+                return provider
+    raise ProviderError(f"No LLM provider registered for model {model_name!r}.")
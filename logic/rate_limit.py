@@ -0,0 +1,389 @@
+"""
+Adaptive, per-provider limits for outgoing calls.
+
+Every provider a run talks to has its own ProviderLimiter, keyed "jina",
+"domain:<host>" or "llm:<model>". A limiter caps the number of calls in
+flight and adapts that cap AIMD style: it grows while calls succeed
+(doubling per round trip until the first throttle, then +1 per round trip)
+and is halved on a 429/503, or cut by a quarter on a timeout or 5xx.
+A Retry-After pauses every caller of the provider, not just the one that
+got it. After CIRCUIT_FAILURE_THRESHOLD failed rounds in a row (a burst of
+concurrent failures counts once) the circuit opens: no calls go out for
+CIRCUIT_COOLDOWN_SECONDS, then a single probe decides whether it closes
+again or stays open for twice as long.
+
+call_with_limits() / call_with_limits_async() wrap one call in the limiters
+of its providers and retry throttled and transient failures with jittered
+exponential backoff.
+"""
+
+import asyncio
+import email.utils
+import random
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+from config import (
+    CIRCUIT_COOLDOWN_SECONDS,
+    CIRCUIT_FAILURE_THRESHOLD,
+    RATE_LIMIT_BACKOFF_MAX_SECONDS,
+    RATE_LIMIT_BACKOFF_SECONDS,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_INITIAL,
+    RATE_LIMIT_MAX,
+    RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_MAX_WAIT_SECONDS,
+)
+
+# Outcomes of a call, as classified by classify_error.
+SUCCESS = "success"
+THROTTLED = "throttled"  # 429/503: the provider asks us to slow down
+TRANSIENT = "transient"  # timeouts, connection errors, other 5xx
+FATAL = "fatal"  # anything else; retrying would not help
+
+# How often waiting callers re-check a limiter they cannot be woken for.
+_POLL_SECONDS = 0.05
+
+_THROTTLE_NAMES = ("ratelimit", "resourceexhausted", "toomanyrequests", "quota")
+_TRANSIENT_NAMES = (
+    "timeout",
+    "connectionerror",
+    "serviceunavailable",
+    "deadlineexceeded",
+    "internalservererror",
+)
+_THROTTLE_TEXT = ("429", "rate limit", "ratelimit", "too many requests", "quota", "resource exhausted")
+_TRANSIENT_TEXT = ("timed out", "timeout", "temporarily unavailable", "connection reset", "502", "504")
+_RETRY_DELAY_RE = re.compile(r"retry[ _-]?(?:after|delay|in)\D{0,20}?(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+class RateLimitError(Exception):
+    """
+    Raised when a provider stays unavailable for longer than
+    RATE_LIMIT_MAX_WAIT_SECONDS, or asks to wait longer than
+    RATE_LIMIT_BACKOFF_MAX_SECONDS before a retry.
+    """
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta seconds or an HTTP date)."""
+    if value is None or value == "":
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _status_of(error) -> Optional[int]:
+    for attr in ("status_code", "status", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None) or getattr(response, "status", None)
+    return value if isinstance(value, int) else None
+
+
+def _retry_after_of(error) -> Optional[float]:
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        return retry_after
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is not None:
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            return retry_after
+    # Gemini reports it in the message ("retry_delay { seconds: 27 }").
+    match = _RETRY_DELAY_RE.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+def classify_error(error: BaseException) -> tuple[str, Optional[float]]:
+    """Returns (outcome, retry_after seconds or None) for an exception raised by a call."""
+    for candidate in (error, error.__cause__):
+        if candidate is None:
+            continue
+        status = _status_of(candidate)
+        name = type(candidate).__name__.lower()
+        text = str(candidate).lower()
+        if status in (429, 503) or any(n in name for n in _THROTTLE_NAMES):
+            return THROTTLED, _retry_after_of(candidate)
+        if (
+            (status is not None and status >= 500)
+            or isinstance(candidate, (TimeoutError, ConnectionError))
+            or any(n in name for n in _TRANSIENT_NAMES)
+        ):
+            return TRANSIENT, _retry_after_of(candidate)
+        if status is None and any(t in text for t in _THROTTLE_TEXT):
+            return THROTTLED, _retry_after_of(candidate)
+        if status is None and any(t in text for t in _TRANSIENT_TEXT):
+            return TRANSIENT, None
+    return FATAL, None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Full-jitter exponential backoff, never shorter than the provider's
+    Retry-After and never longer than RATE_LIMIT_BACKOFF_MAX_SECONDS. Raises
+    RateLimitError, without waiting, when Retry-After asks for longer.
+    """
+    ceiling = min(RATE_LIMIT_BACKOFF_MAX_SECONDS, RATE_LIMIT_BACKOFF_SECONDS * 2 ** attempt)
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        if retry_after > RATE_LIMIT_BACKOFF_MAX_SECONDS:
+            # Hours-long Retry-After (daily quotas) would stall the worker;
+            # the task fails now and is retried by a later run or lease.
+            raise RateLimitError(
+                f"Asked to retry after {retry_after:.0f}s, more than "
+                f"RATE_LIMIT_BACKOFF_MAX_SECONDS ({RATE_LIMIT_BACKOFF_MAX_SECONDS:.0f}s)."
+            )
+        # A little jitter on top, so the callers it paused do not return at once.
+        delay = retry_after + random.uniform(0, RATE_LIMIT_BACKOFF_SECONDS)
+    return min(delay, RATE_LIMIT_BACKOFF_MAX_SECONDS)
+
+
+class ProviderLimiter:
+    def __init__(
+        self,
+        key: str,
+        initial: int = RATE_LIMIT_INITIAL,
+        maximum: int = RATE_LIMIT_MAX,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        cooldown: float = CIRCUIT_COOLDOWN_SECONDS,
+    ):
+        self.key = key
+        self.maximum = max(1, maximum)
+        self.limit = float(min(max(1, initial), self.maximum))
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.in_flight = 0
+        # "closed" (normal), "open" (paused) or "half_open" (one probe allowed).
+        self.state = "closed"
+        self.counts = {SUCCESS: 0, THROTTLED: 0, TRANSIENT: 0, FATAL: 0}
+        self._slow_start = True
+        self._cooldown = cooldown
+        self._open_until = 0.0
+        self._paused_until = 0.0
+        self._failures = 0
+        # Bumped on every decrease; calls started before it do not decrease again,
+        # so one burst of 429s halves the limit (and counts as a failure) once.
+        self._epoch = 0
+        self._cond = threading.Condition()
+
+    def _try_acquire(self) -> tuple[Optional[int], Optional[float]]:
+        """(epoch, None) when a slot was taken, else (None, seconds to wait or None)."""
+        now = time.monotonic()
+        if self.state == "open":
+            if now < self._open_until:
+                return None, self._open_until - now
+            self.state = "half_open"
+        if now < self._paused_until:
+            return None, self._paused_until - now
+        capacity = 1 if self.state == "half_open" else int(self.limit)
+        if self.in_flight >= capacity:
+            return None, None
+        self.in_flight += 1
+        return self._epoch, None
+
+    def acquire(self, deadline: float) -> int:
+        """Blocks until a slot is free; returns the epoch to pass to release()."""
+        with self._cond:
+            while True:
+                epoch, wait = self._try_acquire()
+                if epoch is not None:
+                    return epoch
+                remaining = deadline - time.monotonic()
+                # No use sleeping through a pause that outlasts the deadline.
+                if remaining <= 0 or (wait is not None and wait > remaining):
+                    raise RateLimitError(self._unavailable_message())
+                self._cond.wait(min(wait or remaining, remaining))
+
+    async def acquire_async(self, deadline: float) -> int:
+        while True:
+            with self._cond:
+                epoch, wait = self._try_acquire()
+                if epoch is not None:
+                    return epoch
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (wait is not None and wait > remaining):
+                raise RateLimitError(self._unavailable_message())
+            await asyncio.sleep(min(wait or _POLL_SECONDS, remaining))
+
+    def _unavailable_message(self) -> str:
+        if self.state == "open":
+            return f"{self.key} is unavailable (circuit open after repeated failures)."
+        return f"Gave up waiting for {self.key} (rate limited)."
+
+    def cancel(self):
+        """Frees a slot that was acquired but not used."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def release(self, epoch: int, outcome: str, retry_after: Optional[float] = None):
+        with self._cond:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+            now = time.monotonic()
+
+            if outcome == SUCCESS:
+                self._failures = 0
+                if self.state == "half_open":
+                    self.state = "closed"
+                    self._cooldown = self.base_cooldown
+                    print(f"Info: {self.key} is back, circuit closed.")
+                if self._slow_start:
+                    self.limit = min(self.maximum, self.limit + 1)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+            elif outcome in (THROTTLED, TRANSIENT):
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                # Calls that started before the last decrease were part of the
+                # burst it already answered.
+                if epoch == self._epoch:
+                    factor = 0.5 if outcome == THROTTLED else 0.75
+                    self.limit = max(1.0, self.limit * factor)
+                    self._slow_start = False
+                    self._epoch += 1
+                    self._failures += 1
+                    if self.state == "half_open":
+                        # The probe failed: stay away twice as long.
+                        self._cooldown = min(self._cooldown * 2, RATE_LIMIT_MAX_WAIT_SECONDS)
+                        self._open(now)
+                    elif self.state == "closed" and self._failures >= self.failure_threshold:
+                        self._open(now)
+
+            elif self.state == "half_open":
+                # A fatal error is a bad request, not a sick provider.
+                self.state = "closed"
+            self._cond.notify_all()
+
+    def _open(self, now: float):
+        self.state = "open"
+        self._open_until = now + self._cooldown
+        print(
+            f"Warning: {self.key} failed {self._failures} times in a row, "
+            f"pausing it for {self._cooldown:.0f}s."
+        )
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "key": self.key,
+                "state": self.state,
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                **self.counts,
+            }
+
+
+_limiters: dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(key: str) -> ProviderLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = ProviderLimiter(key)
+        return limiter
+
+
+def limiter_states() -> list[dict]:
+    """Snapshots of every limiter used so far, for the run report."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.snapshot() for limiter in sorted(limiters, key=lambda l: l.key)]
+
+
+def reset_limiters():
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def call_with_limits(
+    keys: list[str],
+    func: Callable,
+    classify: Callable = classify_error,
+    max_retries: int = RATE_LIMIT_MAX_RETRIES,
+):
+    """
+    Calls func() holding a slot of each provider in `keys` (acquired in that
+    order), retrying throttled and transient failures. Raises the last error,
+    or RateLimitError when a provider stays unavailable.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return func()
+    limiters = [get_limiter(key) for key in keys]
+    attempt = 0
+    while True:
+        deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT_SECONDS
+        held = []
+        try:
+            for limiter in limiters:
+                held.append((limiter, limiter.acquire(deadline)))
+        except RateLimitError:
+            for limiter, _ in held:
+                limiter.cancel()
+            raise
+        try:
+            result = func()
+        except Exception as e:
+            outcome, retry_after = classify(e)
+            for limiter, epoch in held:
+                limiter.release(epoch, outcome, retry_after)
+            if outcome == FATAL or attempt >= max_retries:
+                raise
+            attempt += 1
+            time.sleep(backoff_delay(attempt, retry_after))
+            continue
+        for limiter, epoch in held:
+            limiter.release(epoch, SUCCESS)
+        return result
+
+
+async def call_with_limits_async(
+    keys: list[str],
+    func: Callable,
+    classify: Callable = classify_error,
+    max_retries: int = RATE_LIMIT_MAX_RETRIES,
+):
+    """call_with_limits for a coroutine function: awaits func() under the limits."""
+    if not RATE_LIMIT_ENABLED:
+        return await func()
+    limiters = [get_limiter(key) for key in keys]
+    attempt = 0
+    while True:
+        deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT_SECONDS
+        held = []
+        try:
+            for limiter in limiters:
+                held.append((limiter, await limiter.acquire_async(deadline)))
+        except RateLimitError:
+            for limiter, _ in held:
+                limiter.cancel()
+            raise
+        try:
+            result = await func()
+        except Exception as e:
+            outcome, retry_after = classify(e)
+            for limiter, epoch in held:
+                limiter.release(epoch, outcome, retry_after)
+            if outcome == FATAL or attempt >= max_retries:
+                raise
+            attempt += 1
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+            continue
+        for limiter, epoch in held:
+            limiter.release(epoch, SUCCESS)
+        return result
@@ -0,0 +1,77 @@
+"""
+Heavy dependencies loaded on first use.
+
+The model SDKs, Selenium, openpyxl, pyarrow, aiohttp and the MySQL driver
+together took well over a second to import, although a run only needs the
+ones for the providers, fetchers and sinks it actually uses. Modules ask for
+them by name instead of importing them at the top:
+
+    genai = load("genai")            # imports google.generativeai once
+    aiohttp = load_optional("aiohttp")  # None when not installed
+
+python -m benchmarks.startup checks that none of them load at startup.
+"""
+
+import importlib
+import sys
+import threading
+from typing import Optional
+
+# name -> (module, attribute or None for the module itself)
+DEPENDENCIES: dict[str, tuple[str, Optional[str]]] = {
+    "genai": ("google.generativeai", None),
+    "gemini.NotFound": ("google.api_core.exceptions", "NotFound"),
+    "g4f.Client": ("g4f.client", "Client"),
+    "g4f.AsyncClient": ("g4f.client", "AsyncClient"),
+    "uc": ("undetected_chromedriver", None),
+    "WebDriverException": ("selenium.common.exceptions", "WebDriverException"),
+    "MarkdownConverter": ("markdownify", "MarkdownConverter"),
+    "openpyxl": ("openpyxl", None),
+    "pyarrow": ("pyarrow", None),
+    "pyarrow.parquet": ("pyarrow.parquet", None),
+    "aiohttp": ("aiohttp", None),
+    "httpx": ("httpx", None),
+    "mysql.connector": ("mysql.connector", None),
+    "psutil": ("psutil", None),
+}
+
+_loaded: dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, module: str, attribute: Optional[str] = None):
+    """Makes `module` (or `module.attribute`) available as load(name)."""
+    with _lock:
+        DEPENDENCIES[name] = (module, attribute)
+        _loaded.pop(name, None)
+
+
+def load(name: str):
+    """Imports a registered dependency on first use; raises ImportError if missing."""
+    value = _loaded.get(name)
+    if value is not None:
+        return value
+    module_name, attribute = DEPENDENCIES[name]
+    # Imports take the interpreter's import lock anyway; this one only keeps
+    # the cache consistent.
+    with _lock:
+        value = _loaded.get(name)
+        if value is None:
+            value = importlib.import_module(module_name)
+            if attribute:
+                value = getattr(value, attribute)
+            _loaded[name] = value
+    return value
+
+
+def load_optional(name: str):
+    """Like load(), but returns None when the dependency is not installed."""
+    try:
+        return load(name)
+    except ImportError:
+        return None
+
+
+def imported() -> list[str]:
+    """Names of the registered dependencies whose module is imported (by anyone)."""
+    return sorted(name for name, (module, _) in DEPENDENCIES.items() if module in sys.modules)
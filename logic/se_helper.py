@@ -1,18 +1,224 @@
 """
 This module is intended to house the logic for converting SE numbers to URLs.
+
+SEResolver looks SE numbers up in fixed-size chunks over a small connection
+pool and yields Tasks as each chunk arrives, so fetching can start before a
+large lookup finishes. The `sources` and `types` lookup tables are cached in
+memory instead of being joined for every row, and recently resolved SE
+numbers are answered from an LRU cache. Set SE_SQLITE_PATH to resolve
+against a SQLite copy of the tables (see create_sqlite_standin) without a
+MySQL server.
 """
 
-import mysql.connector
+import dataclasses
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
 
-from config import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+from config import (
+    DB_HOST,
+    DB_NAME,
+    DB_PASSWORD,
+    DB_PORT,
+    DB_USER,
+    SE_CACHE_MAX_ENTRIES,
+    SE_CHUNK_SIZE,
+    SE_DB_POOL_SIZE,
+    SE_SQLITE_PATH,
+)
 from logic.models import Task
+from logic.registry import load
 
+ESTATES_QUERY = """
+    SELECT id, source_id, url, status, rent_status, subtype, type_id
+    FROM source_estates
+    WHERE id IN ({placeholders})
+"""
+SOURCES_QUERY = "SELECT id, name FROM sources"
+TYPES_QUERY = "SELECT id, name_en FROM types"
 
-def get_tasks_from_se_numbers(se_numbers: list[str]) -> list[Task]:
-    """
-    Takes a list of SE numbers and returns a list of dictionaries.
-    Each dictionary should contain 'url' and 'source_id'.
-    """
+# Unknown source/type ids trigger a reload of the lookup tables, at most this often.
+LOOKUP_REFRESH_SECONDS = 60
+
+
+class ConnectionPool:
+    """A fixed number of DB-API connections, opened lazily and reused."""
+
+    def __init__(self, connect: Callable[[], object], size: int):
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            except Exception:
+                # The connection may be broken; the next caller opens a new one.
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SEResolver:
+    def __init__(
+        self,
+        connect: Callable[[], object],
+        placeholder: str = "%s",
+        pool_size: int = SE_DB_POOL_SIZE,
+        chunk_size: int = SE_CHUNK_SIZE,
+        cache_size: int = SE_CACHE_MAX_ENTRIES,
+    ):
+        self.pool = ConnectionPool(connect, pool_size)
+        self.placeholder = placeholder
+        self.pool_size = pool_size
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        # SE number (as str) -> Task, most recently used last. Callers get
+        # copies: runs write to their Tasks (e.g. duplicate_of).
+        self._cache: OrderedDict[str, Task] = OrderedDict()
+        self._sources: dict = {}
+        self._types: dict = {}
+        self._lookups_loaded_at: Optional[float] = None
+
+    def _query(self, sql: str, params=()) -> list[tuple]:
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(sql, params)
+                return cur.fetchall()
+            finally:
+                cur.close()
+
+    def _load_lookups(self, force: bool = False):
+        with self._lock:
+            loaded_at = self._lookups_loaded_at
+        if loaded_at is not None and not (
+            force and time.monotonic() - loaded_at >= LOOKUP_REFRESH_SECONDS
+        ):
+            return
+        sources = dict(self._query(SOURCES_QUERY))
+        types = dict(self._query(TYPES_QUERY))
+        with self._lock:
+            self._sources, self._types = sources, types
+            self._lookups_loaded_at = time.monotonic()
+
+    def _to_task(self, row) -> Task:
+        se_id, source_id, url, status, rent_status, subtype, type_id = row
+        return Task(
+            source_estate_id=se_id,
+            source_id=source_id,
+            url=url,
+            status=status,
+            rent_status=rent_status,
+            subtype=subtype,
+            type=f"{self._types.get(type_id)} - Id={type_id}",
+            domain=self._sources.get(source_id),
+        )
+
+    def _fetch_chunk(self, se_numbers: list[str]) -> list[Task]:
+        placeholders = ", ".join([self.placeholder] * len(se_numbers))
+        rows = self._query(ESTATES_QUERY.format(placeholders=placeholders), se_numbers)
+        if any(r[1] not in self._sources or r[6] not in self._types for r in rows):
+            self._load_lookups(force=True)
+        tasks = [self._to_task(row) for row in rows]
+        with self._lock:
+            for task in tasks:
+                self._cache[str(task.source_estate_id)] = dataclasses.replace(task)
+                self._cache.move_to_end(str(task.source_estate_id))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tasks
+
+    def _cached(self, se_number: str) -> Optional[Task]:
+        with self._lock:
+            task = self._cache.get(se_number)
+            if task is None:
+                return None
+            self._cache.move_to_end(se_number)
+            return dataclasses.replace(task)
+
+    def _chunks(self, se_numbers: Iterable[str]) -> Iterator[tuple[list[Task], list[str]]]:
+        """Yields (cached tasks, numbers to query) per chunk of unique inputs."""
+        seen = set()
+        hits, misses = [], []
+        for se in se_numbers:
+            se = str(se).strip()
+            if not se or se in seen:
+                continue
+            seen.add(se)
+            task = self._cached(se)
+            if task is not None:
+                hits.append(task)
+            else:
+                misses.append(se)
+            if len(hits) + len(misses) >= self.chunk_size:
+                yield hits, misses
+                hits, misses = [], []
+        if hits or misses:
+            yield hits, misses
+
+    def iter_tasks(self, se_numbers: Iterable[str]) -> Iterator[Task]:
+        """
+        Yields the Tasks for `se_numbers` chunk by chunk, in input chunk
+        order. Up to pool_size chunk queries run ahead of the consumer.
+        """
+        self._load_lookups()
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            in_flight = []
+            try:
+                for hits, misses in self._chunks(se_numbers):
+                    future = executor.submit(self._fetch_chunk, misses) if misses else None
+                    in_flight.append((hits, future))
+                    if len(in_flight) > self.pool_size:
+                        yield from self._drain(in_flight.pop(0))
+                while in_flight:
+                    yield from self._drain(in_flight.pop(0))
+            finally:
+                # The consumer stopped early; do not start the queued chunks.
+                for _, future in in_flight:
+                    if future is not None:
+                        future.cancel()
+
+    @staticmethod
+    def _drain(chunk) -> Iterator[Task]:
+        hits, future = chunk
+        yield from hits
+        if future is not None:
+            yield from future.result()
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+            self._lookups_loaded_at = None
+
+    def close(self):
+        self.pool.close()
+
+
+def _mysql_connect():
     db_params = {
         "host": DB_HOST,
         "port": DB_PORT,
@@ -24,65 +230,86 @@ def get_tasks_from_se_numbers(se_numbers: list[str]) -> list[Task]:
         raise ValueError(
             "Database configuration is incomplete. Please check your .env file for DB_HOST, DB_PORT, DB_NAME, DB_USER, and DB_PASSWORD."
         )
-    results = []
-    conn = None
-    try:
-        conn = mysql.connector.connect(**db_params)
-        cur = conn.cursor()
-
-        # Prepare the query for MySQL.
-        # The %s placeholders are for the mysql.connector library.
-        se_numbers_stripped = [se.strip() for se in se_numbers if se.strip()]
-        if not se_numbers_stripped:
-            return []
-
-        # Create a string of placeholders (%s, %s, %s)
-        placeholders = ", ".join(["%s"] * len(se_numbers_stripped))
-        # Fetch domain name along with other details. Use LEFT JOIN to be robust.
-        query = f"""
-                        SELECT id, source_id, url, status, rent_status, subtype
-                        FROM source_estates
-                        WHERE id IN ({placeholders})
-                        """
-        query_and_domain = f"""
-                SELECT
-                    se.id,
-                    se.source_id,
-                    se.url,
-                    se.status, 
-                    se.rent_status, 
-                    se.subtype,
-                    t.name_en,
-                    se.type_id,
-                    s.name AS domain
-                FROM source_estates se
-                LEFT JOIN sources s ON se.source_id = s.id
-                LEFT JOIN types t ON se.type_id = t.id
-                WHERE se.id IN ({placeholders})
-                """
-
-        cur.execute(query_and_domain, se_numbers_stripped)
-        rows = cur.fetchall()
-
-        for row in rows:
-            results.append(
-                Task(
-                    source_estate_id=row[0],
-                    source_id=row[1],
-                    url=row[2],
-                    status=row[3],
-                    rent_status=row[4],
-                    subtype=row[5],
-                    type=f"{row[6]} - Id={row[7]}",
-                    domain=row[8],
+    return load("mysql.connector").connect(**db_params)
+
+
+def sqlite_resolver(path: str, **kwargs) -> SEResolver:
+    """Resolver over a SQLite file with the source_estates, sources and types tables."""
+    return SEResolver(
+        lambda: sqlite3.connect(path, check_same_thread=False), placeholder="?", **kwargs
+    )
+
+
+def create_sqlite_standin(path: str, count: int = 1000, domains: int = 5):
+    """
+    Creates a SQLite stand-in with `count` synthetic listings (SE numbers 1..count)
+    spread over `domains` sources, for offline tests and benchmarks.
+    """
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executescript(
+            """
+            DROP TABLE IF EXISTS source_estates;
+            DROP TABLE IF EXISTS sources;
+            DROP TABLE IF EXISTS types;
+            CREATE TABLE sources (id INTEGER PRIMARY KEY, name TEXT);
+            CREATE TABLE types (id INTEGER PRIMARY KEY, name_en TEXT);
+            CREATE TABLE source_estates (
+                id INTEGER PRIMARY KEY, source_id INTEGER, url TEXT, status TEXT,
+                rent_status TEXT, subtype TEXT, type_id INTEGER
+            );
+            """
+        )
+        conn.executemany(
+            "INSERT INTO sources VALUES (?, ?)",
+            [(i, f"site{i}.example") for i in range(1, domains + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO types VALUES (?, ?)", [(1, "Apartment"), (2, "House")]
+        )
+        conn.executemany(
+            "INSERT INTO source_estates VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    i,
+                    i % domains + 1,
+                    f"https://site{i % domains + 1}.example/listing/{i}",
+                    "active",
+                    "sale" if i % 2 else "rent",
+                    "flat",
+                    i % 2 + 1,
                 )
-            )
+                for i in range(1, count + 1)
+            ),
+        )
+    conn.close()
+
+
+_resolver: Optional[SEResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> SEResolver:
+    """Returns the shared resolver: SQLite when SE_SQLITE_PATH is set, MySQL otherwise."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            if SE_SQLITE_PATH:
+                _resolver = sqlite_resolver(SE_SQLITE_PATH)
+            else:
+                _resolver = SEResolver(_mysql_connect)
+        return _resolver
 
-        cur.close()
-    except mysql.connector.Error:
-        raise  # Re-raise the exception to be handled by the UI layer
-    finally:
-        if conn is not None and conn.is_connected():
-            conn.close()
 
-    return results
+def iter_tasks_from_se_numbers(se_numbers: Iterable[str]) -> Iterator[Task]:
+    """Yields Tasks as their chunk of SE numbers is resolved."""
+    return get_resolver().iter_tasks(se_numbers)
+
+
+def get_tasks_from_se_numbers(se_numbers: list[str]) -> list[Task]:
+    """
+    Takes a list of SE numbers and returns the Tasks for the ones found.
+    Raises ValueError for an incomplete DB configuration and
+    mysql.connector.Error for database problems.
+    """
+    return list(iter_tasks_from_se_numbers(se_numbers))
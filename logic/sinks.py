@@ -0,0 +1,450 @@
+"""
+Result sinks: components that own a run's output file and receive rows from
+all workers.
+
+Every sink takes records through a queue and writes them from its own thread,
+so workers never block on file I/O or race on the same file. Each record
+carries all Task fields plus the raw markdown and the processed content.
+"""
+
+import csv
+import dataclasses
+import json
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+from config import EXCEL_CHECKPOINT_SECONDS, PARQUET_ROW_GROUP_SIZE
+from logic.models import Task
+from logic.registry import load, load_optional
+
+DATA_DIR = "data/results"
+
+TASK_FIELDS = [f.name for f in dataclasses.fields(Task)]
+RECORD_FIELDS = TASK_FIELDS + ["raw_markdown", "processed_content"]
+
+_STOP = object()
+
+
+def make_record(task: Task, md_content: str, processed_content: str) -> dict:
+    """Flattens a finished task into the record every sink writes."""
+    record = dataclasses.asdict(task)
+    record["raw_markdown"] = md_content
+    record["processed_content"] = processed_content
+    return record
+
+
+class ResultSink:
+    """
+    Base class for result sinks.
+
+    Subclasses set `extension` and implement _open, _write_record and _finish;
+    _tick is called about once a second for periodic flushing. Subclasses call
+    _mark_saved() once everything written so far is on disk, which runs the
+    on_saved callbacks passed to write().
+    """
+
+    extension = ""
+
+    def __init__(
+        self,
+        run_id: str,
+        directory: str = DATA_DIR,
+        on_error: Optional[Callable[[str], None]] = None,
+    ):
+        self.directory = directory
+        self.path = os.path.join(directory, f"results_{run_id}.{self.extension}")
+        self.on_error = on_error
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue = queue.Queue(maxsize=1000)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def write(
+        self,
+        task: Task,
+        md_content: str,
+        processed_content: str,
+        on_saved: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Queues one result. Safe to call from any thread. `on_saved` is called
+        from the sink's thread once the record has been flushed to disk.
+        """
+        self._queue.put((make_record(task, md_content, processed_content), on_saved))
+
+    def close(self):
+        """Writes everything still queued and finalizes the file."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _report(self, message: str):
+        if self.on_error:
+            self.on_error(message)
+        else:
+            print(message)
+
+    def _run(self):
+        try:
+            self._open()
+        except Exception as e:
+            self._report(f"Failed to open {self.name}: {e}")
+            # Keep draining so writers never block on a full queue.
+            while self._queue.get() is not _STOP:
+                pass
+            return
+
+        self._unsaved = []
+        while True:
+            try:
+                item = self._queue.get(timeout=1)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            try:
+                if item is not None:
+                    record, on_saved = item
+                    self._write_record(record)
+                    if on_saved:
+                        self._unsaved.append(on_saved)
+                self._tick()
+            except Exception as e:
+                self._report(f"Failed to write to {self.name}: {e}")
+
+        try:
+            self._finish()
+            self._mark_saved()
+        except Exception as e:
+            self._report(f"Failed to finalize {self.name}: {e}")
+
+    def _mark_saved(self):
+        callbacks, self._unsaved = self._unsaved, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self._report(f"Save callback failed for {self.name}: {e}")
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _write_record(self, record: dict):
+        raise NotImplementedError
+
+    def _tick(self):
+        pass
+
+    def _finish(self):
+        raise NotImplementedError
+
+
+class JsonlSink(ResultSink):
+    """Append-only JSON Lines, one record per line."""
+
+    extension = "jsonl"
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _write_record(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def _tick(self):
+        self._file.flush()
+        self._mark_saved()
+
+    def _finish(self):
+        self._file.close()
+
+
+class CsvSink(ResultSink):
+    """Append-only CSV with a header row."""
+
+    extension = "csv"
+
+    def _open(self):
+        write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "a", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=RECORD_FIELDS)
+        if write_header:
+            self._writer.writeheader()
+
+    def _write_record(self, record: dict):
+        self._writer.writerow(record)
+
+    def _tick(self):
+        self._file.flush()
+        self._mark_saved()
+
+    def _finish(self):
+        self._file.close()
+
+
+class ParquetSink(ResultSink):
+    """Parquet written one row group per PARQUET_ROW_GROUP_SIZE records."""
+
+    extension = "parquet"
+
+    def __init__(self, *args, row_group_size: int = PARQUET_ROW_GROUP_SIZE, **kwargs):
+        # pyarrow is only imported when a run writes Parquet.
+        self.pa = load_optional("pyarrow")
+        if self.pa is None:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow).")
+        self.pq = load("pyarrow.parquet")
+        self.row_group_size = row_group_size
+        super().__init__(*args, **kwargs)
+
+    def _schema(self):
+        pa = self.pa
+        columns = []
+        for field in dataclasses.fields(Task):
+            is_int = field.type in (int, Optional[int])
+            columns.append(pa.field(field.name, pa.int64() if is_int else pa.string()))
+        columns.append(pa.field("raw_markdown", pa.string()))
+        columns.append(pa.field("processed_content", pa.string()))
+        return pa.schema(columns)
+
+    def _open(self):
+        # Parquet files cannot be appended to; a resumed run writes a new part.
+        base, part = self.path[: -len(".parquet")], 1
+        while os.path.exists(self.path):
+            self.path = f"{base}.part{part}.parquet"
+            part += 1
+        self._schema_cache = self._schema()
+        self._buffer = []
+        self._writer = self.pq.ParquetWriter(self.path, self._schema_cache, compression="zstd")
+
+    def _write_record(self, record: dict):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush_row_group()
+
+    def _flush_row_group(self):
+        if self._buffer:
+            table = self.pa.Table.from_pylist(self._buffer, schema=self._schema_cache)
+            self._writer.write_table(table)
+            self._buffer = []
+            self._mark_saved()
+
+    def _finish(self):
+        self._flush_row_group()
+        self._writer.close()
+
+
+class ExcelSink(ResultSink):
+    """
+    Owns results_{run_id}.xlsx for one run.
+
+    Rows are appended to a spool file as they arrive and column widths are
+    tracked incrementally. The workbook is (re)built with openpyxl's
+    write-only mode at periodic checkpoints and once more on close, always
+    via a temp file so a crash never leaves a half-written xlsx behind.
+    """
+
+    extension = "xlsx"
+
+    # (header, record key) per column.
+    COLUMNS = [
+        ("Domain", "domain"),
+        ("Source Estate ID", "source_estate_id"),
+        ("Source ID", "source_id"),
+        ("URL", "url"),
+        ("Status", "status"),
+        ("Rent Status", "rent_status"),
+        ("Subtype", "subtype"),
+        ("Type", "type"),
+        ("Processed Content", "processed_content"),
+        ("Raw Markdown", "raw_markdown"),
+        ("Duplicate Of", "duplicate_of"),
+    ]
+    # Fixed widths for the long text columns, by column letter.
+    FIXED_WIDTHS = {"D": 60, "I": 80, "J": 60}
+    WRAP_COLUMNS = {"I"}
+    MIN_WIDTH = 15
+    # Excel refuses cells longer than this.
+    MAX_CELL_CHARS = 32767
+
+    def __init__(
+        self, *args, checkpoint_seconds: float = EXCEL_CHECKPOINT_SECONDS, **kwargs
+    ):
+        self.checkpoint_seconds = checkpoint_seconds
+        # openpyxl is only imported when a run writes Excel.
+        self.openpyxl = load("openpyxl")
+        self._illegal_chars = self.openpyxl.cell.cell.ILLEGAL_CHARACTERS_RE
+        super().__init__(*args, **kwargs)
+
+    @property
+    def header(self) -> list[str]:
+        return [header for header, _ in self.COLUMNS]
+
+    def _open(self):
+        self.spool_path = os.path.join(
+            self.directory, f".{os.path.splitext(self.name)[0]}.rows.jsonl"
+        )
+        self._widths = [max(len(h) + 2, self.MIN_WIDTH) for h in self.header]
+        self._dirty = False
+        self._last_checkpoint = time.monotonic()
+        if not os.path.exists(self.spool_path) and os.path.exists(self.path):
+            self._seed_spool()
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+
+    def _seed_spool(self):
+        """Continues an existing workbook (a resumed run) by spooling its rows first."""
+        workbook = self.openpyxl.load_workbook(self.path, read_only=True)
+        try:
+            with open(self.spool_path, "w", encoding="utf-8") as spool:
+                rows = workbook.active.iter_rows(min_row=2, values_only=True)
+                for values in rows:
+                    row = (list(values) + [None] * len(self.COLUMNS))[: len(self.COLUMNS)]
+                    spool.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+                    self._track_widths(row)
+        finally:
+            workbook.close()
+
+    def _write_record(self, record: dict):
+        row = []
+        for _, key in self.COLUMNS:
+            value = record.get(key)
+            if isinstance(value, str):
+                value = self._illegal_chars.sub("", value)[: self.MAX_CELL_CHARS]
+            row.append(value)
+        self._spool.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self._track_widths(row)
+        self._dirty = True
+
+    def _tick(self):
+        # The spool holds every row, so a flushed spool counts as saved.
+        self._spool.flush()
+        self._mark_saved()
+        if self._dirty and time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds:
+            self._checkpoint()
+            self._last_checkpoint = time.monotonic()
+
+    def _finish(self):
+        self._spool.close()
+        self._checkpoint()
+        # Keep the spool if the last checkpoint failed, it still holds every row.
+        if not self._dirty:
+            os.remove(self.spool_path)
+
+    def _track_widths(self, row: list):
+        for i, value in enumerate(row):
+            if value is not None:
+                self._widths[i] = max(self._widths[i], len(str(value)) + 2)
+
+    def _checkpoint(self):
+        """Writes the spooled rows to the xlsx atomically."""
+        if not self._dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        openpyxl = self.openpyxl
+        get_column_letter = openpyxl.utils.get_column_letter
+        try:
+            workbook = openpyxl.Workbook(write_only=True)
+            sheet = workbook.create_sheet("Processed Data")
+            # In write-only mode column widths must be set before any row.
+            for i, width in enumerate(self._widths, 1):
+                letter = get_column_letter(i)
+                sheet.column_dimensions[letter].width = self.FIXED_WIDTHS.get(letter, width)
+
+            sheet.append(self.header)
+            wrap = openpyxl.styles.Alignment(wrap_text=True, vertical="top")
+            wrap_indexes = {
+                i for i in range(len(self.COLUMNS))
+                if get_column_letter(i + 1) in self.WRAP_COLUMNS
+            }
+            with open(self.spool_path, "r", encoding="utf-8") as spool:
+                for line in spool:
+                    cells = []
+                    for i, value in enumerate(json.loads(line)):
+                        cell = openpyxl.cell.WriteOnlyCell(sheet, value=value)
+                        if i in wrap_indexes:
+                            cell.alignment = wrap
+                        cells.append(cell)
+                    sheet.append(cells)
+
+            workbook.save(tmp_path)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except (IOError, ValueError) as e:
+            self._report(f"Failed to save to Excel: {e}")
+        except Exception as e:
+            self._report(f"An unexpected error occurred while saving to Excel: {e}")
+
+
+class MultiSink:
+    """Fans every result out to several sinks."""
+
+    def __init__(self, sinks: list[ResultSink]):
+        self.sinks = sinks
+
+    @property
+    def name(self) -> str:
+        return ", ".join(sink.name for sink in self.sinks)
+
+    def write(
+        self,
+        task: Task,
+        md_content: str,
+        processed_content: str,
+        on_saved: Optional[Callable[[], None]] = None,
+    ):
+        callback = None
+        if on_saved:
+            # Fire once, after every sink has saved the record.
+            remaining = [len(self.sinks)]
+            lock = threading.Lock()
+
+            def callback():
+                with lock:
+                    remaining[0] -= 1
+                    done = remaining[0] == 0
+                if done:
+                    on_saved()
+
+        for sink in self.sinks:
+            sink.write(task, md_content, processed_content, on_saved=callback)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+SINK_TYPES = {
+    "xlsx": ExcelSink,
+    "jsonl": JsonlSink,
+    "csv": CsvSink,
+    "parquet": ParquetSink,
+}
+
+
+def open_sink(
+    formats,
+    run_id: str,
+    directory: str = DATA_DIR,
+    on_error: Optional[Callable[[str], None]] = None,
+):
+    """Opens one sink per requested format ("xlsx", "jsonl", "csv", "parquet")."""
+    unknown = [f for f in formats if f not in SINK_TYPES]
+    if unknown:
+        raise ValueError(
+            f"Unknown output format(s): {', '.join(unknown)}. "
+            f"Choose from: {', '.join(SINK_TYPES)}"
+        )
+    sinks = []
+    try:
+        for f in formats:
+            sinks.append(SINK_TYPES[f](run_id, directory=directory, on_error=on_error))
+    except Exception:
+        for sink in sinks:
+            sink.close()
+        raise
+    return sinks[0] if len(sinks) == 1 else MultiSink(sinks)
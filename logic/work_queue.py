@@ -0,0 +1,298 @@
+"""
+Durable shared task queue for runs split across several machines.
+
+A run's Tasks are published once into a named queue. Any number of headless
+workers (logic/worker.py) lease them a few at a time, renew their leases
+while they work and complete each one with its result record, which the
+broker keeps until they are collected into the usual result files.
+
+A lease is only valid for WORK_QUEUE_VISIBILITY_SECONDS unless renewed, so
+the tasks of a worker that died become available to the others. Every lease
+carries a fresh token and stale tokens are ignored, so a late answer from a
+worker whose lease expired cannot overwrite the one that took over. A task
+that failed or lost its lease WORK_QUEUE_MAX_ATTEMPTS times is marked failed.
+
+Brokers are picked by URL scheme. SQLiteBroker ("sqlite:///path") serves the
+workers of one machine only: its file must be on a local disk, as SQLite's
+WAL mode does not work over network file systems (NFS, SMB). Workers on
+several machines need a served broker, added with register_broker().
+"""
+
+import dataclasses
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional
+from urllib.parse import urlsplit
+
+from config import WORK_QUEUE_MAX_ATTEMPTS, WORK_QUEUE_URL
+from logic.models import Task
+
+# Tasks published per transaction.
+PUBLISH_CHUNK_SIZE = 1000
+
+STATES = ("queued", "leased", "done", "failed")
+
+
+@dataclass
+class Lease:
+    """A task a worker may work on until the lease expires."""
+
+    item_id: int
+    token: str
+    task: Task
+
+
+def task_to_json(task: Task) -> str:
+    return json.dumps(dataclasses.asdict(task), ensure_ascii=False)
+
+
+def task_from_dict(data: dict) -> Task:
+    """A Task from its fields; anything else in `data` (e.g. result columns) is ignored."""
+    names = {field.name for field in dataclasses.fields(Task)}
+    return Task(**{key: value for key, value in data.items() if key in names})
+
+
+class Broker:
+    """
+    Interface of a shared queue. `queue` names a run, so several runs can
+    share one broker. Methods taking leases ignore those whose token is no
+    longer current.
+    """
+
+    def publish(self, queue: str, tasks: Iterable[Task]) -> int:
+        """Adds the tasks to the queue and returns how many were added."""
+        raise NotImplementedError
+
+    def lease(self, queue: str, worker: str, count: int, seconds: float) -> list[Lease]:
+        """Leases up to `count` available tasks for `seconds`."""
+        raise NotImplementedError
+
+    def extend(self, leases: list[Lease], seconds: float):
+        """Renews the leases for another `seconds`."""
+        raise NotImplementedError
+
+    def complete(self, results: list[tuple[Lease, dict]]) -> int:
+        """Stores each result record and marks its task done; returns how many were accepted."""
+        raise NotImplementedError
+
+    def fail(self, lease: Lease, error: str):
+        """Gives the task back for another attempt, or marks it failed after the last one."""
+        raise NotImplementedError
+
+    def counts(self, queue: str) -> dict[str, int]:
+        """Number of tasks per state ("queued", "leased", "done", "failed")."""
+        raise NotImplementedError
+
+    def results(self, queue: str) -> Iterator[dict]:
+        """The result records of the finished tasks, in publishing order."""
+        raise NotImplementedError
+
+    def failures(self, queue: str) -> list[tuple[Task, str]]:
+        """The failed tasks with their last error."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteBroker(Broker):
+    """A Broker in one SQLite file on local disk, safe for many threads and processes."""
+
+    def __init__(self, path: str, max_attempts: int = WORK_QUEUE_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Transactions are managed explicitly; timeout waits for other processes.
+        self._conn = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY,
+                queue TEXT NOT NULL,
+                task TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                token TEXT,
+                worker TEXT,
+                lease_until REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_items_queue_state ON items (queue, state, id);
+            CREATE TABLE IF NOT EXISTS results (
+                item_id INTEGER PRIMARY KEY,
+                queue TEXT NOT NULL,
+                record TEXT NOT NULL,
+                worker TEXT,
+                finished_at REAL NOT NULL
+            );
+            """
+        )
+
+    def _write(self, func: Callable[[sqlite3.Connection], object]):
+        """Runs `func` in a write transaction taken up front, so leases never race."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def publish(self, queue, tasks):
+        added = 0
+        chunk = []
+        for task in tasks:
+            chunk.append((queue, task_to_json(task)))
+            if len(chunk) >= PUBLISH_CHUNK_SIZE:
+                added += self._insert(chunk)
+                chunk = []
+        if chunk:
+            added += self._insert(chunk)
+        return added
+
+    def _insert(self, rows: list[tuple[str, str]]) -> int:
+        self._write(lambda conn: conn.executemany(
+            "INSERT INTO items (queue, task) VALUES (?, ?)", rows
+        ))
+        return len(rows)
+
+    def lease(self, queue, worker, count, seconds):
+        def take(conn):
+            now = time.time()
+            # Leases that expired on their last attempt fail instead of coming back.
+            conn.execute(
+                "UPDATE items SET state = 'failed', token = NULL, "
+                "error = COALESCE(error, 'Lease expired') "
+                "WHERE queue = ? AND state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (queue, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                "SELECT id, task FROM items WHERE queue = ? AND "
+                "(state = 'queued' OR (state = 'leased' AND lease_until < ?)) "
+                "ORDER BY id LIMIT ?",
+                (queue, now, count),
+            ).fetchall()
+            leases = [
+                Lease(item_id, uuid.uuid4().hex, task_from_dict(json.loads(task)))
+                for item_id, task in rows
+            ]
+            conn.executemany(
+                "UPDATE items SET state = 'leased', token = ?, worker = ?, "
+                "lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(lease.token, worker, now + seconds, lease.item_id) for lease in leases],
+            )
+            return leases
+
+        return self._write(take)
+
+    def extend(self, leases, seconds):
+        if not leases:
+            return
+        until = time.time() + seconds
+        self._write(lambda conn: conn.executemany(
+            "UPDATE items SET lease_until = ? WHERE id = ? AND token = ?",
+            [(until, lease.item_id, lease.token) for lease in leases],
+        ))
+
+    def complete(self, results):
+        def store(conn):
+            now = time.time()
+            accepted = 0
+            for lease, record in results:
+                cursor = conn.execute(
+                    "UPDATE items SET state = 'done', token = NULL, error = NULL "
+                    "WHERE id = ? AND token = ?",
+                    (lease.item_id, lease.token),
+                )
+                if cursor.rowcount:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO results SELECT id, queue, ?, worker, ? "
+                        "FROM items WHERE id = ?",
+                        (json.dumps(record, ensure_ascii=False, default=str), now, lease.item_id),
+                    )
+                    accepted += 1
+            return accepted
+
+        return self._write(store) if results else 0
+
+    def fail(self, lease, error):
+        self._write(lambda conn: conn.execute(
+            "UPDATE items SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "token = NULL, lease_until = NULL, error = ? WHERE id = ? AND token = ?",
+            (self.max_attempts, error, lease.item_id, lease.token),
+        ))
+
+    def counts(self, queue):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM items WHERE queue = ? GROUP BY state", (queue,)
+            ).fetchall()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(rows)
+        return counts
+
+    def results(self, queue):
+        # Pages of rows, so collecting a large run does not hold every record in memory.
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT item_id, record FROM results WHERE queue = ? AND item_id > ? "
+                    "ORDER BY item_id LIMIT ?",
+                    (queue, last_id, PUBLISH_CHUNK_SIZE),
+                ).fetchall()
+            if not rows:
+                return
+            for last_id, record in rows:
+                yield json.loads(record)
+
+    def failures(self, queue):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task, error FROM items WHERE queue = ? AND state = 'failed' ORDER BY id",
+                (queue,),
+            ).fetchall()
+        return [(task_from_dict(json.loads(task)), error or "") for task, error in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _open_sqlite(url) -> SQLiteBroker:
+    # sqlite:///relative/path or sqlite:////absolute/path, as in SQLAlchemy.
+    path = url.path[1:] if url.path.startswith("/") else url.path
+    if not path:
+        raise ValueError("A sqlite work queue URL needs a file path, e.g. sqlite:///queue.sqlite3")
+    return SQLiteBroker(path)
+
+
+# URL scheme -> factory(parsed URL) returning a Broker.
+_brokers: dict[str, Callable] = {"sqlite": _open_sqlite}
+
+
+def register_broker(scheme: str, factory: Callable):
+    """Makes open_broker() use `factory(parsed_url)` for URLs with this scheme."""
+    _brokers[scheme] = factory
+
+
+def open_broker(url: Optional[str] = None) -> Broker:
+    """Opens the broker for `url` (WORK_QUEUE_URL by default)."""
+    parsed = urlsplit(url or WORK_QUEUE_URL)
+    factory = _brokers.get(parsed.scheme)
+    if factory is None:
+        raise ValueError(
+            f"Unknown work queue scheme {parsed.scheme!r}. Choose from: {', '.join(_brokers)}"
+        )
+    return factory(parsed)
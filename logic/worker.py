@@ -0,0 +1,411 @@
+"""
+Runs split across machines through a shared work queue (logic/work_queue.py).
+
+    python -m logic.worker publish RUN inputs.txt [--se]
+    python -m logic.worker work RUN [--workers 8 --model ...]    # on every machine
+    python -m logic.worker status RUN
+    python -m logic.worker collect RUN --format xlsx,jsonl
+
+publish resolves the inputs to Tasks and queues them under the run name.
+Each worker leases up to WORK_QUEUE_IN_FLIGHT tasks at a time and streams
+them through the same staged pipeline as logic.batch, renewing its leases
+while it works. Results go back to the broker instead of a local file, and
+a task that failed is given back for another attempt. collect writes the
+results of all workers to data/results like a local run would. Workers on
+several machines need a served broker; the SQLite one is local to a machine.
+"""
+
+import argparse
+import os
+import socket
+import threading
+from typing import Callable, Iterator, Optional
+
+from config import (
+    WORK_QUEUE_IN_FLIGHT,
+    WORK_QUEUE_POLL_SECONDS,
+    WORK_QUEUE_VISIBILITY_SECONDS,
+)
+from logic.batch import (
+    add_processing_arguments,
+    batch_run,
+    context_from_args,
+    print_summary,
+    start_console,
+)
+from logic.driver_pool import shutdown_driver_pools
+from logic.http_pool import close_session
+from logic.models import Task
+from logic.pipeline import Pipeline
+from logic.processing import is_error_result
+from logic.se_helper import iter_tasks_from_se_numbers
+from logic.sinks import SINK_TYPES, make_record, open_sink
+from logic.work_queue import Broker, Lease, open_broker, task_from_dict
+
+# BrokerSink commits at most this many results per transaction.
+COMPLETE_BATCH_SIZE = 100
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseTracker:
+    """The leases a worker holds, keyed by their Task object."""
+
+    def __init__(self):
+        self._leases: dict[int, Lease] = {}
+        self._cond = threading.Condition()
+
+    def add(self, leases: list[Lease]):
+        with self._cond:
+            for lease in leases:
+                self._leases[id(lease.task)] = lease
+
+    def pop(self, task: Task) -> Optional[Lease]:
+        with self._cond:
+            lease = self._leases.pop(id(task), None)
+            self._cond.notify_all()
+        return lease
+
+    def held(self) -> list[Lease]:
+        with self._cond:
+            return list(self._leases.values())
+
+    def wait_for_room(self, limit: int, timeout: float) -> int:
+        """Waits until fewer than `limit` leases are held; returns the free room (maybe 0)."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._leases) < limit, timeout)
+            return max(0, limit - len(self._leases))
+
+    def wait(self, timeout: float):
+        """Waits until a lease is given up, or `timeout` seconds."""
+        with self._cond:
+            self._cond.wait(timeout)
+
+
+class BrokerSink:
+    """
+    Result sink that completes the leased tasks in the broker.
+
+    Like the file sinks it takes rows from any thread and writes them from
+    its own, so several results share one transaction. Failed model answers
+    give the task back for another attempt instead.
+    """
+
+    name = "work queue"
+
+    def __init__(
+        self,
+        broker: Broker,
+        leases: LeaseTracker,
+        on_error: Optional[Callable[[str], None]] = None,
+    ):
+        self.broker = broker
+        self.leases = leases
+        self.on_error = on_error or print
+        self.completed = 0
+        self.rejected = 0
+        # Tasks handed to write(), which the pipeline must not give back.
+        self.written: set[int] = set()
+        self._pending: list[tuple[Task, dict, Optional[Callable[[], None]]]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(
+        self,
+        task: Task,
+        md_content: str,
+        processed_content: str,
+        on_saved: Optional[Callable[[], None]] = None,
+    ):
+        record = make_record(task, md_content, processed_content)
+        with self._cond:
+            self.written.add(id(task))
+            self._pending.append((task, record, on_saved))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed, timeout=1)
+                batch = self._pending[:COMPLETE_BATCH_SIZE]
+                self._pending = self._pending[COMPLETE_BATCH_SIZE:]
+                if not batch and self._closed:
+                    return
+            if batch:
+                self._commit(batch)
+
+    def _commit(self, batch):
+        results, saved = [], []
+        for task, record, on_saved in batch:
+            lease = self.leases.pop(task)
+            with self._cond:
+                self.written.discard(id(task))
+            if lease is None:
+                continue
+            if is_error_result(record["processed_content"]):
+                self._give_back(lease, record["processed_content"])
+                continue
+            results.append((lease, record))
+            if on_saved:
+                saved.append(on_saved)
+        try:
+            accepted = self.broker.complete(results)
+        except Exception as e:
+            # The leases run out and the tasks are leased again.
+            self.on_error(f"Failed to store {len(results)} results in the work queue: {e}")
+            return
+        self.completed += accepted
+        # A lease that expired and was taken over by another worker.
+        self.rejected += len(results) - accepted
+        for callback in saved:
+            try:
+                callback()
+            except Exception as e:
+                self.on_error(f"Save callback failed for the work queue: {e}")
+
+    def _give_back(self, lease: Lease, error: str):
+        try:
+            self.broker.fail(lease, error)
+        except Exception as e:
+            self.on_error(f"Failed to give {lease.task.url} back to the work queue: {e}")
+
+    def task_done(self, task: Task):
+        """Gives back a task that left the pipeline without a result."""
+        with self._cond:
+            if id(task) in self.written:
+                return
+        lease = self.leases.pop(task)
+        if lease is not None:
+            self._give_back(lease, "Fetching or processing failed")
+
+    def close(self):
+        """Commits everything still pending."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+
+def leased_tasks(
+    broker: Broker,
+    queue_name: str,
+    worker: str,
+    leases: LeaseTracker,
+    in_flight: int = WORK_QUEUE_IN_FLIGHT,
+    visibility: float = WORK_QUEUE_VISIBILITY_SECONDS,
+    poll: float = WORK_QUEUE_POLL_SECONDS,
+    follow: bool = False,
+    stop: Optional[threading.Event] = None,
+) -> Iterator[Task]:
+    """
+    Yields leased tasks while holding at most `in_flight` of them. Ends once
+    nothing is queued or leased by anyone (tasks this worker gives back are
+    leased again), or runs until `stop` is set with `follow`.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        room = leases.wait_for_room(in_flight, poll)
+        if not room:
+            continue
+        batch = broker.lease(queue_name, worker, room, visibility)
+        if batch:
+            leases.add(batch)
+            for lease in batch:
+                yield lease.task
+            continue
+        counts = broker.counts(queue_name)
+        if not follow and not counts["queued"] and not counts["leased"]:
+            return
+        # Other workers' leases may still expire, or this worker's tasks come back.
+        leases.wait(poll)
+
+
+def _renew_leases(
+    broker: Broker, leases: LeaseTracker, visibility: float, done: threading.Event
+):
+    while not done.wait(visibility / 3):
+        try:
+            broker.extend(leases.held(), visibility)
+        except Exception as e:
+            print(f"Warning: failed to renew work queue leases: {e}")
+
+
+def run_worker(
+    broker: Broker,
+    queue_name: str,
+    context,
+    worker: Optional[str] = None,
+    use_selenium: bool = False,
+    max_workers: Optional[int] = None,
+    in_flight: int = WORK_QUEUE_IN_FLIGHT,
+    visibility: float = WORK_QUEUE_VISIBILITY_SECONDS,
+    poll: float = WORK_QUEUE_POLL_SECONDS,
+    follow: bool = False,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+):
+    """
+    Processes tasks of `queue_name` until the queue is drained and returns
+    (BatchStats, BrokerSink); the sink counts the completed results.
+    """
+    worker = worker or default_worker_id()
+    leases = LeaseTracker()
+    sink = BrokerSink(broker, leases, on_error=lambda m: context.ui_queue.put(("error", m)))
+    context.results_sink = sink
+    pipeline = Pipeline(
+        context,
+        use_selenium=use_selenium,
+        fetch_workers=max_workers,
+        on_progress=on_progress,
+        on_task_done=sink.task_done,
+    )
+    done = threading.Event()
+    renewer = threading.Thread(
+        target=_renew_leases, args=(broker, leases, visibility, done), daemon=True
+    )
+    renewer.start()
+    try:
+        tasks = leased_tasks(
+            broker, queue_name, worker, leases, in_flight, visibility, poll, follow
+        )
+        with batch_run(context) as stats:
+            try:
+                stats.total = pipeline.run(tasks)
+            finally:
+                # Before the journal closes, so it records the saved tasks.
+                sink.close()
+    finally:
+        done.set()
+        renewer.join()
+        context.results_sink = None
+    return stats, sink
+
+
+def _print_counts(broker: Broker, queue_name: str):
+    counts = broker.counts(queue_name)
+    print(f"{queue_name}: " + ", ".join(f"{counts[state]} {state}" for state in counts))
+
+
+def _publish(args, broker: Broker) -> int:
+    with open(args.input, "r", encoding="utf-8") as f:
+        inputs = [line.strip() for line in f if line.strip()]
+    tasks = iter_tasks_from_se_numbers(inputs) if args.se else (Task(url=url) for url in inputs)
+    added = broker.publish(args.run, tasks)
+    print(f"Published {added} tasks to {args.run}.")
+    _print_counts(broker, args.run)
+    return 0
+
+
+def _work(args, broker: Broker, parser) -> int:
+    ui_queue, counters, printer = start_console(args.verbose)
+    worker = default_worker_id()
+    # Each worker journals and reports its own share under its own run id.
+    # Results go to the work queue, not to local files.
+    context = context_from_args(
+        parser, args, ui_queue, run_id=f"{args.run}_{worker}", save_excel=False
+    )
+    print(f"Worker {worker} on {args.run}...")
+
+    def on_progress(done, total):
+        print(f"[{done}/{total}]")
+
+    stats, sink = run_worker(
+        broker,
+        args.run,
+        context,
+        worker=worker,
+        use_selenium=args.selenium,
+        max_workers=args.workers,
+        in_flight=args.in_flight,
+        follow=args.follow,
+        on_progress=on_progress,
+    )
+    ui_queue.put(None)
+    printer.join()
+    close_session()
+    shutdown_driver_pools()
+
+    print_summary(stats, counters)
+    print(f"{sink.completed} results stored, {sink.rejected} late results dropped.")
+    _print_counts(broker, args.run)
+    return 0
+
+
+def _collect(args, broker: Broker) -> int:
+    formats = tuple(f.strip() for f in args.format.split(",") if f.strip())
+    sink = open_sink(formats, args.run)
+    count = 0
+    try:
+        for record in broker.results(args.run):
+            sink.write(task_from_dict(record), record["raw_markdown"], record["processed_content"])
+            count += 1
+    finally:
+        sink.close()
+    print(f"Wrote {count} results to {sink.name}.")
+    failures = broker.failures(args.run)
+    if failures:
+        print(f"{len(failures)} tasks failed:")
+        for task, error in failures[:20]:
+            print(f"  {task.url}: {error[:200]}")
+    _print_counts(broker, args.run)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Split a run across machines through a shared work queue."
+    )
+    parser.add_argument(
+        "--queue-url", default=None, help="Work queue URL (defaults to WORK_QUEUE_URL)."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish = commands.add_parser("publish", help="Queue the tasks of a run.")
+    publish.add_argument("run", help="Run name shared by the workers.")
+    publish.add_argument("input", help="Text file with one URL or SE number per line.")
+    publish.add_argument("--se", action="store_true", help="Treat the inputs as SE numbers.")
+
+    work = commands.add_parser("work", help="Process tasks until the run is drained.")
+    work.add_argument("run", help="Run name given to publish.")
+    work.add_argument(
+        "--in-flight",
+        type=int,
+        default=WORK_QUEUE_IN_FLIGHT,
+        help="Tasks leased by this worker at once.",
+    )
+    work.add_argument(
+        "--follow", action="store_true", help="Keep waiting for new tasks when drained."
+    )
+    add_processing_arguments(work)
+
+    status = commands.add_parser("status", help="Show the task counts of a run.")
+    status.add_argument("run")
+
+    collect = commands.add_parser("collect", help="Write the results of a run to files.")
+    collect.add_argument("run")
+    collect.add_argument(
+        "--format",
+        default="xlsx",
+        help=f"Comma-separated result formats: {', '.join(SINK_TYPES)}.",
+    )
+    args = parser.parse_args(argv)
+
+    broker = open_broker(args.queue_url)
+    try:
+        if args.command == "publish":
+            return _publish(args, broker)
+        if args.command == "work":
+            return _work(args, broker, work)
+        if args.command == "collect":
+            return _collect(args, broker)
+        _print_counts(broker, args.run)
+        return 0
+    finally:
+        broker.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,63 @@
+import os
+import queue
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stand_ins import FakeJinaServer  # noqa: E402
+
+# config exits without a Jina key and reads the reader URL on import, so
+# both are set before any test imports a logic module.
+os.environ.setdefault("JINA_API_KEY", "test")
+_reader = FakeJinaServer(latency=0.0).start()
+os.environ["JINA_READER_URL"] = _reader.reader_url
+
+
+@pytest.fixture
+def jina_server():
+    """The stand-in Jina Reader the in-process tests fetch from."""
+    return _reader
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A scratch working directory (data/ is relative to it) with prompts.yaml."""
+    shutil.copy(os.path.join(ROOT, "prompts.yaml"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def make_context(run_id: str = "test", **fields):
+    """A ProcessingContext for the fake model, without any caches."""
+    from logic.models import ProcessingContext
+
+    defaults = dict(
+        api_key="test",
+        use_proxy=False,
+        proxy_url="",
+        ui_queue=queue.Queue(),
+        user_prompt_template="{content}",
+        system_prompt_text="Extract the listing details.",
+        save_excel=True,
+        model_name="fake-model",
+        run_id=run_id,
+        use_fetch_cache=False,
+        use_llm_cache=False,
+        output_formats=("jsonl",),
+    )
+    defaults.update(fields)
+    return ProcessingContext(**defaults)
+
+
+def ui_errors(context) -> list[str]:
+    """The error messages the run sent to the UI queue."""
+    errors = []
+    while not context.ui_queue.empty():
+        kind, payload = context.ui_queue.get_nowait()
+        if kind == "error":
+            errors.append(payload)
+    return errors
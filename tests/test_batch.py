@@ -0,0 +1,27 @@
+import pytest
+
+from conftest import make_context
+from logic import metrics
+from logic.batch import batch_run, run_tasks
+from logic.models import Task
+
+
+def test_failed_setup_releases_what_was_opened(workdir):
+    context = make_context("broken_sink", output_formats=("nope",))
+    with pytest.raises(ValueError):
+        with batch_run(context, [Task(url="https://site.example/1")]):
+            pass
+    assert context.journal is None
+    assert context.metrics is None
+    assert context.dedup is None
+    assert "broken_sink" not in metrics._active
+
+
+def test_run_reports_its_stats(workdir, jina_server):
+    context = make_context("stats")
+    tasks = [Task(url=f"https://site.example/listing/{i}") for i in range(5)]
+    stats = run_tasks(iter(tasks), context, max_workers=2)
+    assert stats.total == 5
+    assert stats.elapsed > 0
+    assert stats.metrics_report.endswith("metrics_stats.json")
+    assert context.journal is None and context.results_sink is None
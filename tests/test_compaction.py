@@ -0,0 +1,11 @@
+from logic.compaction import _clean_lines
+
+
+def test_navigation_link_lists_are_dropped():
+    md = "- [Home](/)\n1. [Rent](/rent)\n[Buy](/buy) | [Sell](/sell)\nA bright flat."
+    assert _clean_lines(md) == ["A bright flat."]
+
+
+def test_lines_with_numbers_next_to_links_are_kept():
+    md = "| 3 | [Agent Smith](/agents/1) |\n120 000 [EUR](/currency)\n2024 [Built](/x)"
+    assert _clean_lines(md) == ["| 3 | Agent Smith |", "120 000 EUR", "2024 Built"]
@@ -0,0 +1,48 @@
+import json
+
+from conftest import make_context, ui_errors
+from logic.batch import run_tasks
+from logic.dedup import DedupIndex, normalize_url
+from logic.models import Task
+
+
+def test_normalize_url_drops_tracking_and_scheme_differences():
+    assert normalize_url("http://www.Site.example/a/?utm_source=x&b=2&a=1#top") == normalize_url(
+        "https://site.example/a?a=1&b=2"
+    )
+
+
+def test_same_input_line_twice_waits_for_the_first_fetch():
+    index = DedupIndex()
+    first, second = Task(url="https://site.example/1"), Task(url="https://site.example/1")
+    assert index.claim_url(first) is None
+    key, page = index.claim_url(second)
+    assert key == first.key()
+    index.finish_url(first, "# page")
+    # The copy never claimed the URL, so finishing it must not touch the Future.
+    index.finish_url(second, "# other")
+    assert page.result(timeout=1) == "# page"
+
+
+def test_duplicate_input_lines_are_all_saved(workdir, jina_server):
+    url = "https://site.example/listing/1"
+    context = make_context("dup")
+    stats = run_tasks([Task(url=url), Task(url=url)], context, max_workers=2)
+
+    assert ui_errors(context) == []
+    assert stats.total == 2
+    with open(workdir / "data" / "results" / "results_dup.jsonl", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert [row["url"] for row in rows] == [url, url]
+    assert rows[0]["processed_content"] == rows[1]["processed_content"]
+
+
+def test_duplicate_input_lines_with_the_async_engine(workdir, jina_server):
+    from logic.async_pipeline import run_async_pipeline
+
+    url = "https://site.example/listing/2"
+    context = make_context("dup_async")
+    stats = run_async_pipeline([Task(url=url), Task(url=url)], context)
+
+    assert ui_errors(context) == []
+    assert stats.total == 2
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from conftest import make_context
+from logic import processing
+from logic.fetch_cache import FetchCache
+from logic.models import Task
+
+
+def test_conversion_error_moves_on_to_the_next_tier(workdir, jina_server, monkeypatch):
+    def broken_parser(html, selectors=()):
+        raise ValueError("unparseable page")
+
+    monkeypatch.setattr(processing, "html_to_markdown", broken_parser)
+    monkeypatch.setitem(
+        processing.DOWNLOADERS,
+        "direct",
+        lambda task, context: processing.convert_html("<html>", task, context, "direct"),
+    )
+    context = make_context(fetch_mode="auto")
+    md_content, tier = processing.download_md_tiered(
+        Task(url="https://convert-error.example/1"), context
+    )
+    assert tier == "jina"
+    assert md_content
+
+
+def test_conversion_error_is_a_fetch_error(monkeypatch):
+    monkeypatch.setattr(processing, "html_to_markdown", lambda html, selectors=(): 1 / 0)
+    with pytest.raises(processing.FetchError, match="Converting the page failed"):
+        processing.convert_html("<html>", Task(url="https://a.example/"), make_context(), "direct")
+
+
+@pytest.mark.parametrize("failing", ["write", "rename"])
+def test_fetch_cache_put_is_best_effort(tmp_path, monkeypatch, capsys, failing):
+    cache = FetchCache(directory=str(tmp_path))
+
+    def disk_full(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    if failing == "write":
+        monkeypatch.setattr("logic.fetch_cache.gzip.open", disk_full)
+    else:
+        monkeypatch.setattr("logic.fetch_cache.os.replace", disk_full)
+    cache.put("https://a.example/", "jina", "", "# page")
+
+    assert "could not write to the fetch cache" in capsys.readouterr().out
+    assert cache.get("https://a.example/", "jina", "") is None
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files]
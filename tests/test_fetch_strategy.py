@@ -0,0 +1,48 @@
+import json
+import time
+
+from logic.fetch_strategy import StrategyMemory, looks_complete
+
+
+def _memory_with(tmp_path, tier, age_hours, ttl_hours=24):
+    path = tmp_path / "strategies.json"
+    path.write_text(
+        json.dumps({"site.example": {"tier": tier, "updated_at": time.time() - age_hours * 3600}})
+    )
+    return StrategyMemory(str(path), ttl_hours=ttl_hours)
+
+
+def test_looks_complete_rejects_short_pages_and_bot_walls():
+    assert not looks_complete("short")
+    assert not looks_complete("Checking your browser " + "x" * 500)
+    assert looks_complete("listing " * 100)
+
+
+def test_fresh_tier_is_kept(tmp_path):
+    memory = _memory_with(tmp_path, "selenium", age_hours=1)
+    assert memory.get("site.example") == "selenium"
+
+
+def test_expired_tier_is_probed_again_once(tmp_path):
+    memory = _memory_with(tmp_path, "selenium", age_hours=48)
+    assert memory.get("site.example") is None
+    # Only one task re-probes; the others keep the remembered tier meanwhile.
+    assert memory.get("site.example") == "selenium"
+
+    memory.record("site.example", "direct")
+    assert memory.get("site.example") == "direct"
+    saved = json.loads((tmp_path / "strategies.json").read_text())
+    assert saved["site.example"]["tier"] == "direct"
+
+
+def test_probe_on_the_same_tier_renews_it(tmp_path):
+    memory = _memory_with(tmp_path, "jina", age_hours=48)
+    assert memory.get("site.example") is None
+    memory.record("site.example", "jina")
+    saved = json.loads((tmp_path / "strategies.json").read_text())
+    assert time.time() - saved["site.example"]["updated_at"] < 60
+
+
+def test_ttl_zero_keeps_tiers_for_good(tmp_path):
+    memory = _memory_with(tmp_path, "selenium", age_hours=10000, ttl_hours=0)
+    assert memory.get("site.example") == "selenium"
@@ -0,0 +1,29 @@
+import pytest
+
+from logic.html_cleaner import html_to_markdown
+
+PAGE = """
+<html><body>
+<nav><a href="/">Home</a></nav>
+<h1>Flat for rent</h1>
+<p>Contact <a href="/agents/7">Jane Doe</a> for a viewing.</p>
+<ul><li><a href="/area/center">City center</a></li></ul>
+<script>track()</script>
+</body></html>
+"""
+
+
+@pytest.mark.parametrize("engine", ["lxml", "markdownify"])
+def test_links_keep_their_text(engine):
+    md = html_to_markdown(PAGE, engine=engine)
+    assert "Jane Doe" in md
+    assert "City center" in md
+    assert "/agents/7" not in md
+
+
+@pytest.mark.parametrize("engine", ["lxml", "markdownify"])
+def test_selectors_are_removed(engine):
+    md = html_to_markdown(PAGE, engine=engine)
+    assert "Home" not in md
+    assert "track()" not in md
+    assert "Flat for rent" in md
@@ -0,0 +1,47 @@
+import os
+
+from logic.journal import RunJournal
+from logic.models import Task
+
+
+def test_resume_point_after_reopening(tmp_path):
+    fetched, processed, saved = (Task(url=f"https://site.example/{i}") for i in range(3))
+    journal = RunJournal("partial", directory=str(tmp_path))
+    journal.add_tasks([fetched, processed, saved, Task(url="https://site.example/0")])
+    journal.record(fetched, "fetched", "# fetched")
+    journal.record(processed, "fetched", "# page")
+    journal.record(processed, "processed", "answer")
+    journal.record(saved, "saved")
+    journal.close()
+
+    journal = RunJournal("partial", directory=str(tmp_path))
+    assert len(journal.tasks()) == 3
+    assert journal.resume_point(fetched) == ("# fetched", None, False)
+    assert journal.resume_point(processed) == ("# page", "answer", False)
+    assert journal.resume_point(saved) == (None, None, True)
+    assert journal.summary() == {"pending": 0, "fetched": 1, "processed": 1, "saved": 1}
+    assert not [name for name in os.listdir(journal.artifact_dir) if name.endswith(".tmp")]
+    journal.close()
+
+
+def test_corrupt_artifact_is_fetched_again(tmp_path):
+    task = Task(url="https://site.example/1")
+    journal = RunJournal("corrupt", directory=str(tmp_path))
+    journal.add_tasks([task])
+    journal.record(task, "fetched", "# page")
+    sha = journal.state(task)["fetched"]
+    with open(os.path.join(journal.artifact_dir, sha + ".gz"), "wb") as f:
+        f.write(b"not gzip")
+    assert journal.resume_point(task) == (None, None, False)
+    journal.close()
+
+
+def test_unresolved_se_numbers_survive_a_restart(tmp_path):
+    journal = RunJournal("se", directory=str(tmp_path))
+    journal.add_se_numbers(["1", "2", "3", "2"])
+    journal.add_tasks([Task(url="https://site.example/1", source_estate_id=1)])
+    journal.close()
+
+    journal = RunJournal("se", directory=str(tmp_path))
+    assert journal.unresolved_se_numbers() == ["2", "3"]
+    journal.close()
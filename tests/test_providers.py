@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import pytest
+
+from logic import providers, registry
+
+
+class NotFound(Exception):
+    pass
+
+
+class FakeCache:
+    def __init__(self):
+        self.updates = 0
+        self.gone = False
+
+    def update(self, ttl=None):
+        self.updates += 1
+
+
+class FakeModel:
+    def __init__(self, cache=None):
+        self.cache = cache
+
+    def generate_content(self, prompt, stream=False):
+        if self.cache is not None and self.cache.gone:
+            raise NotFound("CachedContent not found")
+        return SimpleNamespace(text=f"{'cached' if self.cache else 'inline'}: {prompt}")
+
+
+class FakeGenai:
+    def __init__(self):
+        self.caches = []
+        outer = self
+
+        class caching:
+            class CachedContent:
+                @staticmethod
+                def create(model, system_instruction, ttl):
+                    outer.caches.append(FakeCache())
+                    return outer.caches[-1]
+
+        class GenerativeModel(FakeModel):
+            def __init__(self, model_name=None, system_instruction=None):
+                super().__init__()
+
+            @staticmethod
+            def from_cached_content(cached_content):
+                return FakeModel(cached_content)
+
+        self.caching = caching
+        self.GenerativeModel = GenerativeModel
+
+    def configure(self, api_key):
+        pass
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    genai = FakeGenai()
+    monkeypatch.setitem(registry._loaded, "genai", genai)
+    monkeypatch.setitem(registry._loaded, "gemini.NotFound", NotFound)
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    # Every system prompt is long enough to be cached.
+    monkeypatch.setattr(providers, "GEMINI_CONTEXT_CACHE_MIN_TOKENS", 0)
+    return providers.GeminiProvider(), genai
+
+
+def test_context_cache_is_extended_before_it_expires(gemini, monkeypatch):
+    provider, genai = gemini
+    now = [1000.0]
+    monkeypatch.setattr(providers.time, "monotonic", lambda: now[0])
+    assert provider.generate("gemini-x", "system", "hi") == "cached: hi"
+    assert len(genai.caches) == 1
+
+    now[0] += 30 * 60
+    provider.generate("gemini-x", "system", "hi")
+    assert genai.caches[0].updates == 0
+
+    now[0] += 29 * 60
+    provider.generate("gemini-x", "system", "hi")
+    assert genai.caches[0].updates == 1
+    assert len(genai.caches) == 1
+
+
+def test_lost_context_cache_falls_back_to_inline(gemini):
+    provider, genai = gemini
+    provider.generate("gemini-x", "system", "hi")
+    genai.caches[0].gone = True
+    assert provider.generate("gemini-x", "system", "hi") == "inline: hi"
+    assert provider.generate("gemini-x", "system", "again") == "inline: again"
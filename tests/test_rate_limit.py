@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from logic import rate_limit
+from logic.processing import FetchError
+from logic.rate_limit import RateLimitError, backoff_delay, call_with_limits, parse_retry_after
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters():
+    rate_limit.reset_limiters()
+    yield
+    rate_limit.reset_limiters()
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("") is None
+    assert parse_retry_after("soon") is None
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKOFF_MAX_SECONDS", 5.0)
+    assert all(backoff_delay(attempt) <= 5.0 for attempt in range(20))
+    delay = backoff_delay(1, retry_after=4.9)
+    assert 4.9 <= delay <= 5.0
+
+
+def test_retry_after_over_the_cap_fails_without_waiting(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKOFF_MAX_SECONDS", 5.0)
+    with pytest.raises(RateLimitError):
+        backoff_delay(1, retry_after=3600)
+
+    calls = []
+
+    def throttled():
+        calls.append(1)
+        raise FetchError("API Error 429", 429, retry_after=3600)
+
+    started = time.monotonic()
+    with pytest.raises(RateLimitError):
+        call_with_limits(["test:capped"], throttled)
+    assert len(calls) == 1
+    assert time.monotonic() - started < 1
+    # Other callers of the paused provider give up right away too.
+    with pytest.raises(RateLimitError):
+        call_with_limits(["test:capped"], lambda: "ok")
+    assert time.monotonic() - started < 1
+
+
+def test_throttled_call_is_retried(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKOFF_SECONDS", 0.01)
+    answers = iter([FetchError("API Error 429", 429, retry_after=0.01), "ok"])
+
+    def flaky():
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    assert call_with_limits(["test:flaky"], flaky) == "ok"
@@ -0,0 +1,112 @@
+import glob
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks.stand_ins import FakeJinaServer
+from conftest import ROOT
+
+COUNT = 40
+URLS = [f"https://site{i % 4}.example/listing/{i}" for i in range(COUNT)]
+
+BATCH_ARGS = [
+    "--model", "fake-model",
+    "--workers", "2",
+    "--format", "jsonl",
+    "--no-page-cache",
+    "--no-llm-cache",
+    "--no-dedup",
+]
+
+
+def _batch(workdir, server, *args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        JINA_READER_URL=server.reader_url,
+        PYTHONPATH=ROOT,
+        SE_SQLITE_PATH=str(workdir / "se.sqlite3"),
+        # Small chunks and queues, so SE numbers are still unresolved when the run is killed.
+        SE_CHUNK_SIZE="5",
+        SE_DB_POOL_SIZE="1",
+        PIPELINE_QUEUE_SIZE="2",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "logic.batch", *args, *BATCH_ARGS],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def _journal_events(path):
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                pass
+    return events
+
+
+def _saved_keys(path):
+    return {e["key"] for e in _journal_events(path) if e.get("stage") == "saved"}
+
+
+@pytest.mark.parametrize("se", [False, True], ids=["urls", "se_numbers"])
+def test_killed_run_resumes_every_task(workdir, se):
+    from logic.journal import RunJournal
+    from logic.se_helper import create_sqlite_standin
+
+    if se:
+        create_sqlite_standin(str(workdir / "se.sqlite3"), count=COUNT)
+        inputs = [str(i) for i in range(1, COUNT + 1)]
+        keys = {f"se:{n}" for n in inputs}
+        urls = [f"https://site{i % 5 + 1}.example/listing/{i}" for i in range(1, COUNT + 1)]
+    else:
+        inputs, keys, urls = URLS, set(URLS), URLS
+    (workdir / "inputs.txt").write_text("\n".join(inputs), encoding="utf-8")
+
+    server = FakeJinaServer(latency=0.2).start()
+    try:
+        process = _batch(workdir, server, "inputs.txt", *(["--se"] if se else []))
+        deadline = time.monotonic() + 60
+        journal_path = None
+        while time.monotonic() < deadline:
+            journals = glob.glob(str(workdir / "data" / "results" / "journal_*.jsonl"))
+            if journals and len(_saved_keys(journals[0])) >= 3:
+                journal_path = journals[0]
+                break
+            time.sleep(0.05)
+        process.send_signal(signal.SIGKILL)
+        process.wait()
+        assert journal_path is not None, "the run saved nothing before the deadline"
+
+        run_id = os.path.basename(journal_path)[len("journal_"):-len(".jsonl")]
+        journal = RunJournal(run_id, directory=str(workdir / "data" / "results"))
+        # Every input is journaled, as a task or as an SE number still to resolve.
+        journaled = {task.key() for task in journal.tasks()}
+        journaled |= {f"se:{n}" for n in journal.unresolved_se_numbers()}
+        journal.close()
+        assert journaled == keys
+        saved_before = _saved_keys(journal_path)
+        assert len(saved_before) < COUNT
+
+        requests_before = server.requests
+        resumed = _batch(workdir, server, "--resume", run_id)
+        assert resumed.wait(timeout=120) == 0
+    finally:
+        server.stop()
+
+    assert _saved_keys(journal_path) == keys
+    # Saved tasks are not fetched again.
+    assert server.requests - requests_before <= COUNT - len(saved_before)
+    with open(workdir / "data" / "results" / f"results_{run_id}.jsonl", encoding="utf-8") as f:
+        saved_urls = [json.loads(line)["url"] for line in f]
+    assert sorted(set(saved_urls)) == sorted(urls)
@@ -0,0 +1,26 @@
+from logic.se_helper import create_sqlite_standin, sqlite_resolver
+
+
+def test_resolves_in_chunks_and_skips_unknown_numbers(tmp_path):
+    path = str(tmp_path / "se.sqlite3")
+    create_sqlite_standin(path, count=10)
+    resolver = sqlite_resolver(path, chunk_size=3, pool_size=2)
+    tasks = list(resolver.iter_tasks(["1", "2", "2", "99", "10", "5"]))
+    # Chunks come back in input order, the rows of a chunk in id order.
+    assert [task.source_estate_id for task in tasks] == [1, 2, 5, 10]
+    assert tasks[0].domain == "site2.example"
+    resolver.close()
+
+
+def test_cached_tasks_are_not_shared_between_runs(tmp_path):
+    path = str(tmp_path / "se.sqlite3")
+    create_sqlite_standin(path, count=5)
+    resolver = sqlite_resolver(path)
+    first = list(resolver.iter_tasks(["3"]))[0]
+    first.duplicate_of = "se:1"
+    again = list(resolver.iter_tasks(["3"]))[0]
+    assert again is not first
+    assert again.duplicate_of is None
+    again.duplicate_of = "se:2"
+    assert list(resolver.iter_tasks(["3"]))[0].duplicate_of is None
+    resolver.close()
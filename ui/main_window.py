@@ -1,18 +1,36 @@
 import queue
 import sys
 import threading
+import time
 import uuid
-from tkinter import messagebox
+from typing import Iterable
+from tkinter import messagebox, ttk
 from datetime import datetime
 
 import customtkinter as ctk
-import mysql.connector
 import yaml
 
-from config import JINA_API_KEY, PROXY_URL, USER_PROMPT_TEMPLATE
+from config import (
+    CONVERT_WORKERS,
+    JINA_API_KEY,
+    LLM_BATCH_SIZE,
+    LLM_STREAM_TO_UI,
+    PROXY_URL,
+    USER_PROMPT_TEMPLATE,
+)
+from logic.async_pipeline import run_async_pipeline
+from logic.batch import resume_tasks, run_tasks, tasks_for_inputs
+from logic.driver_pool import shutdown_driver_pools
+from logic.journal import RunJournal
 from logic.models import ProcessingContext, Task
-from logic.processing import fetch_md, fetch_md_selenium
-from logic.se_helper import get_tasks_from_se_numbers
+from logic.prompts import load_prompts
+from logic.sinks import SINK_TYPES
+
+# The worker queue is drained every UI_TICK_MS, for at most UI_TICK_BUDGET
+# seconds per tick, so large batches cannot starve the Tk main loop.
+UI_TICK_MS = 100
+UI_TICK_BUDGET = 0.03
+LOG_MAX_LINES = 5000
 
 
 class JinaMDProcessor(ctk.CTk):
@@ -34,19 +52,24 @@ class JinaMDProcessor(ctk.CTk):
         self.active_threads = 0
         self.lock = threading.Lock()
 
+        # Per-task results of the current run: key -> {"url", "status", "raw", "processed"}.
+        self.task_results = {}
+        self.last_updated_task = None
+        self.shown_task = None
+        self.error_count = 0
+
         self.init_ui()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.check_queue()
 
+    def on_close(self):
+        # Warm Chrome drivers are kept between runs; quit them with the window.
+        shutdown_driver_pools()
+        self.destroy()
+
     def load_prompts(self):
         try:
-            with open("prompts.yaml", "r", encoding="utf-8") as f:
-                prompts_list = yaml.safe_load(f)
-                if not isinstance(prompts_list, list):
-                    raise yaml.YAMLError(
-                        "The root of prompts.yaml should be a list of objects."
-                    )
-                prompts_dict = {p["name"]: p["text"] for p in prompts_list}
-                return prompts_dict
+            return load_prompts()
         except FileNotFoundError:
             messagebox.showerror("Error", "prompts.yaml not found!")
             return {"Default": "Please create a prompts.yaml file."}
@@ -88,18 +111,19 @@ class JinaMDProcessor(ctk.CTk):
 
         self.options_frame = ctk.CTkFrame(self)
         self.options_frame.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
-        self.options_frame.grid_columnconfigure(5, weight=1)
+        self.options_frame.grid_columnconfigure(6, weight=1)
         self.use_proxy_check = ctk.CTkCheckBox(
             self.options_frame, text="Use Proxy", command=self.toggle_proxy_entry
         )
         self.use_proxy_check.grid(row=0, column=0, padx=10, pady=5)
-        self.use_selenium_check = ctk.CTkCheckBox(
-            self.options_frame, text="Use Selenium"
+        # "auto" tries direct HTTP, Jina and Selenium, cheapest first, per domain.
+        self.fetch_mode_menu = ctk.CTkOptionMenu(
+            self.options_frame, values=["selenium", "jina", "direct", "auto"], width=100
         )
-        self.use_selenium_check.grid(row=0, column=1, padx=10, pady=5)
-        self.use_selenium_check.select()
+        self.fetch_mode_menu.grid(row=0, column=1, padx=10, pady=5)
+        self.fetch_mode_menu.set("selenium")
         self.save_to_excel_check = ctk.CTkCheckBox(
-            self.options_frame, text="Save to Excel"
+            self.options_frame, text="Save Results"
         )
         self.save_to_excel_check.grid(row=0, column=2, padx=10, pady=5)
         self.save_to_excel_check.select()
@@ -108,11 +132,16 @@ class JinaMDProcessor(ctk.CTk):
         )
         self.is_se_check.grid(row=0, column=3, padx=10, pady=5)
         self.is_se_check.select()
+        self.use_page_cache_check = ctk.CTkCheckBox(
+            self.options_frame, text="Use Page Cache"
+        )
+        self.use_page_cache_check.grid(row=0, column=4, padx=10, pady=5)
+        self.use_page_cache_check.select()
 
         self.proxy_label = ctk.CTkLabel(self.options_frame, text="Proxy:")
-        self.proxy_label.grid(row=0, column=4, padx=10, pady=5)
+        self.proxy_label.grid(row=0, column=5, padx=10, pady=5)
         self.proxy_entry = ctk.CTkEntry(self.options_frame)
-        self.proxy_entry.grid(row=0, column=5, padx=10, pady=5, sticky="ew")
+        self.proxy_entry.grid(row=0, column=6, padx=10, pady=5, sticky="ew")
         if self.proxy_url:
             self.proxy_entry.insert(0, self.proxy_url)
             self.use_proxy_check.select()
@@ -123,6 +152,8 @@ class JinaMDProcessor(ctk.CTk):
         self.tab_view.add("Prompts & Controls")
         self.tab_view.add("Original Markdown")
         self.tab_view.add("Processed Content")
+        self.tab_view.add("Results")
+        self.tab_view.add("Log")
 
         prompts_tab = self.tab_view.tab("Prompts & Controls")
         prompts_tab.grid_columnconfigure(0, weight=1)
@@ -169,6 +200,24 @@ class JinaMDProcessor(ctk.CTk):
         self.model_menu.grid(row=0, column=1, padx=10, pady=5, sticky="ew")
         self.model_menu.set("gemini-1.5-flash-latest")
 
+        self.output_format_menu = ctk.CTkOptionMenu(
+            self.model_selection_frame, values=list(SINK_TYPES), width=90
+        )
+        self.output_format_menu.grid(row=0, column=3, padx=10, pady=5)
+        self.output_format_menu.set("xlsx")
+
+        self.use_llm_cache_check = ctk.CTkCheckBox(
+            self.model_selection_frame, text="Use LLM Cache"
+        )
+        self.use_llm_cache_check.grid(row=0, column=2, padx=10, pady=5)
+        self.use_llm_cache_check.select()
+
+        self.compact_md_check = ctk.CTkCheckBox(
+            self.model_selection_frame, text="Compact Markdown"
+        )
+        self.compact_md_check.grid(row=0, column=4, padx=10, pady=5)
+        self.compact_md_check.select()
+
         self.system_prompt_label = ctk.CTkLabel(prompts_tab, text="System Prompt:")
         self.system_prompt_label.grid(
             row=2, column=0, padx=10, pady=(10, 0), sticky="w"
@@ -194,6 +243,16 @@ class JinaMDProcessor(ctk.CTk):
         )
         self.process_btn.pack(side="right", padx=10, pady=5)
 
+        self.async_engine_check = ctk.CTkCheckBox(
+            self.controls_frame, text="Async Engine"
+        )
+        self.async_engine_check.pack(side="right", padx=10, pady=5)
+
+        self.resume_entry = ctk.CTkEntry(
+            self.controls_frame, placeholder_text="Resume Run ID", width=160
+        )
+        self.resume_entry.pack(side="right", padx=10, pady=5)
+
         self.raw_md_area = ctk.CTkTextbox(
             self.tab_view.tab("Original Markdown"), font=("Consolas", 12)
         )
@@ -204,6 +263,31 @@ class JinaMDProcessor(ctk.CTk):
         )
         self.processed_area.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
 
+        results_tab = self.tab_view.tab("Results")
+        results_tab.grid_columnconfigure(0, weight=1)
+        results_tab.grid_rowconfigure(0, weight=1)
+        self.results_tree = ttk.Treeview(
+            results_tab, columns=("url", "status"), show="headings", selectmode="browse"
+        )
+        self.results_tree.heading("url", text="Listing")
+        self.results_tree.heading("status", text="Status")
+        self.results_tree.column("url", width=450)
+        self.results_tree.column("status", width=450)
+        self.results_tree.grid(row=0, column=0, padx=(5, 0), pady=5, sticky="nsew")
+        results_scroll = ttk.Scrollbar(
+            results_tab, orient="vertical", command=self.results_tree.yview
+        )
+        results_scroll.grid(row=0, column=1, padx=(0, 5), pady=5, sticky="ns")
+        self.results_tree.configure(yscrollcommand=results_scroll.set)
+        self.results_tree.bind("<<TreeviewSelect>>", self.on_result_select)
+
+        log_tab = self.tab_view.tab("Log")
+        log_tab.grid_columnconfigure(0, weight=1)
+        log_tab.grid_rowconfigure(0, weight=1)
+        self.log_area = ctk.CTkTextbox(log_tab, font=("Consolas", 12))
+        self.log_area.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
+        self.log_area.configure(state="disabled")
+
         self.status_bar = ctk.CTkLabel(self, text="Ready", anchor="w")
         self.status_bar.grid(row=4, column=0, padx=10, pady=5, sticky="ew")
 
@@ -213,6 +297,7 @@ class JinaMDProcessor(ctk.CTk):
         self._force_bind_shortcuts(self.system_prompt_edit)
         self._force_bind_shortcuts(self.raw_md_area)
         self._force_bind_shortcuts(self.processed_area)
+        self._force_bind_shortcuts(self.log_area)
 
         if prompt_names:
             self.on_prompt_select(prompt_names[0])
@@ -291,45 +376,38 @@ class JinaMDProcessor(ctk.CTk):
     def start_fetch_threads(self):
         inputs = self.url_entry.get("1.0", "end-1c").splitlines()
         inputs = [i.strip() for i in inputs if i.strip()]
+        resume_run_id = self.resume_entry.get().strip()
 
-        if not inputs:
+        if resume_run_id and not RunJournal.exists(resume_run_id):
+            messagebox.showerror("Error", f"No journal found for run {resume_run_id}.")
+            return
+        if not inputs and not resume_run_id:
             messagebox.showerror("Error", "Please provide at least one input.")
             return
 
         self.process_btn.configure(state="disabled")
         self.update_status("Starting processing...")
 
-        run_id = datetime.now().strftime(f"%Y%m%d_%H%M%S")
+        run_id = resume_run_id or datetime.now().strftime(f"%Y%m%d_%H%M%S")
 
-        if self.is_se_check.get():
-            try:
-                self.update_status("Converting SE numbers to URLs...")
-                tasks = get_tasks_from_se_numbers(inputs)
-                if not tasks:
-                    messagebox.showerror(
-                        "Error", "Could not convert any SE numbers to URLs."
-                    )
-                    self.process_btn.configure(state="normal")
-                    return
-            except mysql.connector.Error as e:
-                messagebox.showerror(
-                    "Database Error", f"Failed to get URLs from SE numbers: {e}"
-                )
-                self.process_btn.configure(state="normal")
-                return
-            except (ValueError, Exception) as e:
-                messagebox.showerror(
-                    "SE Helper Error", f"Failed to get URLs from SE numbers: {e}"
-                )
-                self.process_btn.configure(state="normal")
-                return
+        if resume_run_id:
+            # The journal keeps the run's task list, the inputs box is ignored.
+            journal = RunJournal(resume_run_id)
+            tasks = resume_tasks(journal)
+            inputs = journal.tasks() + journal.unresolved_se_numbers()
+            journal.close()
         else:
-            tasks = [Task(url=url) for url in inputs]
+            # SE numbers are resolved chunk by chunk inside the pipeline, so
+            # the first listings are fetched while the rest are looked up.
+            tasks = tasks_for_inputs(inputs, bool(self.is_se_check.get()), run_id)
 
-        self.active_threads = len(tasks)
+        self.active_threads = len(tasks) if isinstance(tasks, list) else len(inputs)
+        self.reset_results()
+        self.append_log([f"--- Run {run_id}: {self.active_threads} inputs ---"])
         self.update_status(f"Processing {self.active_threads} items...")
 
-        use_selenium = bool(self.use_selenium_check.get())
+        fetch_mode = self.fetch_mode_menu.get()
+        use_selenium = fetch_mode == "selenium"
 
         context = ProcessingContext(
             api_key=self.api_key,
@@ -341,71 +419,189 @@ class JinaMDProcessor(ctk.CTk):
             save_excel=bool(self.save_to_excel_check.get()),
             model_name=self.model_menu.get(),
             run_id=run_id,
+            use_fetch_cache=bool(self.use_page_cache_check.get()),
+            fetch_mode=fetch_mode,
+            use_llm_cache=bool(self.use_llm_cache_check.get()),
+            compact_markdown=bool(self.compact_md_check.get()),
+            llm_batch_size=LLM_BATCH_SIZE,
+            convert_workers=CONVERT_WORKERS,
+            stream_llm=LLM_STREAM_TO_UI,
+            output_formats=(self.output_format_menu.get(),),
+            resume=bool(resume_run_id),
         )
 
-        if use_selenium:
-            thread = threading.Thread(
-                target=self._run_selenium_tasks, args=(tasks, context), daemon=True
-            )
-            thread.start()
-        else:
-            for task in tasks:
-                thread = threading.Thread(
-                    target=self._run_fetch_task,
-                    args=(task, context),
-                    daemon=True,
-                )
-                thread.start()
+        use_async = bool(self.async_engine_check.get())
+        thread = threading.Thread(
+            target=self._run_tasks,
+            args=(tasks, context, use_selenium, use_async),
+            daemon=True,
+        )
+        thread.start()
 
-    def _run_fetch_task(self, task: Task, context: ProcessingContext):
-        try:
-            fetch_md(task, context)
-        finally:
-            with self.lock:
-                self.active_threads -= 1
+    def _run_tasks(
+        self,
+        tasks: Iterable[Task],
+        context: ProcessingContext,
+        use_selenium: bool,
+        use_async: bool,
+    ):
+        label = "[Selenium] " if use_selenium else ""
+
+        def on_progress(done, total):
+            self.ui_queue.put(("update_status", f"{label}Processed {done}/{total}"))
 
-    def _run_selenium_tasks(self, tasks: list[Task], context: ProcessingContext):
         try:
-            for i, task in enumerate(tasks):
-                self.ui_queue.put(
-                    (
-                        "update_status",
-                        f"[Selenium] Processing {i + 1}/{len(tasks)}: {task.url}",
-                    )
+            if use_async:
+                # The asyncio engine schedules every task up front.
+                stats = run_async_pipeline(
+                    list(tasks), context, use_selenium=use_selenium, on_progress=on_progress
+                )
+            else:
+                stats = run_tasks(
+                    tasks, context, use_selenium=use_selenium, on_progress=on_progress
                 )
-                fetch_md_selenium(task, context)
+            if not stats.total:
+                self.ui_queue.put(("error", "Could not convert any inputs to URLs."))
+            summary = (
+                f"{label}Finished {stats.total} items in {stats.elapsed:.1f}s "
+                f"({stats.items_per_sec:.2f} items/sec) | LLM cache "
+                f"{stats.llm_cache_hits} hits / {stats.llm_cache_misses} misses | "
+                f"{stats.duplicates} duplicates reused"
+            )
+            if stats.metrics_report:
+                summary += f" | Timings in {stats.metrics_report}"
+            self.ui_queue.put(("update_status", summary))
+
+        except Exception as e:
+            self.ui_queue.put(("error", f"Run failed: {e}"))
         finally:
             with self.lock:
                 self.active_threads = 0
 
     def check_queue(self):
+        """
+        Drains the worker queue within UI_TICK_BUDGET and applies the merged
+        updates once per tick: the latest value per task and field, the
+        latest status, and all errors in one log append. Streamed text is
+        appended to the visible text box instead of redrawing it.
+        """
+        deadline = time.perf_counter() + UI_TICK_BUDGET
+        changed_tasks = set()
+        appended = {}
+        loose_text = {}
+        status = None
+        errors = []
         try:
-            while not self.ui_queue.empty():
-                message = self.ui_queue.get_nowait()
-                msg_type, data = message
-                if msg_type == "update_text":
+            while time.perf_counter() < deadline:
+                msg_type, data = self.ui_queue.get_nowait()
+                if msg_type == "task_update":
+                    key, url, field, value = data
+                    result = self.task_results.setdefault(
+                        key, {"url": url, "status": "Running"}
+                    )
+                    result[field] = value
+                    changed_tasks.add(key)
+                    self.last_updated_task = key
+                elif msg_type == "task_append":
+                    key, url, field, text = data
+                    result = self.task_results.setdefault(
+                        key, {"url": url, "status": "Running"}
+                    )
+                    result[field] = result.get(field, "") + text
+                    appended.setdefault((key, field), []).append(text)
+                    self.last_updated_task = key
+                elif msg_type == "update_text":
                     widget_id, content = data
-                    if widget_id == "raw":
-                        self.raw_md_area.delete("1.0", "end")
-                        self.raw_md_area.insert("1.0", content)
-                    elif widget_id == "processed":
-                        self.processed_area.delete("1.0", "end")
-                        self.processed_area.insert("1.0", content)
+                    loose_text[widget_id] = content
                 elif msg_type == "update_status":
-                    self.update_status(data)
+                    status = data
                 elif msg_type == "error":
-                    messagebox.showerror("Error", data)
+                    errors.append(data)
 
         except queue.Empty:
             pass
         finally:
+            self.apply_updates(changed_tasks, loose_text, status, errors, appended)
             if (
                 self.active_threads == 0
                 and self.process_btn.cget("state") == "disabled"
+                and self.ui_queue.empty()
             ):
+                # Keep the run summary from _run_tasks in the status bar.
                 self.process_btn.configure(state="normal")
-                self.update_status("Ready")
-            self.after(100, self.check_queue)
+            self.after(UI_TICK_MS, self.check_queue)
+
+    def apply_updates(self, changed_tasks, loose_text, status, errors, appended=None):
+        for key in changed_tasks:
+            result = self.task_results[key]
+            values = (result["url"], result["status"])
+            if self.results_tree.exists(key):
+                self.results_tree.item(key, values=values)
+            else:
+                self.results_tree.insert("", "end", iid=key, values=values)
+
+        # Full text is only rendered for one task: the selected row, or the
+        # most recently updated task while nothing is selected.
+        selection = self.results_tree.selection()
+        visible_task = selection[0] if selection else self.last_updated_task
+        if visible_task in changed_tasks:
+            self.show_task(visible_task, force=True)
+        for (key, field), texts in (appended or {}).items():
+            if key != visible_task or key in changed_tasks:
+                continue
+            if key != self.shown_task:
+                self.show_task(key)
+                continue
+            widget = self.processed_area if field == "processed" else self.raw_md_area
+            widget.insert("end", "".join(texts))
+            widget.see("end")
+
+        for widget_id, content in loose_text.items():
+            self.set_text(self.raw_md_area if widget_id == "raw" else self.processed_area, content)
+
+        if errors:
+            self.error_count += len(errors)
+            self.append_log(errors)
+        if status is not None:
+            if self.error_count:
+                status += f" | {self.error_count} errors (see Log)"
+            self.update_status(status)
+
+    def on_result_select(self, _=None):
+        selection = self.results_tree.selection()
+        if selection:
+            self.show_task(selection[0])
+
+    def show_task(self, key, force=False):
+        if key == self.shown_task and not force:
+            return
+        result = self.task_results.get(key, {})
+        self.set_text(self.raw_md_area, result.get("raw", ""))
+        self.set_text(self.processed_area, result.get("processed", ""))
+        self.shown_task = key
+
+    @staticmethod
+    def set_text(widget, content):
+        widget.delete("1.0", "end")
+        widget.insert("1.0", content)
+
+    def append_log(self, lines):
+        stamp = datetime.now().strftime("%H:%M:%S")
+        self.log_area.configure(state="normal")
+        self.log_area.insert("end", "".join(f"[{stamp}] {line}\n" for line in lines))
+        # Keep the log bounded so appending stays cheap on long sessions.
+        line_count = int(self.log_area.index("end-1c").split(".")[0])
+        if line_count > LOG_MAX_LINES:
+            self.log_area.delete("1.0", f"{line_count - LOG_MAX_LINES}.0")
+        self.log_area.see("end")
+        self.log_area.configure(state="disabled")
+
+    def reset_results(self):
+        self.task_results.clear()
+        self.results_tree.delete(*self.results_tree.get_children())
+        self.last_updated_task = None
+        self.shown_task = None
+        self.error_count = 0
 
     def update_status(self, message):
         self.status_bar.configure(text=message)